@@ -0,0 +1,138 @@
+# asr_batcher.py
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+import torch
+
+# Dynamic micro-batching for the local Wav2Vec2 CTC models. Concurrent requests
+# are collected for a short window, grouped into buckets of similar length (so
+# little compute is wasted on padding) and run as one forward pass per bucket on
+# a dedicated inference thread, keeping the event loop free. The forward pass
+# itself is done by a backend: PyTorch here, ONNX Runtime in onnx_asr.py.
+
+ASR_MAX_BATCH_SIZE = int(os.environ.get("ASR_MAX_BATCH_SIZE", "8"))
+ASR_MAX_WAIT_MS = float(os.environ.get("ASR_MAX_WAIT_MS", "25"))
+# Clips in one bucket are at most this many times longer than the shortest one.
+ASR_BUCKET_LENGTH_RATIO = float(os.environ.get("ASR_BUCKET_LENGTH_RATIO", "1.5"))
+
+
+def bucket_by_length(lengths: List[int], max_ratio: float, max_size: int) -> List[List[int]]:
+    """Groups item indices so each group's longest clip is within `max_ratio` of its shortest."""
+    buckets: List[List[int]] = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        current = buckets[-1] if buckets else None
+        if (current is not None and len(current) < max_size
+                and lengths[index] <= max(1, lengths[current[0]]) * max_ratio):
+            current.append(index)
+        else:
+            buckets.append([index])
+    return buckets
+
+
+class TorchWav2Vec2Backend:
+    """Runs a Hugging Face Wav2Vec2ForCTC model with PyTorch."""
+
+    name = "torch"
+
+    def __init__(self, processor, model):
+        self.processor = processor
+        self.model = model.eval()
+
+    def transcribe_batch(self, clips: List[np.ndarray]) -> List[str]:
+        """One padded forward pass over a list of 16 kHz clips."""
+        inputs = self.processor(clips, sampling_rate=16000, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            logits = self.model(inputs.input_values, attention_mask=inputs.get("attention_mask")).logits
+        predicted_ids = torch.argmax(logits, dim=-1)
+        return self.processor.batch_decode(predicted_ids)
+
+    def frame_logits(self, clip: np.ndarray) -> np.ndarray:
+        """Per-frame CTC logits, shape (frames, vocab), for a single clip."""
+        inputs = self.processor(clip, sampling_rate=16000, return_tensors="pt")
+        with torch.inference_mode():
+            return self.model(inputs.input_values).logits[0].numpy()
+
+
+class ASRBatcher:
+    """Queues transcription requests for one language and serves them in batches."""
+
+    def __init__(self, backend, max_batch_size: int = ASR_MAX_BATCH_SIZE,
+                 max_wait_ms: float = ASR_MAX_WAIT_MS, bucket_ratio: float = ASR_BUCKET_LENGTH_RATIO):
+        self.backend = backend
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.bucket_ratio = max(1.0, bucket_ratio)
+        # A single inference thread: the backend already parallelises each forward pass internally.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr-batcher")
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        self.batches = 0
+        self.items = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio, future))
+        return await future
+
+    async def run_on_inference_thread(self, fn, *args):
+        """Runs other model work (e.g. streaming windows) on the same thread as the batches."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Requests whose caller already went away are dropped before inference.
+            batch = [(audio, future) for audio, future in batch if not future.cancelled()]
+            for bucket in bucket_by_length([len(audio) for audio, _ in batch], self.bucket_ratio, self.max_batch_size):
+                items = [batch[i] for i in bucket]
+                try:
+                    texts = await loop.run_in_executor(self._executor, self.backend.transcribe_batch,
+                                                       [audio for audio, _ in items])
+                except Exception as e:
+                    for _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.batches += 1
+                self.items += len(items)
+                for (_, future), text in zip(items, texts):
+                    if not future.done():
+                        future.set_result(text)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
@@ -0,0 +1,56 @@
+# audio_cache.py
+
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+# In-memory audio bytes, evicted least recently used first once their total size
+# passes a budget. Used for synthesized Piper clips (tts_generator.py) and for
+# cached clips decoded to WAV for clients that cannot play Ogg (mainfinal.py).
+
+
+class AudioLRUCache:
+    """Least-recently-used byte cache with a total size budget. Thread-safe."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key: Hashable, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return  # would evict everything else for one clip
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = audio
+            self.size += len(audio)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,91 @@
+# audio_frontend.py
+
+import asyncio
+import os
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+import noisereduce as nr
+
+from audio_transcode import TARGET_SAMPLE_RATE, decode_with_ffmpeg, find_wav_chunk, is_asr_ready_wav
+
+# Front end for the local ASR: decode -> trim silence -> (optional) denoise.
+# Decoding goes straight into a float32 buffer (zero-copy for 16 kHz mono PCM WAV,
+# otherwise ffmpeg emits f32le). A vectorized energy VAD trims the leading and
+# trailing silence that phone recordings always have, so spectral gating only
+# runs over speech. Every stage is timed.
+
+VAD_FRAME_MS = 20
+# A frame counts as speech if it is this many dB above the quietest frames...
+VAD_MARGIN_DB = float(os.environ.get("VAD_MARGIN_DB", "12"))
+# ...and above this absolute floor (dBFS).
+VAD_FLOOR_DBFS = float(os.environ.get("VAD_FLOOR_DBFS", "-50"))
+# Audio kept around the detected speech so word onsets and codas are not clipped.
+VAD_PADDING_MS = int(os.environ.get("VAD_PADDING_MS", "150"))
+
+
+async def decode_to_float32(audio_bytes: bytes) -> np.ndarray:
+    """Decodes any input to 16 kHz mono float32 in [-1, 1]."""
+    if is_asr_ready_wav(audio_bytes):
+        pcm = find_wav_chunk(audio_bytes, b"data")
+        usable = len(pcm) - (len(pcm) % 2)
+        return np.frombuffer(pcm[:usable], dtype="<i2").astype(np.float32) * (1.0 / 32768.0)
+    raw = await decode_with_ffmpeg(audio_bytes, ["-vn", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "-f", "f32le"])
+    return np.frombuffer(raw, dtype="<f4")
+
+
+def speech_bounds(samples: np.ndarray, sr: int = TARGET_SAMPLE_RATE) -> Tuple[int, int]:
+    """
+    Energy VAD over fixed frames. Returns the (start, end) sample range that
+    contains speech, or the whole clip if nothing crosses the threshold.
+    """
+    frame = sr * VAD_FRAME_MS // 1000
+    n_frames = len(samples) // frame
+    if n_frames < 3:
+        return 0, len(samples)
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    threshold = max(VAD_FLOOR_DBFS, float(np.percentile(energy_db, 10)) + VAD_MARGIN_DB)
+    voiced = np.flatnonzero(energy_db > threshold)
+    if voiced.size == 0:
+        return 0, len(samples)
+    padding = sr * VAD_PADDING_MS // 1000
+    start = max(0, int(voiced[0]) * frame - padding)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame + padding)
+    return start, end
+
+
+def denoise(samples: np.ndarray, sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    return nr.reduce_noise(y=samples, sr=sr, prop_decrease=0.8).astype(np.float32, copy=False)
+
+
+def _trim_and_denoise(samples: np.ndarray, apply_denoise: bool, timings: Dict[str, float]) -> np.ndarray:
+    t0 = time.perf_counter()
+    start, end = speech_bounds(samples)
+    trimmed = samples[start:end]
+    t1 = time.perf_counter()
+    timings["vad"] = (t1 - t0) * 1000.0
+    if apply_denoise and len(trimmed):
+        trimmed = denoise(trimmed)
+        timings["denoise"] = (time.perf_counter() - t1) * 1000.0
+    return trimmed
+
+
+async def process_audio(audio_bytes: bytes, apply_denoise: bool = True) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Runs the whole front end. Returns the samples and per-stage timings in milliseconds."""
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    samples = await decode_to_float32(audio_bytes)
+    timings["decode"] = (time.perf_counter() - t0) * 1000.0
+    timings["input_seconds"] = len(samples) / TARGET_SAMPLE_RATE
+    # VAD and spectral gating are CPU-bound numpy work; keep them off the event loop.
+    samples = await asyncio.to_thread(_trim_and_denoise, samples, apply_denoise, timings)
+    timings["speech_seconds"] = len(samples) / TARGET_SAMPLE_RATE
+    timings["total"] = (time.perf_counter() - t0) * 1000.0
+    return samples, timings
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Formats stage timings for a Server-Timing response header."""
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items() if not stage.endswith("_seconds"))
@@ -0,0 +1,109 @@
+# audio_http.py
+
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+# HTTP delivery for immutable, content-addressed audio: strong ETags,
+# If-None-Match revalidation, single byte ranges and long-lived caching.
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_WAV_MEDIA_TYPES = {"audio/wav", "audio/x-wav", "audio/wave"}
+
+
+def parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single `bytes=start-end` range into inclusive offsets.
+    Returns None if the header is absent or malformed (serve the full body),
+    and raises ValueError if the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, sep, end_str = range_header[len("bytes="):].strip().partition("-")
+    if not sep or not (start_str == "" or start_str.isdigit()) or not (end_str == "" or end_str.isdigit()):
+        return None
+    if start_str == "":
+        # Suffix range: the last N bytes.
+        if end_str == "":
+            return None
+        length = int(end_str)
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable.")
+        return max(0, size - length), size - 1
+    start = int(start_str)
+    if end_str and int(end_str) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable.")
+    end = int(end_str) if end_str else size - 1
+    return start, min(end, size - 1)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def wants_wav(accept: Optional[str], requested_format: Optional[str] = None) -> bool:
+    """
+    True if the client asked for WAV: `format=wav`, or an Accept header that lists a WAV
+    type but neither audio/ogg nor a wildcard. Everyone else gets the stored format.
+    """
+    if requested_format:
+        return requested_format == "wav"
+    if not accept:
+        return False
+    types = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+    return bool(types & _WAV_MEDIA_TYPES) and not types & {"audio/ogg", "audio/*", "*/*"}
+
+
+def _prepare(request: Request, size: int, etag: str) -> Tuple[dict, Optional[Response], Optional[Tuple[int, int]]]:
+    """Shared conditional/range handling: returns headers, an early 304/416 response, and the byte range."""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return headers, Response(status_code=304, headers=headers), None
+
+    # If-Range: only honour the range if the client's copy is still current.
+    if_range = request.headers.get("if-range")
+    range_header = request.headers.get("range") if not if_range or if_range == etag else None
+    try:
+        byte_range = parse_byte_range(range_header, size)
+    except ValueError:
+        return headers, Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}), None
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+    return headers, None, byte_range
+
+
+def audio_response(request: Request, data: bytes, etag: str, media_type: Optional[str]) -> Response:
+    """Builds a 200, 206, 304 or 416 response for an immutable audio body. A 304 carries `media_type` too."""
+    headers, early, byte_range = _prepare(request, len(data), f'"{etag}"')
+    if early is not None:
+        if early.status_code == 304 and media_type:
+            early.headers["Content-Type"] = media_type
+        return early
+    if byte_range is None:
+        return Response(content=data, media_type=media_type, headers=headers)
+    start, end = byte_range
+    return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+def streaming_audio_response(request: Request, size: int, etag: str, media_type: str,
+                             open_range: Callable[[int, int], AsyncIterator[bytes]]) -> Response:
+    """Like audio_response, for bodies too large to hold in memory: open_range(start, end) yields the bytes."""
+    headers, early, byte_range = _prepare(request, size, f'"{etag}"')
+    if early is not None:
+        return early
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(open_range(start, end), status_code=206 if byte_range else 200,
+                             media_type=media_type, headers=headers)
@@ -0,0 +1,183 @@
+# audio_transcode.py
+
+import asyncio
+import io
+import os
+import struct
+import tempfile
+import wave
+from pathlib import Path
+from typing import Optional
+
+# Converts uploaded recordings to the 16 kHz mono 16-bit PCM WAV the ASR models expect.
+# Audio goes through ffmpeg's stdin/stdout instead of files in the working directory.
+# ffmpeg runs as an asyncio subprocess, so the event loop is never blocked, and a
+# semaphore caps how many conversions run at once.
+#
+# TTS clips go the other way: Parler/Piper WAV is encoded to Opus in an Ogg
+# container before it is cached, which is roughly a tenth of the size for
+# speech. Clients that cannot play Ogg get it decoded back to WAV on request.
+
+TARGET_SAMPLE_RATE = 16000
+FFMPEG_MAX_PROCESSES = int(os.environ.get("FFMPEG_MAX_PROCESSES", str(os.cpu_count() or 2)))
+FFMPEG_TIMEOUT_SECONDS = float(os.environ.get("FFMPEG_TIMEOUT_SECONDS", "30"))
+# "opus" stores TTS clips as Ogg/Opus; "wav" keeps them as synthesized.
+TTS_AUDIO_CODEC = os.environ.get("TTS_AUDIO_CODEC", "opus")
+TTS_OPUS_BITRATE = os.environ.get("TTS_OPUS_BITRATE", "24k")
+WAV_FALLBACK_SAMPLE_RATE = 24000
+
+_ffmpeg_slots = asyncio.Semaphore(FFMPEG_MAX_PROCESSES)
+
+
+class TranscodeError(Exception):
+    """Raised when ffmpeg cannot decode or convert the input audio."""
+
+
+def find_wav_chunk(data: bytes, wanted: bytes) -> Optional[memoryview]:
+    """Returns a zero-copy view of one RIFF/WAVE chunk's payload, or None."""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", data, offset)
+        if chunk_id == wanted:
+            return memoryview(data)[offset + 8:min(len(data), offset + 8 + chunk_size)]
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def wav_format(data: bytes) -> Optional[dict]:
+    """Reads the fmt chunk of a RIFF/WAVE file without decoding it. Returns None if not a WAV."""
+    fmt = find_wav_chunk(data, b"fmt ")
+    if fmt is None or len(fmt) < 16:
+        return None
+    audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", fmt, 0)
+    return {"audio_format": audio_format, "channels": channels, "sample_rate": sample_rate, "bits": bits}
+
+
+def is_asr_ready_wav(data: bytes) -> bool:
+    """True if the bytes are already 16 kHz mono 16-bit PCM WAV and need no conversion."""
+    fmt = wav_format(data)
+    return fmt is not None and fmt == {"audio_format": 1, "channels": 1, "sample_rate": TARGET_SAMPLE_RATE, "bits": 16}
+
+
+# Container signatures -> (codec label, media type), for uploads stored as-is.
+_SIGNATURES = (
+    (0, b"RIFF", "wav", "audio/wav"),
+    (0, b"OggS", "ogg", "audio/ogg"),
+    (0, b"fLaC", "flac", "audio/flac"),
+    (0, b"\x1a\x45\xdf\xa3", "webm", "audio/webm"),
+    (4, b"ftyp", "mp4", "audio/mp4"),
+    (0, b"ID3", "mp3", "audio/mpeg"),
+    (0, b"\xff\xfb", "mp3", "audio/mpeg"),
+    (0, b"\xff\xf3", "mp3", "audio/mpeg"),
+)
+CODEC_MEDIA_TYPES = {codec: media_type for _, _, codec, media_type in _SIGNATURES}
+
+
+def sniff_codec(header: bytes) -> str:
+    """Guesses the container from the first bytes of a file; 'unknown' if nothing matches."""
+    for offset, magic, codec, _ in _SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return codec
+    return "unknown"
+
+
+def wav_duration_seconds(data: bytes) -> Optional[float]:
+    """Duration of a PCM WAV from its header, without decoding; None for anything else."""
+    fmt = wav_format(data)
+    pcm = find_wav_chunk(data, b"data")
+    if not fmt or pcm is None or not fmt["sample_rate"] or not fmt["channels"] or not fmt["bits"]:
+        return None
+    return len(pcm) / (fmt["sample_rate"] * fmt["channels"] * fmt["bits"] // 8)
+
+
+def _needs_seekable_input(data: bytes) -> bool:
+    # MP4/3GPP recordings usually put the moov atom at the end, which ffmpeg
+    # cannot reach when reading from a pipe.
+    return len(data) >= 8 and data[4:8] == b"ftyp"
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int = TARGET_SAMPLE_RATE, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+async def run_ffmpeg(input_args: list, output_args: list, stdin_data: Optional[bytes]) -> bytes:
+    """Runs one ffmpeg process under the shared process limit and returns its stdout."""
+    async with _ffmpeg_slots:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error", *([] if stdin_data is not None else ["-nostdin"]),
+            *input_args, *output_args, "pipe:1",
+            stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(stdin_data), FFMPEG_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise TranscodeError("ffmpeg timed out.")
+    if process.returncode != 0:
+        raise TranscodeError(stderr.decode(errors="replace").strip() or f"ffmpeg exited with {process.returncode}")
+    return stdout
+
+
+async def decode_with_ffmpeg(data: bytes, output_args: list) -> bytes:
+    """Runs ffmpeg over arbitrary input bytes, piping them in when the container allows it."""
+    if not _needs_seekable_input(data):
+        return await run_ffmpeg(["-i", "pipe:0"], output_args, data)
+    # A private temp file (never the working directory) for containers that need seeking.
+    with tempfile.TemporaryDirectory(prefix="transcode_") as tmp_dir:
+        input_path = Path(tmp_dir) / "input"
+        await asyncio.to_thread(input_path.write_bytes, data)
+        return await run_ffmpeg(["-i", str(input_path)], output_args, None)
+
+
+async def to_asr_wav(data: bytes) -> bytes:
+    """Returns 16 kHz mono PCM WAV bytes, skipping ffmpeg if the input already is one."""
+    if is_asr_ready_wav(data):
+        return data
+    pcm = await decode_with_ffmpeg(data, ["-vn", "-acodec", "pcm_s16le", "-ar", str(TARGET_SAMPLE_RATE), "-ac", "1",
+                                          "-f", "s16le"])
+    if not pcm:
+        raise TranscodeError("ffmpeg produced no audio.")
+    return pcm16_to_wav(pcm)
+
+
+def needs_tts_encoding(data: bytes) -> bool:
+    """True if a TTS clip is still WAV and TTS_AUDIO_CODEC asks for Opus."""
+    return TTS_AUDIO_CODEC == "opus" and sniff_codec(data[:12]) == "wav"
+
+
+async def encode_tts_audio(data: bytes) -> bytes:
+    """
+    Encodes a synthesized WAV clip to mono Ogg/Opus tuned for speech. Returns the input
+    unchanged if it needs no encoding, or if ffmpeg fails (the clip is still playable).
+    """
+    if not needs_tts_encoding(data):
+        return data
+    try:
+        encoded = await run_ffmpeg(["-i", "pipe:0"], ["-vn", "-ac", "1", "-c:a", "libopus", "-b:a", TTS_OPUS_BITRATE,
+                                                      "-application", "voip", "-f", "ogg"], data)
+    except (TranscodeError, OSError) as e:
+        print(f"❌ Opus encoding failed, keeping WAV: {e}")
+        return data
+    return encoded if encoded and len(encoded) < len(data) else data
+
+
+async def to_wav(data: bytes) -> bytes:
+    """Decodes a stored clip to 16-bit mono PCM WAV for clients that ask for WAV."""
+    if sniff_codec(data[:12]) == "wav":
+        return data
+    pcm = await decode_with_ffmpeg(data, ["-vn", "-acodec", "pcm_s16le", "-ar", str(WAV_FALLBACK_SAMPLE_RATE),
+                                          "-ac", "1", "-f", "s16le"])
+    if not pcm:
+        raise TranscodeError("ffmpeg produced no audio.")
+    return pcm16_to_wav(pcm, WAV_FALLBACK_SAMPLE_RATE)
@@ -0,0 +1,104 @@
+# benchmark_asr_batching.py
+#
+# Compares today's per-request ASR path (one forward pass per request, run inline
+# on the event loop) with the micro-batching scheduler in asr_batcher.py.
+# Requests arrive open-loop (Poisson) so queueing delay shows up in the latencies.
+#
+#   python benchmark_asr_batching.py --requests 200 --rate 8 --batch-sizes 4 8 16 --wait-ms 10 25 50
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+
+from asr_batcher import ASRBatcher, TorchWav2Vec2Backend
+from main import preprocess_audio
+
+MODEL_NAME = "./indicwav2vec-hindi"
+SAMPLES = ["test_namaste.wav", "test_shukriya.wav"]
+
+
+async def load_clips(count: int, seed: int = 0) -> list:
+    """Decodes the bundled samples and cuts them to a spread of lengths."""
+    rng = random.Random(seed)
+    base = []
+    for path in SAMPLES:
+        with open(path, "rb") as f:
+            samples, _ = await preprocess_audio(f.read())
+            base.append(samples)
+    clips = []
+    for _ in range(count):
+        clip = rng.choice(base)
+        length = max(1600, int(len(clip) * rng.uniform(0.4, 1.0)))
+        clips.append(np.ascontiguousarray(clip[:length]))
+    return clips
+
+
+async def run_load(transcribe, clips: list, rate: float, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    arrivals, t = [], 0.0
+    for _ in clips:
+        t += rng.expovariate(rate)
+        arrivals.append(t)
+
+    latencies = []
+    start = loop.time()
+
+    async def one(clip, at):
+        await asyncio.sleep(max(0.0, at - (loop.time() - start)))
+        await transcribe(clip)
+        # Measured from the planned arrival, so time spent stuck behind a blocked loop counts.
+        latencies.append(loop.time() - (start + at))
+
+    await asyncio.gather(*(one(clip, at) for clip, at in zip(clips, arrivals)))
+    elapsed = loop.time() - start
+    latencies.sort()
+    return {
+        "throughput_rps": len(clips) / elapsed,
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p99_ms": 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+async def main(args):
+    processor = Wav2Vec2Processor.from_pretrained(MODEL_NAME)
+    backend = TorchWav2Vec2Backend(processor, Wav2Vec2ForCTC.from_pretrained(MODEL_NAME))
+    clips = await load_clips(args.requests)
+
+    rows = []
+
+    async def per_request(clip):
+        # Today's path: a blocking forward pass inside the request handler.
+        return backend.transcribe_batch([clip])
+
+    rows.append(("per-request (baseline)", await run_load(per_request, clips, args.rate)))
+
+    for batch_size in args.batch_sizes:
+        for wait_ms in args.wait_ms:
+            batcher = ASRBatcher(backend, max_batch_size=batch_size, max_wait_ms=wait_ms)
+            batcher.start()
+            result = await run_load(batcher.transcribe, clips, args.rate)
+            result["mean_batch"] = batcher.stats()["mean_batch_size"]
+            await batcher.stop()
+            rows.append((f"batched size={batch_size} wait={wait_ms}ms", result))
+
+    print(f"\n{args.requests} requests, Poisson arrivals at {args.rate} req/s\n")
+    print(f"{'mode':<32}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'batch':>8}")
+    for name, r in rows:
+        print(f"{name:<32}{r['throughput_rps']:>9.2f}{r['p50_ms']:>10.0f}{r['p99_ms']:>10.0f}"
+              f"{r.get('mean_batch', 1.0):>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched vs per-request ASR.")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=5.0, help="Mean arrival rate in requests per second.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[10, 25])
+    start = time.perf_counter()
+    asyncio.run(main(parser.parse_args()))
+    print(f"\nBenchmark finished in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,95 @@
+# benchmark_asr_onnx.py
+#
+# Compares the PyTorch Wav2Vec2 backend with the ONNX Runtime backends (fp32 and
+# int8) on the bundled samples. Each backend runs in its own process, so the
+# reported peak RSS is the backend's own. Reports real-time factor (processing
+# time / audio duration, lower is better), peak RSS and CER drift against torch.
+#
+#   python onnx_asr.py --model ./indicwav2vec-hindi   # export first
+#   python benchmark_asr_onnx.py --repeats 5
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import resource
+import time
+
+import jellyfish
+
+MODEL_NAME = "./indicwav2vec-hindi"
+SAMPLES = ["test_namaste.wav", "test_shukriya.wav"]
+BACKENDS = ["torch", "onnx-fp32", "onnx"]
+
+
+def _run_backend(kind: str, model_dir: str, repeats: int, results):
+    from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+
+    from asr_batcher import TorchWav2Vec2Backend
+    from main import preprocess_audio
+    from onnx_asr import OnnxWav2Vec2Backend, onnx_model_path
+
+    processor = Wav2Vec2Processor.from_pretrained(model_dir)
+    if kind == "torch":
+        backend = TorchWav2Vec2Backend(processor, Wav2Vec2ForCTC.from_pretrained(model_dir))
+    else:
+        backend = OnnxWav2Vec2Backend(processor, onnx_model_path(model_dir, quantized=kind == "onnx"))
+
+    clips = []
+    for path in SAMPLES:
+        with open(path, "rb") as f:
+            samples, _ = asyncio.run(preprocess_audio(f.read()))
+            clips.append(samples)
+    audio_seconds = sum(len(clip) for clip in clips) / 16000.0
+
+    transcripts = [backend.transcribe_batch([clip])[0] for clip in clips]  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for clip in clips:
+            backend.transcribe_batch([clip])
+    elapsed = time.perf_counter() - start
+
+    results.put({
+        "backend": kind,
+        "rtf": elapsed / (audio_seconds * repeats),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "transcripts": transcripts,
+    })
+
+
+def cer(hypothesis: str, reference: str) -> float:
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return jellyfish.levenshtein_distance(hypothesis, reference) / len(reference)
+
+
+def main(args):
+    ctx = mp.get_context("spawn")
+    rows = []
+    for kind in args.backends:
+        results = ctx.Queue()
+        process = ctx.Process(target=_run_backend, args=(kind, args.model, args.repeats, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0 or results.empty():
+            print(f"❌ Backend {kind} failed (exit code {process.exitcode}).")
+            continue
+        rows.append(results.get())
+
+    reference = next((r["transcripts"] for r in rows if r["backend"] == "torch"), None)
+    print(f"\n{'backend':<12}{'RTF':>8}{'peak RSS MB':>14}{'CER drift':>12}")
+    for r in rows:
+        drift = (sum(cer(h, ref) for h, ref in zip(r["transcripts"], reference)) / len(reference)
+                 if reference else float("nan"))
+        print(f"{r['backend']:<12}{r['rtf']:>8.3f}{r['peak_rss_mb']:>14.0f}{drift:>12.4f}")
+    print()
+    for r in rows:
+        for sample, text in zip(SAMPLES, r["transcripts"]):
+            print(f"{r['backend']:<12}{sample:<20}{text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark torch vs ONNX Runtime ASR backends.")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    main(parser.parse_args())
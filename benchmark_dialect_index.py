@@ -0,0 +1,99 @@
+# benchmark_dialect_index.py
+#
+# Builds a DialectIndex over synthetic Devanagari words (1M by default) and
+# reports build time, memory, and nearest() latency for exact, one-edit,
+# two-edit and unknown queries. A sample of lookups is checked against a brute
+# force scan over the same words.
+#
+#   python benchmark_dialect_index.py --entries 1000000 --queries 2000
+
+import argparse
+import random
+import statistics
+import time
+import resource
+
+import jellyfish
+
+from dialect_index import DialectIndex, split_aksharas
+
+CONSONANTS = "कखगघचछजझटठडढणतथदधनपफबभमयरलवशषसह"
+VOWEL_SIGNS = ["", "", "ा", "ि", "ी", "ु", "ू", "े", "ै", "ो", "ौ", "ं"]
+
+
+def random_akshara(rng: random.Random) -> str:
+    akshara = rng.choice(CONSONANTS)
+    if rng.random() < 0.15:
+        akshara += "्" + rng.choice(CONSONANTS)
+    return akshara + rng.choice(VOWEL_SIGNS)
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(random_akshara(rng) for _ in range(rng.randint(3, 8)))
+
+
+def edit(word: str, edits: int, rng: random.Random) -> str:
+    """Applies akshara-level substitutions, insertions or deletions."""
+    aksharas = split_aksharas(word)
+    for _ in range(edits):
+        op, pos = rng.random(), rng.randrange(len(aksharas))
+        if op < 0.33 and len(aksharas) > 1:
+            del aksharas[pos]
+        elif op < 0.66:
+            aksharas.insert(pos, random_akshara(rng))
+        else:
+            aksharas[pos] = random_akshara(rng)
+    return "".join(aksharas)
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {statistics.median(samples) * 1e6:7.1f} µs  p99 {p99 * 1e6:7.1f} µs"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dialect dictionary fuzzy index.")
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--verify", type=int, default=50, help="Lookups to check against a brute-force scan.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = [random_word(rng) for _ in range(args.entries)]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    start = time.perf_counter()
+    index = DialectIndex()
+    added = index.add_many(enumerate(words, 1))
+    build_seconds = time.perf_counter() - start
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    print(f"Indexed {added} distinct words in {build_seconds:.1f} s (+{rss_growth / 1024:.0f} MB RSS), {index.stats()}")
+
+    queries = {
+        "exact": [rng.choice(words) for _ in range(args.queries)],
+        "1 edit": [edit(rng.choice(words), 1, rng) for _ in range(args.queries)],
+        "2 edits": [edit(rng.choice(words), 2, rng) for _ in range(args.queries)],
+        "unknown": [random_word(rng) for _ in range(args.queries)],
+    }
+    for label, batch in queries.items():
+        timings, hits = [], 0
+        for query in batch:
+            started = time.perf_counter()
+            hits += bool(index.nearest(query))
+            timings.append(time.perf_counter() - started)
+        print(f"nearest {label:<8} {percentiles(timings)}  matched {hits / len(batch):6.1%}")
+
+    # Brute force over the encoded words must find exactly the same distances.
+    live = index.words
+    mismatches = 0
+    for query in (q for batch in queries.values() for q in rng.sample(batch, min(args.verify, len(batch)))):
+        key = index.encode(query)
+        got = [distance for _, distance in index.nearest(query, limit=len(live))]
+        if got[:1] == [0]:
+            continue
+        expected = sorted(d for d, w in ((jellyfish.levenshtein_distance(key, w), w) for w in live)
+                          if d <= index.allowed_edits(len(key), len(w)))
+        mismatches += got != expected
+    print(f"Mismatches vs brute force: {mismatches}")
@@ -0,0 +1,108 @@
+# benchmark_pronunciation.py
+#
+# Micro-benchmark of the pronunciation scorer against the previous implementation
+# (per-character dict loop + positional zip), embedded below so the comparison does
+# not depend on git history. Also checks that both produce the same Hindi phonemes.
+# The phoneme cache is cleared before every timed run, so repeated texts within a
+# run hit it, as they do in production; "uncached" converts every text from scratch.
+#
+#   python benchmark_pronunciation.py --attempts 20000
+
+import argparse
+import random
+import time
+
+import jellyfish
+
+from pronunciation_evaluator import (EXTRA_PHONEME_MAP, HINDI_PHONEME_MAP, _phonemes, evaluate_pronunciation,
+                                     evaluate_pronunciation_batch, simple_text_to_phonemes, unassigned_letters)
+
+PHRASES = ["नमस्ते", "शुक्रिया", "आप कैसे हैं", "मुझे मदद चाहिए", "बस स्टेशन कहाँ है",
+           "मुझे समझ नहीं आया", "किराया कितना है", "मैं हवाई अड्डे जाना चाहता हूँ"]
+
+
+# --- Previous implementation ---
+
+def legacy_text_to_phonemes(text: str) -> list:
+    phonemes = []
+    for char in text.replace(" ", ""):
+        if char in HINDI_PHONEME_MAP:
+            sound = HINDI_PHONEME_MAP[char]
+            if sound:
+                phonemes.append(sound)
+    return phonemes
+
+
+def legacy_accuracy(transcribed_text: str, target_text: str) -> float:
+    if not transcribed_text or not target_text:
+        return 0.0
+    distance = jellyfish.levenshtein_distance(transcribed_text, target_text)
+    max_len = max(len(transcribed_text), len(target_text))
+    return max(0, (max_len - distance) / max_len * 100)
+
+
+def legacy_evaluate(transcribed_text: str, target_text: str) -> float:
+    word_accuracy = legacy_accuracy(transcribed_text, target_text)
+    transcribed_phonemes = legacy_text_to_phonemes(transcribed_text)
+    target_phonemes = legacy_text_to_phonemes(target_text)
+    phoneme_accuracy = legacy_accuracy(" ".join(transcribed_phonemes), " ".join(target_phonemes))
+    errors = []
+    for target_ph, transcribed_ph in zip(target_phonemes, transcribed_phonemes):
+        if target_ph != transcribed_ph:
+            errors.append(f"Check your '{target_ph}' sound, you pronounced it more like '{transcribed_ph}'.")
+            if len(errors) >= 2:
+                break
+    return round(word_accuracy * 0.3 + phoneme_accuracy * 0.7, 2)
+
+
+# ---
+
+def mutate(text: str, rng: random.Random) -> str:
+    """Simulates an ASR transcript: a few dropped, inserted or swapped characters."""
+    chars = list(text)
+    for _ in range(rng.randint(0, 2)):
+        op, pos = rng.random(), rng.randrange(len(chars))
+        if op < 0.33 and len(chars) > 1:
+            del chars[pos]
+        elif op < 0.66:
+            chars.insert(pos, rng.choice(text))
+        else:
+            chars[pos] = rng.choice(text)
+    return "".join(chars)
+
+
+def timed(label: str, fn, count: int, repeat: int = 5):
+    """Best of `repeat` runs, each starting from an empty phoneme cache."""
+    runs = []
+    for _ in range(repeat):
+        _phonemes.cache_clear()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    elapsed = min(runs)
+    print(f"{label:<28} {elapsed * 1000:8.1f} ms  {elapsed / count * 1e6:7.1f} µs/attempt")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pronunciation scorer.")
+    parser.add_argument("--attempts", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    attempts = [(mutate(target, rng), target) for target in (rng.choice(PHRASES) for _ in range(args.attempts))]
+
+    # The new tables also know letters the old map skipped (e.g. candrabindu); leave those out of the check.
+    legacy_only = str.maketrans(dict.fromkeys(EXTRA_PHONEME_MAP))
+    mismatches = sum(legacy_text_to_phonemes(t) != simple_text_to_phonemes(t.translate(legacy_only))
+                     for pair in attempts for t in pair)
+    print(f"Hindi phoneme mismatches vs legacy: {mismatches}")
+    print(f"Script letters without a phoneme: {sum(len(letters) for letters in unassigned_letters().values())}")
+
+    timed("g2p legacy", lambda: [legacy_text_to_phonemes(t) for t, _ in attempts], len(attempts))
+    timed("g2p translate (uncached)", lambda: [_phonemes.__wrapped__(t, "Devanagari") for t, _ in attempts],
+          len(attempts))
+    timed("g2p translate", lambda: [simple_text_to_phonemes(t) for t, _ in attempts], len(attempts))
+    timed("evaluate legacy", lambda: [legacy_evaluate(t, g) for t, g in attempts], len(attempts))
+    timed("evaluate aligned", lambda: [evaluate_pronunciation(t, g, "hi") for t, g in attempts], len(attempts))
+    timed("evaluate aligned (batch)", lambda: evaluate_pronunciation_batch(attempts, "hi"), len(attempts))
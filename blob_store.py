@@ -0,0 +1,178 @@
+# blob_store.py
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, NamedTuple, Optional
+
+# Content-addressed storage for contribution audio, keyed by the sha256 of the
+# bytes. Identical recordings are stored once. Writes go to a temp file while the
+# hash is computed and are then renamed (or uploaded) under the final key, so a
+# blob is never visible half-written. The filesystem store is the default; set
+# BLOB_STORE_BACKEND=s3 (plus BLOB_STORE_BUCKET) for S3 or any S3-compatible
+# object store, which needs boto3.
+
+BLOB_STORE_BACKEND = os.environ.get("BLOB_STORE_BACKEND", "local")
+BLOB_STORE_DIR = Path(os.environ.get("BLOB_STORE_DIR", "blob_store"))
+BLOB_STORE_BUCKET = os.environ.get("BLOB_STORE_BUCKET", "")
+BLOB_STORE_PREFIX = os.environ.get("BLOB_STORE_PREFIX", "audio/")
+BLOB_STORE_ENDPOINT_URL = os.environ.get("BLOB_STORE_ENDPOINT_URL") or None  # e.g. MinIO or Supabase Storage
+BLOB_CHUNK_SIZE = 256 * 1024
+
+
+class BlobInfo(NamedTuple):
+    hash: str
+    size: int
+    created: bool  # False if an identical blob was already stored
+
+
+class BlobWriter:
+    """Spools chunks to a temp file while hashing them; the store decides where the result goes."""
+
+    def __init__(self, tmp_dir: Optional[Path] = None):
+        self._file = tempfile.NamedTemporaryFile(prefix="blob_", dir=tmp_dir, delete=False)
+        self.path = Path(self._file.name)
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def finish(self) -> str:
+        self._file.close()
+        return self._hash.hexdigest()
+
+    def discard(self):
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class LocalBlobStore:
+    """Blobs live at <root>/<aa>/<bb>/<sha256>."""
+
+    name = "local"
+
+    def __init__(self, root: Path = BLOB_STORE_DIR):
+        self.root = Path(root)
+        self._tmp_dir = self.root / "tmp"
+        self._tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, blob_hash: str) -> Path:
+        return self.root / blob_hash[:2] / blob_hash[2:4] / blob_hash
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self._tmp_dir)
+
+    def commit(self, writer: BlobWriter) -> BlobInfo:
+        blob_hash = writer.finish()
+        final_path = self.path_for(blob_hash)
+        if final_path.exists():
+            writer.discard()
+            return BlobInfo(blob_hash, writer.size, False)
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(writer.path, final_path)
+        return BlobInfo(blob_hash, writer.size, True)
+
+    def exists(self, blob_hash: str) -> bool:
+        return self.path_for(blob_hash).exists()
+
+    def size(self, blob_hash: str) -> Optional[int]:
+        try:
+            return self.path_for(blob_hash).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def read_range(self, blob_hash: str, start: int, length: int) -> bytes:
+        with open(self.path_for(blob_hash), "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+
+class S3BlobStore:
+    """Blobs are objects <prefix><sha256> in one bucket."""
+
+    name = "s3"
+
+    def __init__(self, bucket: str = BLOB_STORE_BUCKET, prefix: str = BLOB_STORE_PREFIX,
+                 endpoint_url: Optional[str] = BLOB_STORE_ENDPOINT_URL):
+        import boto3
+
+        if not bucket:
+            raise ValueError("BLOB_STORE_BUCKET must be set for the s3 blob store.")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def key_for(self, blob_hash: str) -> str:
+        return f"{self.prefix}{blob_hash}"
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter()
+
+    def commit(self, writer: BlobWriter) -> BlobInfo:
+        blob_hash = writer.finish()
+        try:
+            if self.exists(blob_hash):
+                return BlobInfo(blob_hash, writer.size, False)
+            self.client.upload_file(str(writer.path), self.bucket, self.key_for(blob_hash))
+            return BlobInfo(blob_hash, writer.size, True)
+        finally:
+            writer.discard()
+
+    def exists(self, blob_hash: str) -> bool:
+        return self.size(blob_hash) is not None
+
+    def size(self, blob_hash: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key_for(blob_hash))["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def read_range(self, blob_hash: str, start: int, length: int) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key_for(blob_hash),
+                                          Range=f"bytes={start}-{start + length - 1}")
+        return response["Body"].read()
+
+
+def create_blob_store():
+    """Builds the store selected by BLOB_STORE_BACKEND."""
+    if BLOB_STORE_BACKEND == "s3":
+        return S3BlobStore()
+    return LocalBlobStore()
+
+
+def write_blob(store, source: BinaryIO, chunk_size: int = BLOB_CHUNK_SIZE) -> BlobInfo:
+    """Copies a file-like object into the store chunk by chunk. Blocking."""
+    writer = store.writer()
+    try:
+        while chunk := source.read(chunk_size):
+            writer.write(chunk)
+    except BaseException:
+        writer.discard()
+        raise
+    return store.commit(writer)
+
+
+async def write_blob_async(store, source: BinaryIO, chunk_size: int = BLOB_CHUNK_SIZE) -> BlobInfo:
+    """write_blob on a worker thread, so neither reading the source nor disk/network I/O blocks the loop."""
+    return await asyncio.to_thread(write_blob, store, source, chunk_size)
+
+
+async def iter_blob(store, blob_hash: str, start: int, end: int,
+                    chunk_size: int = BLOB_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yields bytes start..end (inclusive) of a blob, one chunk at a time."""
+    position = start
+    while position <= end:
+        chunk = await asyncio.to_thread(store.read_range, blob_hash, position, min(chunk_size, end - position + 1))
+        if not chunk:
+            break
+        position += len(chunk)
+        yield chunk
@@ -0,0 +1,232 @@
+# build_translation_bundle.py
+#
+# Offline precompute for mainfinal.py: translates every lesson phrase and
+# category name into every target language, synthesizes the TTS clips, and
+# writes a translation bundle (see translation_bundle.py) that the server maps
+# at startup instead of warming its cache from the Spaces.
+#
+# Re-runs are incremental. An entry is taken from the previous bundle (or from
+# the server's SQLite cache) when its translation exists and its clip was built
+# from the same text and speaker prompt; only missing or changed entries go
+# upstream. Upstream calls run on parallel workers, each Space capped by its
+# own UpstreamService limits. Clips are stored as Ogg/Opus (TTS_AUDIO_CODEC);
+# WAV clips from earlier bundles or the SQLite cache are re-encoded on the way.
+# When a clip cannot be synthesized, the previous bundle's entry is kept as it
+# was, clip included, even if its prompt is out of date.
+#
+#   python build_translation_bundle.py                       # lessons_by_category x TARGET_LANGUAGES
+#   python build_translation_bundle.py --db --workers 16     # plus the phrases of the DB curriculum
+#   python build_translation_bundle.py --languages Hindi Tamil --force
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from audio_transcode import encode_tts_audio, needs_tts_encoding
+from mainfinal import (TARGET_LANGUAGES, database, get_speaker_description, lessons_by_category,
+                       translation_upstream, tts_upstream)
+from translation_bundle import BUNDLE_DIR, BundleWriter, TranslationBundle, tts_fingerprint
+from translation_store import CACHE_DB_FILE, TranslationStore
+from warmup import WARMUP_WORKERS, WarmupScheduler
+
+DB_CURRICULUM_QUERY = """
+SELECT c.name, p.english_translation
+FROM phrases p JOIN lessons l ON l.id = p.lesson_id JOIN categories c ON c.id = l.category_id
+WHERE p.english_translation IS NOT NULL
+ORDER BY c.id, l.id, p.id;
+"""
+
+
+async def collect_sources(include_db: bool) -> Dict[str, List[str]]:
+    """English phrases by category: the built-in lessons, optionally merged with the DB curriculum."""
+    sources = {category: list(phrases) for category, phrases in lessons_by_category.items() if category != "Custom"}
+    if include_db:
+        try:
+            for category, english in await database.fetch_all(DB_CURRICULUM_QUERY):
+                phrases = sources.setdefault(category, [])
+                if english not in phrases:
+                    phrases.append(english)
+        finally:
+            await database.close()
+    return sources
+
+
+class BundleBuilder:
+    def __init__(self, writer: BundleWriter, previous: Optional[TranslationBundle],
+                 store: Optional[TranslationStore], force: bool):
+        self.writer = writer
+        self.previous = previous
+        self.store = store
+        self.force = force
+        self.counts = Counter()
+
+    def _known_text(self, key) -> Optional[str]:
+        if self.force:
+            return None
+        entry = self.previous.get(key) if self.previous else None
+        if entry is not None:
+            return entry.text
+        return self.store.get_text(key) if self.store else None
+
+    def _known_audio(self, key, text: str, fingerprint: str) -> Optional[bytes]:
+        if self.force:
+            return None
+        entry = self.previous.get(key) if self.previous else None
+        if entry is not None and entry.audio_hash and entry.fingerprint == fingerprint:
+            return self.previous.audio_bytes(entry.audio_hash)
+        # The SQLite cache does not record the prompt a clip came from; trust it if the text matches.
+        if self.store and self.store.get_text(key) == text and self.store.has_audio(key):
+            return self.store.get_audio_bytes(key)
+        return None
+
+    def reuse_phrase(self, phrase: str, lang: str) -> bool:
+        """Copies a complete, up-to-date entry into the new bundle; False if it needs upstream work."""
+        key = (phrase, lang)
+        text = self._known_text(key)
+        if text is None:
+            return False
+        fingerprint = tts_fingerprint(text, get_speaker_description(lang))
+        audio = self._known_audio(key, text, fingerprint)
+        if audio is None or needs_tts_encoding(audio):
+            return False
+        self.writer.add(key, text, audio, fingerprint)
+        self.counts["reused"] += 1
+        return True
+
+    def reuse_category(self, category: str, lang: str) -> bool:
+        key = (category, lang)
+        text = None
+        if not self.force:
+            text = (self.previous.categories.get(key) if self.previous else None) or \
+                   (self.store.categories.get(key) if self.store else None)
+        if text is None:
+            return False
+        self.writer.categories[key] = text
+        return True
+
+    async def _translate(self, text: str, lang: str) -> str:
+        return await translation_upstream.predict(input_text=text, target_lang=lang, api_name="/translate_to_indic")
+
+    def _previous_has_audio(self, key) -> bool:
+        entry = self.previous.get(key) if self.previous else None
+        return entry is not None and bool(entry.audio_hash)
+
+    async def build_phrase(self, phrase: str, lang: str):
+        key = (phrase, lang)
+        text = self._known_text(key)
+        if text is None:
+            text = await self._translate(phrase, lang)
+            self.counts["translated"] += 1
+        description = get_speaker_description(lang)
+        fingerprint = tts_fingerprint(text, description)
+        audio = self._known_audio(key, text, fingerprint)
+        if audio is None:
+            try:
+                path = await tts_upstream.predict(text=text, description=description, api_name="/generate_finetuned")
+                audio = await asyncio.to_thread(Path(path).read_bytes) if path and Path(path).exists() else None
+            except Exception as e:
+                print(f"❌ TTS failed for '{phrase}' in {lang}: {e}")
+            if audio:
+                self.counts["synthesized"] += 1
+            elif self._previous_has_audio(key):
+                return  # carry_over keeps the previous entry and its clip; the next run retries
+            else:
+                self.counts["without_audio"] += 1  # kept as text only; the next run retries the clip
+        if audio and needs_tts_encoding(audio):
+            encoded = await encode_tts_audio(audio)
+            self.counts["encoded" if encoded is not audio else "encoding_failed"] += 1
+            audio = encoded
+        self.writer.add(key, text, audio, fingerprint)
+
+    async def build_category(self, category: str, lang: str):
+        self.writer.categories[(category, lang)] = await self._translate(category, lang)
+        self.counts["categories_translated"] += 1
+
+    def carry_over(self, phrase_keys: list, category_keys: list):
+        """Keeps the previous bundle's version of anything that could not be rebuilt, rather than dropping it."""
+        if self.previous is None:
+            return
+        for key in phrase_keys:
+            entry = self.previous.get(key)
+            if key not in self.writer.entries and entry is not None:
+                audio = self.previous.audio_bytes(entry.audio_hash) if entry.audio_hash else None
+                self.writer.add(key, entry.text, audio, entry.fingerprint)
+                self.counts["kept_stale"] += 1
+        for key in category_keys:
+            if key not in self.writer.categories and key in self.previous.categories:
+                self.writer.categories[key] = self.previous.categories[key]
+
+
+async def connect_upstreams() -> bool:
+    await asyncio.gather(translation_upstream.connect(), tts_upstream.connect())
+    return translation_upstream.available and tts_upstream.available
+
+
+async def build(out: Path, languages: List[str], include_db: bool, workers: int, force: bool, use_store: bool):
+    started = time.perf_counter()
+    sources = await collect_sources(include_db)
+    previous = TranslationBundle.load(out)
+    store = None
+    if use_store and CACHE_DB_FILE.exists():
+        store = TranslationStore()
+        store.load_index()
+
+    writer = BundleWriter(out, previous.generation + 1 if previous else 1)
+    builder = BundleBuilder(writer, previous, store, force)
+    jobs, phrase_keys, category_keys = [], [], []
+    for lang in languages:
+        for category, phrases in sources.items():
+            category_keys.append((category, lang))
+            if not builder.reuse_category(category, lang):
+                jobs.append(partial(builder.build_category, category, lang))
+            for phrase in phrases:
+                phrase_keys.append((phrase, lang))
+                if not builder.reuse_phrase(phrase, lang):
+                    jobs.append(partial(builder.build_phrase, phrase, lang))
+    print(f"{sum(len(p) for p in sources.values())} phrases x {len(languages)} languages: "
+          f"{builder.counts['reused']} up to date, {len(jobs)} jobs need the Spaces.")
+
+    try:
+        if jobs:
+            scheduler = WarmupScheduler(workers=workers)
+            await scheduler.start(jobs, prepare=connect_upstreams)
+            if scheduler.state == "skipped":
+                print("❌ Could not connect to the translation/TTS Spaces; writing what is already available.")
+            builder.counts["failed"] = scheduler.failed
+            builder.carry_over(phrase_keys, category_keys)
+        if previous:
+            previous.close()  # publishing deletes its audio file
+            previous = None
+        index_path = writer.publish()
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        if previous:
+            previous.close()
+        if store:
+            store.close()
+        for upstream in (translation_upstream, tts_upstream):
+            upstream.close()
+
+    bundle = TranslationBundle.load(out)
+    print(f"\n✅ Bundle generation {writer.generation} written to {index_path} in {time.perf_counter() - started:.1f}s")
+    print(f"   {dict(builder.counts)}")
+    print(f"   {bundle.stats()}")
+    bundle.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute translations and TTS clips into a translation bundle.")
+    parser.add_argument("--out", type=Path, default=BUNDLE_DIR)
+    parser.add_argument("--languages", nargs="+", default=TARGET_LANGUAGES)
+    parser.add_argument("--db", action="store_true", help="Also include the English phrases of the DB curriculum.")
+    parser.add_argument("--workers", type=int, default=WARMUP_WORKERS)
+    parser.add_argument("--force", action="store_true", help="Recompute every entry instead of reusing earlier ones.")
+    parser.add_argument("--no-store", action="store_true", help=f"Do not reuse entries from {CACHE_DB_FILE}.")
+    args = parser.parse_args()
+    asyncio.run(build(args.out, args.languages, args.db, args.workers, args.force, not args.no_store))
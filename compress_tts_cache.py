@@ -0,0 +1,129 @@
+# compress_tts_cache.py
+#
+# Reports how much space the cached TTS clips take and how many bytes they cost
+# on the wire, as WAV today and as Ogg/Opus. With --convert, every WAV clip in
+# the SQLite cache is re-encoded in place (new clips are encoded when they are
+# cached) and the file is vacuumed; the report then shows the real numbers.
+# Without it, Opus sizes are estimated from a sample of encoded clips.
+#
+# Converted clips get new content hashes, so /audio/{old hash} URLs that
+# clients saved earlier stop resolving; phrase responses return the new ones.
+#
+#   python compress_tts_cache.py                  # report only
+#   python compress_tts_cache.py --convert        # re-encode, vacuum, report before/after
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from audio_transcode import TTS_OPUS_BITRATE, encode_tts_audio, needs_tts_encoding, sniff_codec
+from translation_store import CACHE_DB_FILE, TranslationStore
+
+
+def file_bytes(db_path: Path) -> int:
+    """The database plus its WAL, which holds recent writes until a checkpoint."""
+    return sum(p.stat().st_size for p in (db_path, Path(f"{db_path}-wal")) if p.exists())
+
+
+def base64_bytes(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+
+def describe(label: str, sizes: List[int]):
+    """Clip sizes, as /audio response bodies and as the base64 field of a JSON phrase response."""
+    if not sizes:
+        print(f"  {label:<22} no clips")
+        return
+    inline = [base64_bytes(size) for size in sizes]
+    print(f"  {label:<22} {len(sizes):>6} clips  {sum(sizes) / 1e6:9.2f} MB  "
+          f"/audio median {statistics.median(sizes) / 1e3:7.1f} kB  "
+          f"base64 median {statistics.median(inline) / 1e3:7.1f} kB")
+
+
+def codec_sizes(store: TranslationStore) -> Dict[str, List[int]]:
+    sizes: Dict[str, List[int]] = {}
+    for _, head, size in store.audio_sizes():
+        sizes.setdefault(sniff_codec(head), []).append(size)
+    return sizes
+
+
+async def estimate(store: TranslationStore, sample: int, seed: int) -> float:
+    """Opus/WAV size ratio over a random sample of WAV clips."""
+    keys = [key for key, head, _ in store.audio_sizes() if needs_tts_encoding(head)]
+    wav_total = opus_total = 0
+    for key in random.Random(seed).sample(keys, min(sample, len(keys))):
+        audio = store.get_audio_bytes(key)
+        encoded = await encode_tts_audio(audio)
+        wav_total += len(audio)
+        opus_total += len(encoded)
+    return opus_total / wav_total if wav_total else 1.0
+
+
+async def convert(store: TranslationStore, workers: int) -> Dict[str, int]:
+    """Re-encodes every WAV clip; clips ffmpeg cannot encode stay WAV."""
+    keys = [key for key, head, _ in store.audio_sizes() if needs_tts_encoding(head)]
+    counts = {"encoded": 0, "kept_wav": 0}
+    limit = asyncio.Semaphore(workers)
+
+    async def one(key):
+        async with limit:
+            audio = await asyncio.to_thread(store.get_audio_bytes, key)
+            encoded = await encode_tts_audio(audio)
+            if encoded is audio:
+                counts["kept_wav"] += 1
+                return
+            await asyncio.to_thread(store.put, key, audio=encoded)
+            counts["encoded"] += 1
+
+    await asyncio.gather(*(one(key) for key in keys))
+    return counts
+
+
+async def main(db_path: Path, do_convert: bool, sample: int, workers: int, seed: int):
+    store = TranslationStore(db_path)
+    store.load_index()
+    try:
+        before = codec_sizes(store)
+        file_before = file_bytes(db_path)
+        print(f"{db_path}: {file_before / 1e6:.2f} MB on disk")
+        for codec, sizes in sorted(before.items()):
+            describe(codec, sizes)
+        wav_sizes = before.get("wav", [])
+        if not wav_sizes:
+            print("\nNo WAV clips left to encode.")
+            return
+
+        if not do_convert:
+            ratio = await estimate(store, sample, seed)
+            print(f"\nEstimated from {min(sample, len(wav_sizes))} clips at {TTS_OPUS_BITRATE}: "
+                  f"Opus is {ratio:.1%} of WAV")
+            describe("wav as opus (est.)", [int(size * ratio) for size in wav_sizes])
+            print("Run with --convert to re-encode the cache.")
+            return
+
+        started = time.perf_counter()
+        counts = await convert(store, workers)
+        await asyncio.to_thread(store.vacuum)
+        file_after = file_bytes(db_path)
+        print(f"\n✅ Re-encoded {counts['encoded']} clips in {time.perf_counter() - started:.1f} s "
+              f"({counts['kept_wav']} kept as WAV)")
+        print(f"{db_path}: {file_before / 1e6:.2f} MB -> {file_after / 1e6:.2f} MB on disk")
+        for codec, sizes in sorted(codec_sizes(store).items()):
+            describe(codec, sizes)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report and compress the cached TTS clips (WAV -> Ogg/Opus).")
+    parser.add_argument("--db", type=Path, default=CACHE_DB_FILE)
+    parser.add_argument("--convert", action="store_true", help="Re-encode WAV clips in place and vacuum the file.")
+    parser.add_argument("--sample", type=int, default=50, help="Clips to encode for the estimate (report only).")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args.db, args.convert, args.sample, args.workers, args.seed))
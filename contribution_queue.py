@@ -0,0 +1,174 @@
+# contribution_queue.py
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+# Durable work queue for dialect contributions. The upload endpoint only stores
+# the audio and inserts the contribution plus a contribution_jobs row in one
+# transaction, then answers 202. Workers claim jobs with FOR UPDATE SKIP LOCKED,
+# so any number of workers (in any number of processes) drain the table without
+# handing the same job out twice. Failed jobs are retried with exponential
+# backoff; jobs whose worker died are picked up again once their lock goes stale.
+# Both paths share the attempt limit: a job out of attempts is marked failed.
+
+CONTRIBUTION_WORKERS = int(os.environ.get("CONTRIBUTION_WORKERS", "2"))
+CONTRIBUTION_MAX_ATTEMPTS = int(os.environ.get("CONTRIBUTION_MAX_ATTEMPTS", "3"))
+CONTRIBUTION_RETRY_BASE_SECONDS = float(os.environ.get("CONTRIBUTION_RETRY_BASE_SECONDS", "5"))
+# Idle workers look for new jobs this often (enqueues in this process wake them immediately).
+CONTRIBUTION_POLL_SECONDS = float(os.environ.get("CONTRIBUTION_POLL_SECONDS", "2"))
+# A running job whose worker has not finished it in this long is assumed lost and re-queued.
+CONTRIBUTION_STALE_LOCK_SECONDS = float(os.environ.get("CONTRIBUTION_STALE_LOCK_SECONDS", "600"))
+
+CLAIM_QUERY = """
+UPDATE contribution_jobs
+SET status = 'running', attempts = attempts + 1, locked_at = NOW(), updated_at = NOW()
+WHERE id = (
+    SELECT id FROM contribution_jobs
+    WHERE (status = 'queued' AND available_at <= NOW())
+       OR (status = 'running' AND locked_at < NOW() - make_interval(secs => %s) AND attempts < %s)
+    ORDER BY id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+)
+RETURNING id, contribution_id, lang, denoise, attempts;
+"""
+
+# Stale jobs that already used every attempt (e.g. they keep killing their worker) are failed, not re-run.
+FAIL_STALE_QUERY = """
+UPDATE contribution_jobs
+SET status = 'failed', last_error = 'worker lost the job on its last attempt', locked_at = NULL, updated_at = NOW()
+WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => %s) AND attempts >= %s;
+"""
+
+
+class ContributionQueue:
+    """Runs `process(job)` for queued jobs on a fixed pool of asyncio workers."""
+
+    def __init__(self, db, process: Callable[[dict], Awaitable[None]], workers: int = CONTRIBUTION_WORKERS,
+                 max_attempts: int = CONTRIBUTION_MAX_ATTEMPTS, retry_base: float = CONTRIBUTION_RETRY_BASE_SECONDS,
+                 poll_interval: float = CONTRIBUTION_POLL_SECONDS, stale_lock: float = CONTRIBUTION_STALE_LOCK_SECONDS):
+        self.db = db  # DatabasePool
+        self.process = process
+        self.workers = max(0, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.poll_interval = poll_interval
+        self.stale_lock = stale_lock
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self.in_flight = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_duration: Optional[float] = None
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @staticmethod
+    async def enqueue(conn, contribution_id: int, lang: str, denoise: bool) -> int:
+        """Adds a job inside the caller's transaction, so it commits together with the contribution row."""
+        cur = await conn.execute(
+            "INSERT INTO contribution_jobs (contribution_id, lang, denoise) VALUES (%s, %s, %s) RETURNING id;",
+            (contribution_id, lang, denoise))
+        return (await cur.fetchone())[0]
+
+    def notify(self):
+        """Wakes idle workers after a local enqueue has committed."""
+        self._wakeup.set()
+
+    async def _claim(self) -> Optional[dict]:
+        async with self.db.connection() as conn:
+            cur = await conn.execute(FAIL_STALE_QUERY, (self.stale_lock, self.max_attempts))
+            if cur.rowcount:
+                self.failed += cur.rowcount
+                print(f"❌ {cur.rowcount} contribution job(s) failed: their worker was lost on the last attempt")
+            cur = await conn.execute(CLAIM_QUERY, (self.stale_lock, self.max_attempts))
+            row = await cur.fetchone()
+        if row is None:
+            return None
+        job_id, contribution_id, lang, denoise, attempts = row
+        return {"id": job_id, "contribution_id": contribution_id, "lang": lang, "denoise": denoise, "attempts": attempts}
+
+    async def _finish(self, job: dict, error: Optional[Exception]):
+        async with self.db.connection() as conn:
+            if error is None:
+                await conn.execute(
+                    "UPDATE contribution_jobs SET status = 'done', last_error = NULL, locked_at = NULL, "
+                    "updated_at = NOW() WHERE id = %s;", (job["id"],))
+            elif job["attempts"] >= self.max_attempts:
+                await conn.execute(
+                    "UPDATE contribution_jobs SET status = 'failed', last_error = %s, locked_at = NULL, "
+                    "updated_at = NOW() WHERE id = %s;", (str(error), job["id"]))
+            else:
+                delay = self.retry_base * 2 ** (job["attempts"] - 1)
+                await conn.execute(
+                    "UPDATE contribution_jobs SET status = 'queued', last_error = %s, locked_at = NULL, "
+                    "available_at = NOW() + make_interval(secs => %s), updated_at = NOW() WHERE id = %s;",
+                    (str(error), delay, job["id"]))
+
+    async def _worker(self, index: int):
+        while True:
+            # Cleared before claiming, so an enqueue that lands during the claim still wakes us.
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Contribution worker {index} could not claim a job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.in_flight += 1
+            started = time.perf_counter()
+            error = None
+            try:
+                await self.process(job)
+            except asyncio.CancelledError:
+                raise  # the stale-lock sweep re-queues it
+            except Exception as e:
+                error = e
+                print(f"❌ Contribution {job['contribution_id']} failed (attempt {job['attempts']}): {e}")
+            finally:
+                self.in_flight -= 1
+            self.last_duration = time.perf_counter() - started
+            if error is None:
+                self.completed += 1
+            elif job["attempts"] >= self.max_attempts:
+                self.failed += 1
+            else:
+                self.retried += 1
+            try:
+                await self._finish(job, error)
+            except Exception as e:
+                print(f"❌ Could not record the result of contribution job {job['id']}: {e}")
+
+    async def depth(self) -> dict:
+        """Job counts by status, straight from the table (covers every worker process)."""
+        rows = await self.db.fetch_all("SELECT status, COUNT(*) FROM contribution_jobs GROUP BY status;")
+        return {status: count for status, count in rows}
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "max_attempts": self.max_attempts,
+            "last_job_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+        }
@@ -0,0 +1,178 @@
+# curriculum_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import psycopg
+
+# Read-through cache of the whole learning curriculum (categories -> lessons ->
+# phrases). The tables change roughly once a week, when setup_lessons.py runs, so
+# the app keeps one immutable, versioned snapshot in memory and serves every
+# learning endpoint from it. Triggers installed by setup_database.py send a
+# NOTIFY on the curriculum_changed channel whenever the tables are written; a
+# listener connection picks that up and reloads the snapshot. If the listener is
+# down, snapshots older than CURRICULUM_MAX_AGE_SECONDS are reloaded on access.
+
+CURRICULUM_CHANNEL = "curriculum_changed"
+CURRICULUM_MAX_AGE_SECONDS = float(os.environ.get("CURRICULUM_MAX_AGE_SECONDS", "300"))
+# Bursts of notifications (one per statement while setup_lessons.py runs) collapse into one reload.
+CURRICULUM_RELOAD_DEBOUNCE_SECONDS = float(os.environ.get("CURRICULUM_RELOAD_DEBOUNCE_SECONDS", "1.0"))
+LISTEN_RETRY_MAX_SECONDS = 60.0
+
+CATEGORIES_QUERY = "SELECT id, name, description FROM categories ORDER BY id;"
+LESSONS_QUERY = "SELECT id, category_id, title, description FROM lessons ORDER BY id;"
+PHRASES_QUERY = "SELECT id, lesson_id, phrase_id_text, hindi_phrase, english_translation FROM phrases ORDER BY id;"
+
+
+class CurriculumSnapshot(NamedTuple):
+    version: int
+    etag: str  # strong validator: sha256 of the serialized tree, quoted
+    body: bytes  # the full tree, serialized once
+    categories: List[dict]
+    lessons_by_category: Dict[int, List[dict]]
+    phrases_by_lesson: Dict[int, List[dict]]
+    phrase_rows: List[tuple]  # (phrase_id_text, hindi_phrase), for the reference index
+    loaded_at: float
+
+
+def build_snapshot(version: int, categories: list, lessons: list, phrases: list) -> CurriculumSnapshot:
+    """Assembles a snapshot from raw rows of CATEGORIES_QUERY, LESSONS_QUERY and PHRASES_QUERY."""
+    phrases_by_lesson: Dict[int, List[dict]] = {}
+    for _, lesson_id, phrase_id, hindi, english in phrases:
+        phrases_by_lesson.setdefault(lesson_id, []).append({"id": phrase_id, "hindi": hindi, "english": english})
+    lessons_by_category: Dict[int, List[dict]] = {}
+    for lesson_id, category_id, title, description in lessons:
+        lessons_by_category.setdefault(category_id, []).append(
+            {"id": lesson_id, "title": title, "description": description})
+    category_list = [{"id": c_id, "name": name, "description": description} for c_id, name, description in categories]
+
+    tree = [
+        {**category, "lessons": [{**lesson, "phrases": phrases_by_lesson.get(lesson["id"], [])}
+                                 for lesson in lessons_by_category.get(category["id"], [])]}
+        for category in category_list
+    ]
+    body = json.dumps({"categories": tree}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return CurriculumSnapshot(
+        version=version,
+        etag=f'"{hashlib.sha256(body).hexdigest()}"',
+        body=body,
+        categories=category_list,
+        lessons_by_category=lessons_by_category,
+        phrases_by_lesson=phrases_by_lesson,
+        phrase_rows=[(phrase_id, hindi) for _, _, phrase_id, hindi, _ in phrases],
+        loaded_at=time.time(),
+    )
+
+
+class CurriculumCache:
+    """Holds the current snapshot; reloads it on NOTIFY, on expiry, or when asked."""
+
+    def __init__(self, db, conninfo: str, max_age: float = CURRICULUM_MAX_AGE_SECONDS,
+                 on_reload: Optional[Callable[[CurriculumSnapshot], Awaitable[None]]] = None):
+        self.db = db  # DatabasePool
+        self.conninfo = conninfo
+        self.max_age = max_age
+        self.on_reload = on_reload
+        self.snapshot: Optional[CurriculumSnapshot] = None
+        self.listening = False
+        self.reloads = 0
+        self.notifications = 0
+        self._lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+        self._pending_reload: Optional[asyncio.Task] = None
+        self._dirty = False
+
+    def start(self):
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        for task in (self._listener, self._pending_reload):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def get(self) -> CurriculumSnapshot:
+        snapshot = self.snapshot
+        if snapshot is None or (not self.listening and time.time() - snapshot.loaded_at > self.max_age):
+            snapshot = await self.reload(if_older_than=snapshot.loaded_at if snapshot else 0.0)
+        return snapshot
+
+    async def reload(self, if_older_than: Optional[float] = None) -> CurriculumSnapshot:
+        """Loads a fresh snapshot. Concurrent callers share one load instead of each querying."""
+        async with self._lock:
+            current = self.snapshot
+            if current is not None and if_older_than is not None and current.loaded_at > if_older_than:
+                return current  # someone else reloaded while we waited
+            async with self.db.connection() as conn:
+                rows = []
+                for query in (CATEGORIES_QUERY, LESSONS_QUERY, PHRASES_QUERY):
+                    cur = await conn.execute(query)
+                    rows.append(await cur.fetchall())
+            version = (current.version if current else 0)
+            snapshot = build_snapshot(version, *rows)
+            if current is None or snapshot.etag != current.etag:
+                snapshot = snapshot._replace(version=version + 1)
+            self.snapshot = snapshot
+            self.reloads += 1
+        if self.on_reload and (current is None or snapshot.version != current.version):
+            try:
+                await self.on_reload(snapshot)
+            except Exception as e:
+                print(f"❌ Curriculum reload hook failed: {e}")
+        return snapshot
+
+    def _schedule_reload(self):
+        self._dirty = True
+        if self._pending_reload is None or self._pending_reload.done():
+            self._pending_reload = asyncio.create_task(self._debounced_reload())
+
+    async def _debounced_reload(self):
+        # Loops so a notification that arrives mid-reload still triggers one more load.
+        while self._dirty:
+            self._dirty = False
+            await asyncio.sleep(CURRICULUM_RELOAD_DEBOUNCE_SECONDS)
+            try:
+                snapshot = await self.reload()
+                print(f"🔄 Curriculum reloaded (version {snapshot.version})")
+            except Exception as e:
+                print(f"❌ Curriculum reload failed: {e}")
+
+    async def _listen(self):
+        """Keeps a dedicated LISTEN connection open, reconnecting with jittered backoff."""
+        attempt = 0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CURRICULUM_CHANNEL};")
+                    self.listening = True
+                    attempt = 0
+                    # Anything may have changed while we were not listening.
+                    if self.snapshot is not None:
+                        self._schedule_reload()
+                    async for _ in conn.notifies():
+                        self.notifications += 1
+                        self._schedule_reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Curriculum listener disconnected: {e}")
+            finally:
+                self.listening = False
+            attempt += 1
+            await asyncio.sleep(random.uniform(0, min(LISTEN_RETRY_MAX_SECONDS, 2 ** attempt)))
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "version": snapshot.version if snapshot else 0,
+            "etag": snapshot.etag if snapshot else None,
+            "age_seconds": round(time.time() - snapshot.loaded_at, 1) if snapshot else None,
+            "listening": self.listening,
+            "reloads": self.reloads,
+            "notifications": self.notifications,
+        }
@@ -0,0 +1,213 @@
+# dialect_index.py
+
+import os
+import unicodedata
+from itertools import combinations, product
+from typing import Dict, Iterable, List, Tuple
+
+import jellyfish
+
+from pronunciation_evaluator import SCRIPT_BLOCKS, normalize_text
+
+# In-memory approximate-match index over dialect_dictionary.word, used to decide
+# whether a transcribed contribution is a genuinely rare word or just an ASR
+# spelling variant of a known one.
+#
+# Words are normalized script-aware (nukta dropped, candrabindu folded into
+# anusvara, zero-width joiners removed, ...) and split into aksharas (a base
+# letter with its vowel signs and virama-joined consonants). Distances count
+# akshara edits, like jellyfish's grapheme-level Levenshtein does elsewhere in
+# the app. Each akshara is encoded as one private-use codepoint, and the encoded
+# words are indexed by the pigeonhole principle: a word of length L is cut into
+# MAX_DISTANCE + 1 segments; each edit breaks at most one of them, so a word
+# within k edits of a query shares at least MAX_DISTANCE + 1 - k segments
+# verbatim with it, shifted by at most k positions. A lookup is therefore a few
+# dozen dict probes plus a C Levenshtein check on the handful of candidates that
+# survive, independent of dictionary size. Queries do not grow the akshara
+# table: an akshara no dictionary word contains encodes as a shared "unknown"
+# symbol, which never matches and so costs one edit.
+
+DIALECT_MAX_DISTANCE = int(os.environ.get("DIALECT_MAX_DISTANCE", "2"))
+# One edit is tolerated per this many aksharas of the shorter word, so short words must match closely.
+DIALECT_AKSHARAS_PER_EDIT = int(os.environ.get("DIALECT_AKSHARAS_PER_EDIT", "3"))
+
+_NUKTA = {block + 0x3C: None for block in SCRIPT_BLOCKS.values()}
+_CANDRABINDU = {block + 0x01: block + 0x02 for block in SCRIPT_BLOCKS.values()}
+_FOLD_TABLE = {**_NUKTA, **_CANDRABINDU, 0x200C: None, 0x200D: None}
+# Supplementary private-use planes: each codepoint is its own grapheme. Known aksharas count up from
+# the start of plane 15; the last plane-16 codepoint stands for any akshara not in the dictionary.
+_FIRST_SYMBOL = 0xF0000
+_UNKNOWN_SYMBOL = chr(0x10FFFD)
+
+
+def normalize_word(word: str) -> str:
+    """Folds spelling differences that do not change the word (case, nukta, candrabindu, ZWJ, punctuation)."""
+    decomposed = unicodedata.normalize("NFD", word).translate(_FOLD_TABLE)
+    return normalize_text(decomposed).casefold()
+
+
+def split_aksharas(word: str) -> List[str]:
+    """Splits text into aksharas: combining marks and virama-joined consonants stay with their base."""
+    clusters: List[str] = []
+    joins_next = False
+    for char in word:
+        if clusters and (joins_next or unicodedata.category(char).startswith("M")):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+        joins_next = unicodedata.combining(char) == 9  # virama
+    return clusters
+
+
+def segment_layout(length: int, parts: int) -> List[Tuple[int, int]]:
+    """Splits a length into `parts` near-equal (start, size) segments, shorter ones first."""
+    base, longer = divmod(length, parts)
+    layout, start = [], 0
+    for i in range(parts):
+        size = base + (1 if i >= parts - longer else 0)
+        layout.append((start, size))
+        start += size
+    return layout
+
+
+class DialectIndex:
+    """Approximate dictionary lookup; entries are added one at a time as the dictionary grows."""
+
+    def __init__(self, max_distance: int = DIALECT_MAX_DISTANCE, aksharas_per_edit: int = DIALECT_AKSHARAS_PER_EDIT):
+        self.max_distance = max(0, max_distance)
+        self.aksharas_per_edit = max(1, aksharas_per_edit)
+        self.parts = self.max_distance + 1
+        self.words: List[str] = []  # encoded, by slot
+        self.originals: Dict[int, str] = {}  # dictionary spelling, only where it differs from the normalized form
+        self.slots: Dict[str, int] = {}  # encoded word -> slot
+        self._symbols: Dict[str, str] = {}  # akshara -> private-use codepoint
+        self._aksharas: Dict[str, str] = {}  # the reverse, for decoding
+        self.last_id = 0  # highest dialect_dictionary.id seen, for incremental refresh
+        # (length, segment numbers) -> {concatenated segments: slot or [slots]}
+        self._segments: Dict[Tuple[int, Tuple[int, ...]], Dict[str, object]] = {}
+        self._key_layouts: Dict[int, List[Tuple[Tuple[int, ...], List[Tuple[int, int]]]]] = {}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def encode(self, word: str, learn: bool = False) -> str:
+        """
+        Normalizes a word and encodes it one codepoint per akshara. Only `learn` (used when
+        indexing) assigns new symbols; otherwise unseen aksharas encode as the unknown symbol.
+        """
+        symbols = []
+        for akshara in split_aksharas(normalize_word(word)):
+            symbol = self._symbols.get(akshara)
+            if symbol is None:
+                if not learn:
+                    symbol = _UNKNOWN_SYMBOL
+                else:
+                    symbol = self._symbols[akshara] = chr(_FIRST_SYMBOL + len(self._symbols))
+                    self._aksharas[symbol] = akshara
+            symbols.append(symbol)
+        return "".join(symbols)
+
+    def decode(self, key: str) -> str:
+        return "".join(self._aksharas.get(symbol, "\ufffd") for symbol in key)
+
+    def allowed_edits(self, length: int, other_length: int) -> int:
+        """Edits tolerated between words of these lengths (in aksharas): one per aksharas_per_edit of the shorter."""
+        return min(self.max_distance, min(length, other_length) // self.aksharas_per_edit)
+
+    def _key_layout(self, length: int) -> List[Tuple[Tuple[int, ...], List[Tuple[int, int]]]]:
+        """The segment groups a word of this length is indexed under, as (segment numbers, [(start, size)])."""
+        layout = self._key_layouts.get(length)
+        if layout is None:
+            segments = segment_layout(length, self.parts)
+            most_edits = self.allowed_edits(length, length)
+            # Short words tolerate fewer edits, so more of their segments must survive; keying them on
+            # those segments together keeps postings small where single segments are one or two aksharas.
+            layout = [(group, [segments[number] for number in group])
+                      for group in combinations(range(self.parts), self.parts - most_edits)] if most_edits else []
+            self._key_layouts[length] = layout
+        return layout
+
+    def _index_keys(self, key: str):
+        length = len(key)
+        for group, spans in self._key_layout(length):
+            yield (length, group), "".join(key[start:start + size] for start, size in spans)
+
+    def add(self, word: str, entry_id: int = 0) -> bool:
+        """Indexes a dictionary word. Returns False if its normalized form is already present."""
+        self.last_id = max(self.last_id, entry_id)
+        key = self.encode(word, learn=True)
+        if not key or key in self.slots:
+            return False
+        slot = len(self.words)
+        self.words.append(key)
+        if self.decode(key) != word:
+            self.originals[slot] = word
+        self.slots[key] = slot
+        for layout_key, segment in self._index_keys(key):
+            postings = self._segments.setdefault(layout_key, {})
+            existing = postings.get(segment)
+            # Most segments map to a single word; only shared ones pay for a list.
+            if existing is None:
+                postings[segment] = slot
+            elif isinstance(existing, list):
+                existing.append(slot)
+            else:
+                postings[segment] = [existing, slot]
+        return True
+
+    def add_many(self, rows: Iterable[Tuple[int, str]]) -> int:
+        """Adds (dialect_dictionary.id, word) rows; returns how many new words were indexed."""
+        return sum(self.add(word, entry_id) for entry_id, word in rows)
+
+    def _candidates(self, query: str) -> set:
+        length = len(query)
+        found = set()
+        for word_length in range(max(1, length - self.max_distance), length + self.max_distance + 1):
+            allowed = self.allowed_edits(length, word_length)
+            if abs(length - word_length) > allowed or not allowed:
+                continue
+            # A word within `allowed` edits still has parts - allowed of its segments intact, each shifted by at
+            # most `allowed` positions in the query, so probing every group at every such shift finds it.
+            for group, spans in self._key_layout(word_length):
+                postings = self._segments.get((word_length, group))
+                if not postings:
+                    continue
+                positions = [range(max(0, start - allowed), min(length - size, start + allowed) + 1)
+                             for start, size in spans]
+                for shifted in product(*positions):
+                    hit = postings.get("".join(query[p:p + size] for p, (_, size) in zip(shifted, spans)))
+                    if hit is None:
+                        continue
+                    if isinstance(hit, list):
+                        found.update(hit)
+                    else:
+                        found.add(hit)
+        return found
+
+    def nearest(self, word: str, limit: int = 3) -> List[Tuple[str, int]]:
+        """Known words within the allowed edit distance of `word`, closest first, as (word, distance)."""
+        query = self.encode(word)
+        if not query:
+            return []
+        exact = self.slots.get(query)
+        if exact is not None:
+            return [(self.originals.get(exact) or self.decode(query), 0)]
+        matches = []
+        for slot in self._candidates(query):
+            candidate = self.words[slot]
+            distance = jellyfish.levenshtein_distance(query, candidate)
+            if distance <= self.allowed_edits(len(query), len(candidate)):
+                matches.append((distance, candidate, slot))
+        matches.sort()
+        return [(self.originals.get(slot) or self.decode(candidate), distance)
+                for distance, candidate, slot in matches[:limit]]
+
+    def stats(self) -> dict:
+        return {
+            "words": len(self.slots),
+            "aksharas": len(self._symbols),
+            "max_distance": self.max_distance,
+            "aksharas_per_edit": self.aksharas_per_edit,
+            "last_id": self.last_id,
+            "segment_keys": sum(len(postings) for postings in self._segments.values()),
+        }
@@ -1,25 +1,46 @@
-import io
-import psycopg2
+import os
+import json
+import asyncio
+from typing import Dict, Tuple
 import numpy as np
-import torch
-import noisereduce as nr
 from datetime import datetime
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from pydub import AudioSegment
+from functools import partial
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
 
 # Import your custom logic modules
-from pronunciation_evaluator import evaluate_pronunciation
+from audio_frontend import process_audio, server_timing_header
+from audio_http import etag_matches, streaming_audio_response
+from audio_transcode import CODEC_MEDIA_TYPES, sniff_codec
+from blob_store import create_blob_store, iter_blob, write_blob_async
+from contribution_queue import ContributionQueue
+from asr_batcher import ASRBatcher, TorchWav2Vec2Backend
+from curriculum_cache import CurriculumCache, CurriculumSnapshot
+from dialect_index import DialectIndex
+from db_pool import DatabasePool, PoolTimeout, build_conninfo
+from onnx_asr import OnnxWav2Vec2Backend, onnx_model_path
+from pronunciation_evaluator import calculate_accuracy_score, evaluate_pronunciation
+from reference_index import ReferenceEntry, ReferenceIndex
+from streaming_asr import StreamingCTCDecoder
 from translation_service import TranslationService
+from tts_generator import load_tts_models, stream_speech_audio, tts_stats
+from tts_streaming import STREAM_MEDIA_TYPES
 
 # --- IMPORTANT: PASTE YOUR DATABASE CREDENTIALS HERE ---
-DB_HOST = "db.biutmpyotmmsjcnbllff.supabase.co"
-DB_PORT = "5432"
-DB_NAME = "postgres"
-DB_USER = "postgres"
-DB_PASSWORD = "aaronashutosh"
+DB_HOST = os.environ.get("DB_HOST", "db.biutmpyotmmsjcnbllff.supabase.co")
+DB_PORT = os.environ.get("DB_PORT", "5432")
+DB_NAME = os.environ.get("DB_NAME", "postgres")
+DB_USER = os.environ.get("DB_USER", "postgres")
+DB_PASSWORD = os.environ.get("DB_PASSWORD", "aaronashutosh")
 # ---
 
+# Shared async connection pool; opened at startup, sized with DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE.
+DB_CONNINFO = build_conninfo(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD)
+DB = DatabasePool(DB_CONNINFO, name="main")
+
+# Contribution audio lives in a content-addressed blob store; the table keeps only its hash and metadata.
+BLOBS = create_blob_store()
+
 # -----------------
 # 1. APP INITIALIZATION & MODEL LOADING
 # -----------------
@@ -32,8 +53,30 @@ app = FastAPI(
 
 # Global variables for our AI models
 ASR_MODELS = {}
+ASR_BATCHERS = {}
 TRANSLATION_SERVICE = None
+# Target text and phonemes for every lesson phrase, so scoring needs no DB access.
+REFERENCE_INDEX = ReferenceIndex()
 SUPPORTED_LANGUAGES = {"hi": "./indicwav2vec-hindi"}
+# Fuzzy lookup over dialect_dictionary.word for rare-word classification; topped up with new rows on use.
+DIALECT_INDEX = DialectIndex()
+DIALECT_INDEX_REFRESH_SECONDS = float(os.environ.get("DIALECT_INDEX_REFRESH_SECONDS", "30"))
+_dialect_index_lock = asyncio.Lock()
+_dialect_index_refreshed = 0.0
+# Inference backend per language: "torch", "onnx" (int8-quantized) or "onnx-fp32".
+# Set ASR_BACKEND_HI=onnx etc. after exporting with `python onnx_asr.py --model <dir>`.
+ASR_BACKENDS = {lang: os.environ.get(f"ASR_BACKEND_{lang.upper()}", "torch") for lang in SUPPORTED_LANGUAGES}
+
+def load_asr_backend(lang_code: str, model_name: str):
+    """Builds the configured backend, falling back to PyTorch if no ONNX export exists."""
+    processor = Wav2Vec2Processor.from_pretrained(model_name)
+    backend_name = ASR_BACKENDS.get(lang_code, "torch")
+    if backend_name.startswith("onnx"):
+        onnx_path = onnx_model_path(model_name, quantized=backend_name == "onnx")
+        if onnx_path.exists():
+            return OnnxWav2Vec2Backend(processor, onnx_path)
+        print(f"❌ ONNX model {onnx_path} not found for {lang_code}; falling back to PyTorch.")
+    return TorchWav2Vec2Backend(processor, Wav2Vec2ForCTC.from_pretrained(model_name))
 
 @app.on_event("startup")
 async def load_models():
@@ -45,10 +88,11 @@ async def load_models():
     print("Loading ASR model...")
     for lang_code, model_name in SUPPORTED_LANGUAGES.items():
         try:
-            processor = Wav2Vec2Processor.from_pretrained(model_name)
-            model = Wav2Vec2ForCTC.from_pretrained(model_name)
-            ASR_MODELS[lang_code] = {"processor": processor, "model": model}
-            print(f"✅ Successfully loaded ASR model for language: {lang_code}")
+            backend = load_asr_backend(lang_code, model_name)
+            ASR_MODELS[lang_code] = backend
+            ASR_BATCHERS[lang_code] = ASRBatcher(backend)
+            ASR_BATCHERS[lang_code].start()
+            print(f"✅ Successfully loaded ASR model for language: {lang_code} ({backend.name})")
         except Exception as e:
             print(f"❌ Error loading ASR model for {lang_code}: {e}")
 
@@ -60,46 +104,106 @@ async def load_models():
         print(f"❌ Critical error loading translation service: {e}")
         TRANSLATION_SERVICE = None # Ensure it's None on failure
 
+    # Load Piper voices (downloaded on first start)
+    try:
+        await asyncio.to_thread(load_tts_models)
+    except Exception as e:
+        print(f"❌ Error loading TTS models: {e}")
+
+    await DB.open()
+    load_reference_index()
+    CURRICULUM.start()
+    CONTRIBUTIONS.start()
+    try:
+        await CURRICULUM.reload()
+    except Exception as e:
+        print(f"❌ Could not load the curriculum, will retry on first request: {e}")
+    try:
+        await refresh_dialect_index(force=True)
+    except Exception as e:
+        print(f"❌ Could not load the dialect index, will retry with the first contribution: {e}")
+
     print("--- All models loaded ---")
 
 # -----------------
 # 2. HELPER FUNCTIONS
 # -----------------
 
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
+def db_error(e: Exception) -> HTTPException:
+    """Maps database failures to HTTP errors: a saturated pool is a 503, anything else a 500."""
+    if isinstance(e, PoolTimeout):
+        return HTTPException(status_code=503, detail="Database is busy, please retry.")
+    return HTTPException(status_code=500, detail=f"Database query failed: {e}")
+
+async def lookup_target_phrase(phrase_id: str) -> str:
+    """Returns the target text for a phrase ID, raising 404 if it does not exist."""
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD
-        )
-        return conn
+        result = await DB.fetch_one("SELECT hindi_phrase FROM phrases WHERE phrase_id_text = %s;", (phrase_id,))
     except Exception as e:
-        print(f"❌ Database connection failed: {e}")
-        raise HTTPException(status_code=500, detail="500: Database connection error.")
-
-def preprocess_audio(audio_bytes: bytes, target_sr: int = 16000) -> np.ndarray:
-    """Cleans, standardizes, and converts audio from any format."""
+        raise db_error(e)
+    if not result:
+        raise HTTPException(status_code=404, detail=f"404: Phrase ID '{phrase_id}' not found.")
+    return result[0]
+
+def load_reference_index():
+    """Loads the prebuilt reference index; if there is none it is built when the curriculum loads."""
+    global REFERENCE_INDEX
+    index = ReferenceIndex.load()
+    if index is not None:
+        REFERENCE_INDEX = index
+        print(f"✅ Reference index loaded ({len(index)} phrases)")
+
+async def rebuild_reference_index_from(snapshot: CurriculumSnapshot):
+    """Curriculum reload hook: derives the scoring targets from the new snapshot's phrases."""
+    global REFERENCE_INDEX
+    index = ReferenceIndex.from_rows(snapshot.phrase_rows)
+    await asyncio.to_thread(index.save)
+    REFERENCE_INDEX = index
+    print(f"✅ Reference index rebuilt: {len(index)} phrases (curriculum version {snapshot.version})")
+
+# Versioned in-memory curriculum, reloaded when the tables NOTIFY a change.
+CURRICULUM = CurriculumCache(DB, DB_CONNINFO, on_reload=rebuild_reference_index_from)
+
+async def get_curriculum() -> CurriculumSnapshot:
     try:
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        audio_segment = audio_segment.set_channels(1)
-        audio_segment = audio_segment.set_frame_rate(target_sr)
-        samples = np.array(audio_segment.get_array_of_samples()).astype(np.float32) / 32768.0
-        return nr.reduce_noise(y=samples, sr=target_sr, prop_decrease=0.8)
+        return await CURRICULUM.get()
+    except Exception as e:
+        raise db_error(e)
+
+async def get_reference(phrase_id: str) -> ReferenceEntry:
+    """Returns the precomputed target for a phrase; phrases added since the last build are fetched once."""
+    entry = REFERENCE_INDEX.get(phrase_id)
+    if entry is None:
+        entry = REFERENCE_INDEX.add(phrase_id, await lookup_target_phrase(phrase_id))
+    return entry
+
+async def refresh_dialect_index(force: bool = False):
+    """Adds dictionary rows inserted since the last refresh (all of them on the first call)."""
+    global _dialect_index_refreshed
+    async with _dialect_index_lock:
+        now = asyncio.get_running_loop().time()
+        if not force and _dialect_index_refreshed and now - _dialect_index_refreshed < DIALECT_INDEX_REFRESH_SECONDS:
+            return
+        rows = await DB.fetch_all("SELECT id, word FROM dialect_dictionary WHERE id > %s ORDER BY id;",
+                                  (DIALECT_INDEX.last_id,))
+        added = await asyncio.to_thread(DIALECT_INDEX.add_many, rows) if rows else 0
+        _dialect_index_refreshed = now
+        if added:
+            print(f"✅ Dialect index: +{added} words ({len(DIALECT_INDEX)} total)")
+
+async def preprocess_audio(audio_bytes: bytes, denoise: bool = True) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Decodes to 16 kHz mono, trims silence and optionally denoises. Also returns per-stage timings (ms)."""
+    try:
+        return await process_audio(audio_bytes, apply_denoise=denoise)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio processing failed: {e}")
 
-def transcribe_audio_data(audio_data: np.ndarray, lang: str) -> str:
-    """Performs transcription on pre-processed audio data."""
-    if lang not in ASR_MODELS:
+async def transcribe_audio_data(audio_data: np.ndarray, lang: str) -> str:
+    """Performs transcription on pre-processed audio data, batched with concurrent requests."""
+    if lang not in ASR_BATCHERS:
         raise HTTPException(status_code=400, detail=f"Unsupported language '{lang}'.")
     try:
-        processor = ASR_MODELS[lang]["processor"]
-        model = ASR_MODELS[lang]["model"]
-        inputs = processor(audio_data, sampling_rate=16000, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            logits = model(inputs.input_values, attention_mask=inputs.attention_mask).logits
-        predicted_ids = torch.argmax(logits, dim=-1)
-        return processor.batch_decode(predicted_ids)[0]
+        return await ASR_BATCHERS[lang].transcribe(audio_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
 
@@ -107,157 +211,299 @@ def transcribe_audio_data(audio_data: np.ndarray, lang: str) -> str:
 # 3. API ENDPOINTS
 # -----------------
 
+@app.on_event("shutdown")
+async def stop_batchers():
+    for batcher in ASR_BATCHERS.values():
+        await batcher.stop()
+    await CURRICULUM.stop()
+    await CONTRIBUTIONS.stop()
+    await DB.close()
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Welcome to the BhashaBuddy AI API!"}
 
-# --- Part 1: Learning Mode Endpoints ---
+@app.get("/api/v1/health/asr")
+def asr_health():
+    """Reports queue depth and batch sizes for each ASR batcher."""
+    return {lang: batcher.stats() for lang, batcher in ASR_BATCHERS.items()}
 
-@app.get("/api/v1/learning/categories")
-def get_all_categories():
-    """Fetches all learning categories from the database."""
-    conn = None
+@app.get("/api/v1/health/db")
+async def db_health():
+    """Reports connection pool size, saturation and a live round-trip check."""
+    return {"ok": await DB.check(), **DB.stats(), "curriculum": CURRICULUM.stats()}
+
+@app.get("/api/v1/health/contributions")
+async def contributions_health():
+    """Contribution queue depth by job status plus this process's worker counters."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, name, description FROM categories ORDER BY id;")
-        categories = [{"id": row[0], "name": row[1], "description": row[2]} for row in cur.fetchall()]
-        cur.close()
-        return categories
+        depth = await CONTRIBUTIONS.depth()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database query failed: {e}")
-    finally:
-        if conn: conn.close()
+        raise db_error(e)
+    return {**CONTRIBUTIONS.stats(), "jobs": depth, "dialect_index": DIALECT_INDEX.stats()}
+
+@app.get("/api/v1/health/tts")
+def tts_health():
+    """Loaded voices, synthesis cache and coalescing counters."""
+    return tts_stats()
+
+# --- Part 1: Learning Mode Endpoints ---
+
+@app.get("/api/v1/learning/curriculum")
+async def get_full_curriculum(request: Request):
+    """The whole category -> lesson -> phrase tree in one response, with a strong ETag for revalidation."""
+    snapshot = await get_curriculum()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", "X-Curriculum-Version": str(snapshot.version)}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@app.get("/api/v1/learning/categories")
+async def get_all_categories():
+    """Fetches all learning categories from the curriculum snapshot."""
+    return (await get_curriculum()).categories
 
 @app.get("/api/v1/learning/lessons/{category_id}")
-def get_lessons_for_category(category_id: int):
+async def get_lessons_for_category(category_id: int):
     """Fetches all lessons for a specific category ID."""
-    conn = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, title, description FROM lessons WHERE category_id = %s ORDER BY id;", (category_id,))
-        lessons = [{"id": row[0], "title": row[1], "description": row[2]} for row in cur.fetchall()]
-        cur.close()
-        return lessons
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database query failed: {e}")
-    finally:
-        if conn: conn.close()
+    return (await get_curriculum()).lessons_by_category.get(category_id, [])
 
 @app.get("/api/v1/learning/phrases/{lesson_id}")
-def get_phrases_for_lesson(lesson_id: int):
+async def get_phrases_for_lesson(lesson_id: int):
     """Fetches all phrases for a specific lesson ID."""
-    conn = None
+    return (await get_curriculum()).phrases_by_lesson.get(lesson_id, [])
+
+@app.get("/api/v1/tts/stream")
+async def stream_tts(lang: str, text: str = None, phrase_id: str = None, format: str = "wav"):
+    """
+    Speaks `text` (or a lesson phrase by ID), streaming audio sentence by sentence.
+    `format=pcm` sends raw 16-bit PCM described by the X-Audio-* headers.
+    """
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'.")
+    if phrase_id:
+        text = (await get_reference(phrase_id)).text
+    if not text or not text.strip():
+        raise HTTPException(status_code=400, detail="Provide text or a phrase_id.")
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT phrase_id_text, hindi_phrase, english_translation FROM phrases WHERE lesson_id = %s ORDER BY id;", (lesson_id,))
-        phrases = [{"id": row[0], "hindi": row[1], "english": row[2]} for row in cur.fetchall()]
-        cur.close()
-        return phrases
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database query failed: {e}")
-    finally:
-        if conn: conn.close()
+        return await stream_speech_audio(text, lang, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400 if "No TTS model" in str(e) else 502, detail=str(e))
 
 @app.post("/api/v1/learning/evaluate")
 async def evaluate_user_pronunciation(
+        response: Response,
         lang: str = Form(..., description="Language code (e.g., 'hi')"),
         phrase_id: str = Form(..., description="The text ID of the phrase (e.g., 'HIN_GREET_01')"),
-        audio_file: UploadFile = File(..., description="User's audio recording.")
+        audio_file: UploadFile = File(..., description="User's audio recording."),
+        denoise: bool = Form(True, description="Apply spectral noise reduction.")
 ):
     """Handles pronunciation evaluation for the learning mode."""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT hindi_phrase FROM phrases WHERE phrase_id_text = %s;", (phrase_id,))
-        result = cur.fetchone()
-        cur.close()
-        if not result:
-            raise HTTPException(status_code=404, detail=f"404: Phrase ID '{phrase_id}' not found.")
-        target_phrase = result[0]
+        reference = await get_reference(phrase_id)
 
         contents = await audio_file.read()
-        processed_audio = preprocess_audio(contents)
-        transcribed_text = transcribe_audio_data(processed_audio, lang)
+        processed_audio, timings = await preprocess_audio(contents, denoise)
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        transcribed_text = await transcribe_audio_data(processed_audio, lang)
 
         if not transcribed_text:
-            return {"transcription": "", "target_phrase": target_phrase, "score": 0, "feedback": "Could not hear you. Please speak louder."}
+            return {"transcription": "", "target_phrase": reference.text, "score": 0, "feedback": "Could not hear you. Please speak louder."}
 
-        evaluation = evaluate_pronunciation(transcribed_text, target_phrase, lang)
+        evaluation = evaluate_pronunciation(transcribed_text, reference.text, lang, reference.phonemes, reference.normalized)
         return evaluation
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
-    finally:
-        if conn: conn.close()
+
+@app.websocket("/api/v1/learning/evaluate/stream")
+async def evaluate_pronunciation_stream(websocket: WebSocket, lang: str, phrase_id: str):
+    """
+    Streaming pronunciation evaluation. The client sends binary frames of 16 kHz mono
+    16-bit little-endian PCM while recording and a text frame {"type": "stop"} when done.
+    The server replies with {"type": "partial", "transcription", "score"} messages as audio
+    is decoded, then one {"type": "final", ...evaluation} message and closes.
+    """
+    await websocket.accept()
+    if lang not in ASR_BATCHERS:
+        await websocket.send_json({"type": "error", "detail": f"Unsupported language '{lang}'."})
+        await websocket.close(code=1008)
+        return
+    try:
+        reference = await get_reference(phrase_id)
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=1008)
+        return
+
+    batcher = ASR_BATCHERS[lang]
+    decoder = StreamingCTCDecoder(ASR_MODELS[lang])
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                decoder.push(StreamingCTCDecoder.pcm16_to_float32(message["bytes"]))
+                # Decode at most one window per received chunk so a slow model falls behind
+                # gracefully: pending audio just grows and is covered by the next, larger window.
+                if decoder.ready():
+                    partial_text = await batcher.run_on_inference_thread(decoder.step_decode)
+                    await websocket.send_json({"type": "partial", "transcription": partial_text,
+                                               "score": calculate_accuracy_score(partial_text, reference.normalized)})
+            elif message.get("text") and json.loads(message["text"]).get("type") == "stop":
+                break
+
+        transcribed_text = await batcher.run_on_inference_thread(decoder.finalize)
+        if transcribed_text:
+            evaluation = evaluate_pronunciation(transcribed_text, reference.text, lang, reference.phonemes,
+                                                reference.normalized)
+        else:
+            evaluation = {"transcription": "", "target_phrase": reference.text, "score": 0,
+                          "feedback": "Could not hear you. Please speak louder."}
+        await websocket.send_json({"type": "final", "audio_seconds": decoder.samples_seen / 16000, **evaluation})
+        await websocket.close()
+    except WebSocketDisconnect:
+        return
+    except Exception as e:
+        print(f"❌ Streaming evaluation failed: {e}")
+        await websocket.send_json({"type": "error", "detail": f"Streaming evaluation failed: {e}"})
+        await websocket.close(code=1011)
+
+@app.post("/api/v1/admin/reference-index/rebuild")
+async def rebuild_reference_index():
+    """Reloads the curriculum from the database and rebuilds the phrase reference index."""
+    try:
+        snapshot = await CURRICULUM.reload()
+        if REFERENCE_INDEX.built_at < snapshot.loaded_at:  # the reload hook only runs when content changed
+            await rebuild_reference_index_from(snapshot)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reference index rebuild failed: {e}")
+    return {**REFERENCE_INDEX.stats(), "curriculum": CURRICULUM.stats()}
 
 # --- Part 2: Documenting Mode Endpoints ---
 
-@app.post("/api/v1/dialects/contribute")
+async def process_contribution(job: dict):
+    """Queue worker: transcribes a stored contribution and classifies it as common or rare."""
+    row = await DB.fetch_one("SELECT audio_hash, audio_size FROM dialect_contributions WHERE id = %s;", (job["contribution_id"],))
+    if not row:
+        return  # the contribution was deleted; nothing left to do
+    audio_hash, audio_size = row
+    audio_bytes = await asyncio.to_thread(BLOBS.read_range, audio_hash, 0, audio_size)
+    processed_audio, timings = await preprocess_audio(audio_bytes, job["denoise"])
+    asr_transcription = await transcribe_audio_data(processed_audio, job["lang"])
+
+    # A transcript within a couple of edits of a known word is an ASR spelling variant, not a rare word.
+    await refresh_dialect_index()
+    matches = DIALECT_INDEX.nearest(asr_transcription)
+    status = "pending_review" if matches else "pending_expert_validation"
+    await DB.fetch_one("""
+        UPDATE dialect_contributions
+        SET asr_transcription = %s, audio_duration_seconds = %s, status = %s::status_enum
+        WHERE id = %s
+        RETURNING status;
+        """, (asr_transcription, timings["input_seconds"], status, job["contribution_id"]))
+    nearest = f", nearest '{matches[0][0]}' at distance {matches[0][1]}" if matches else ", no known match"
+    print(f"✅ Contribution {job['contribution_id']} processed ({server_timing_header(timings)}{nearest})")
+
+# Transcription and classification run here, off the request path.
+CONTRIBUTIONS = ContributionQueue(DB, process_contribution)
+
+@app.post("/api/v1/dialects/contribute", status_code=202)
 async def contribute_dialect(
     lang: str = Form(..., description="Language code (e.g., 'hi')"),
     user_spelling: str = Form(..., description="Contributor's spelling of the word."),
     meaning: str = Form(..., description="The meaning of the word."),
     region: str = Form(..., description="The region where the word is used."),
     notes: str = Form(None, description="Any additional context or notes."),
-    audio_file: UploadFile = File(..., description="The audio recording.")
+    audio_file: UploadFile = File(..., description="The audio recording."),
+    denoise: bool = Form(True, description="Apply spectral noise reduction.")
 ):
-    """Handles user-submitted dialect contributions."""
-    conn = None
+    """
+    Stores a dialect contribution and queues it for transcription. Returns 202 at once;
+    poll the status URL for the transcription and rare-word result.
+    """
+    if lang not in SUPPORTED_LANGUAGES:
+        raise HTTPException(status_code=400, detail=f"Unsupported language '{lang}'.")
     try:
-        audio_bytes = await audio_file.read()
-        processed_audio = preprocess_audio(audio_bytes)
-        asr_transcription = transcribe_audio_data(processed_audio, lang)
+        # The upload is copied into the blob store chunk by chunk from its spooled temp file.
+        blob = await write_blob_async(BLOBS, audio_file.file)
+        await audio_file.seek(0)
+        codec = sniff_codec(await audio_file.read(16))
 
         user_id = "user_abc_123" # Hardcoded for now
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        insert_query = """
-        INSERT INTO dialect_contributions
-        (user_id, audio_data, user_spelling, asr_transcription, meaning, region, notes, status, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING id;
-        """
-        cur.execute(insert_query, (
-            user_id, audio_bytes, user_spelling, asr_transcription,
-            meaning, region, notes, 'pending_review', datetime.utcnow()
-        ))
-        new_contribution_id = cur.fetchone()[0]
-        conn.commit()
-
-        is_rare = False
-        check_query = "SELECT COUNT(*) FROM dialect_dictionary WHERE word = %s;"
-        cur.execute(check_query, (asr_transcription,))
-        count = cur.fetchone()[0]
-
-        if count == 0:
-            is_rare = True
-            update_query = "UPDATE dialect_contributions SET status = %s WHERE id = %s;"
-            cur.execute(update_query, ('pending_expert_validation', new_contribution_id))
-            conn.commit()
-
-        cur.close()
+        async with DB.connection() as conn:
+            insert_query = """
+            INSERT INTO dialect_contributions
+            (user_id, audio_hash, audio_size, audio_codec, user_spelling, meaning, region, notes, status, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id;
+            """
+            cur = await conn.execute(insert_query, (
+                user_id, blob.hash, blob.size, codec, user_spelling,
+                meaning, region, notes, 'pending_review', datetime.utcnow()
+            ), prepare=DB.prepare)
+            new_contribution_id = (await cur.fetchone())[0]
+            await ContributionQueue.enqueue(conn, new_contribution_id, lang, denoise)
+        CONTRIBUTIONS.notify()
 
         return {
-            "message": "Contribution received successfully!",
+            "message": "Contribution received! It will be transcribed shortly.",
             "contribution_id": new_contribution_id,
-            "asr_transcription": asr_transcription,
-            "is_rare_candidate": is_rare,
-            "status": 'pending_expert_validation' if is_rare else 'pending_review'
+            "status_url": f"/api/v1/dialects/contributions/{new_contribution_id}",
         }
 
+    except HTTPException as e:
+        raise e
+    except PoolTimeout as e:
+        raise db_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if conn: conn.close()
-
-
-
-
 
+@app.get("/api/v1/dialects/contributions/{contribution_id}")
+async def get_contribution_status(contribution_id: int):
+    """Processing state of a contribution; the transcription and classification appear once the job is done."""
+    try:
+        row = await DB.fetch_one("""
+            SELECT j.status, j.attempts, j.last_error, c.asr_transcription, c.status
+            FROM dialect_contributions c
+            LEFT JOIN contribution_jobs j ON j.contribution_id = c.id
+            WHERE c.id = %s
+            ORDER BY j.id DESC
+            LIMIT 1;
+            """, (contribution_id,))
+    except Exception as e:
+        raise db_error(e)
+    if not row:
+        raise HTTPException(status_code=404, detail=f"404: Contribution {contribution_id} not found.")
+    job_status, attempts, last_error, asr_transcription, status = row
+    # Contributions from before the queue have no job row and were processed inline.
+    job_status = job_status or "done"
+    result = {"contribution_id": contribution_id, "processing": job_status, "attempts": attempts or 0}
+    if job_status == "done":
+        result.update({
+            "asr_transcription": asr_transcription,
+            "is_rare_candidate": status == "pending_expert_validation",
+            "status": status,
+        })
+    elif last_error:
+        result["last_error"] = last_error
+    return result
+
+@app.get("/api/v1/dialects/contributions/{contribution_id}/audio")
+async def get_contribution_audio(contribution_id: int, request: Request):
+    """Streams a contribution's recording from the blob store, with Range and ETag support."""
+    try:
+        row = await DB.fetch_one("SELECT audio_hash, audio_codec FROM dialect_contributions WHERE id = %s;", (contribution_id,))
+    except Exception as e:
+        raise db_error(e)
+    if not row or not row[0]:
+        raise HTTPException(status_code=404, detail=f"404: No audio for contribution {contribution_id}.")
+    audio_hash, codec = row
+    size = await asyncio.to_thread(BLOBS.size, audio_hash)
+    if size is None:
+        raise HTTPException(status_code=404, detail="404: Audio blob is missing from the store.")
+    return streaming_audio_response(request, size, audio_hash, CODEC_MEDIA_TYPES.get(codec, "application/octet-stream"),
+                                    partial(iter_blob, BLOBS, audio_hash))
@@ -1,22 +1,38 @@
 import asyncio
-import json
 import base64
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+import json
+import os
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from gradio_client import Client, handle_file
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from gradio_client import handle_file
+from pydantic import BaseModel, Field
 from typing import Dict, Tuple, List, Optional
 from pathlib import Path
+from urllib.parse import urlencode
 from datetime import datetime
-import psycopg
-import subprocess
+import tempfile
+
+from audio_cache import AudioLRUCache
+from audio_http import audio_response, etag_matches, wants_wav
+from audio_transcode import CODEC_MEDIA_TYPES, encode_tts_audio, sniff_codec, to_asr_wav, to_wav, TranscodeError
+from db_pool import DatabasePool, build_conninfo
+from singleflight import SingleFlight
+from translation_bundle import TranslationBundle
+from translation_store import TranslationStore
+from tts_queue import TTSQueue, READY
+from tts_streaming import STREAM_MEDIA_TYPES, STREAM_TIMINGS, SpeechStream, split_for_tts
+from upstream import UpstreamService, CircuitOpenError
+from warmup import WarmupScheduler
 
 # =================== DATABASE CREDENTIALS ===================
-DB_HOST = "db.kgsxngrvzloaeyidprts.supabase.co"
-DB_PORT = "5432"
-DB_NAME = "postgres"
-DB_USER = "postgres"
-DB_PASSWORD = "aaronashutosh2"
+DB_HOST = os.environ.get("DB_HOST", "db.kgsxngrvzloaeyidprts.supabase.co")
+DB_PORT = os.environ.get("DB_PORT", "5432")
+DB_NAME = os.environ.get("DB_NAME", "postgres")
+DB_USER = os.environ.get("DB_USER", "postgres")
+DB_PASSWORD = os.environ.get("DB_PASSWORD", "aaronashutosh2")
 
 # =================== GRADIO CLIENT URLS ===================
 
@@ -40,12 +56,13 @@ SPEAKER_PROMPTS = {
 
 # =================== Global Variables ===================
 
-translations_cache: Dict[Tuple[str, str], Dict[str, str]] = {}
-CACHE_FILE = Path("translations_cache.json")
-
-# Category Cache Variables
-category_translations_cache: Dict[Tuple[str, str], str] = {}
-CATEGORY_CACHE_FILE = Path("categories.json")
+# Phrase translations, TTS audio and category names live in one SQLite store.
+# The legacy JSON files are only read once, to migrate them.
+translation_store: Optional[TranslationStore] = None
+# Prebuilt translations and clips (build_translation_bundle.py), mapped at startup and consulted first.
+translation_bundle: Optional[TranslationBundle] = None
+LEGACY_CACHE_FILE = Path("translations_cache.json")
+LEGACY_CATEGORY_CACHE_FILE = Path("categories.json")
 
 lessons_by_category = {
     "Greetings": ["Hello!", "Good morning!", "Good evening!", "Good night!", "Hi there!"],
@@ -57,143 +74,160 @@ lessons_by_category = {
 
 TARGET_LANGUAGES = ["Hindi", "Marathi", "Kannada", "Tamil", "Telugu"]
 
-translation_client = None
-tts_client = None
-asr_client = None
+# Each Gradio Space gets its own client pool, concurrency cap, deadline and circuit breaker.
+# Override any setting with UPSTREAM_<NAME>_<SETTING>, e.g. UPSTREAM_TTS_TIMEOUT=90.
+translation_upstream = UpstreamService.from_env("translation", TRANSLATION_APP_URL,
+                                                pool_size=2, max_concurrency=8, timeout=30.0)
+tts_upstream = UpstreamService.from_env("tts", TTS_APP_URL, pool_size=2, max_concurrency=4, timeout=120.0)
+asr_upstream = UpstreamService.from_env("asr", ASR_APP_URL, pool_size=2, max_concurrency=4, timeout=60.0, retries=1)
+UPSTREAMS = (translation_upstream, tts_upstream, asr_upstream)
 
+# Cache warm-up runs in the background once the server is already accepting traffic.
+warmup_scheduler = WarmupScheduler()
 
-# =================== Database Helper Functions ===================
+# Audio is generated by a background queue; endpoints wait for it at most this long.
+tts_queue: Optional[TTSQueue] = None
+TTS_INLINE_WAIT_SECONDS = float(os.environ.get("TTS_INLINE_WAIT_SECONDS", "10"))
 
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
-    try:
-        conn = psycopg.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        raise HTTPException(status_code=500, detail="Database connection error.")
+# Maximum number of cache misses a single batch request sends upstream at once.
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
 
+# Concurrent cache misses on the same key share a single upstream call.
+phrase_flights = SingleFlight("phrase")
+tts_flights = SingleFlight("tts")
+category_flights = SingleFlight("category")
 
-# =================== Helper Functions ===================
+# Cached clips decoded to WAV (for legacy base64 payloads and WAV-only clients), by audio hash,
+# so each clip goes through ffmpeg once rather than on every request.
+WAV_CACHE_MAX_BYTES = int(os.environ.get("WAV_CACHE_MAX_MB", "64")) * 1024 * 1024
+wav_cache = AudioLRUCache(WAV_CACHE_MAX_BYTES)
+wav_flights = SingleFlight("wav")
 
-def save_cache_to_file():
-    """Saves the main phrase translation cache."""
-    try:
-        with CACHE_FILE.open("w", encoding="utf-8") as f:
-            json.dump({f"{k[0]}||{k[1]}": v for k, v in translations_cache.items()},
-                      f, ensure_ascii=False, indent=2)
-        print(f"Cache saved to {CACHE_FILE}")
-    except IOError as e:
-        print(f"Could not save cache to file: {e}")
-
-
-def load_cache_from_file():
-    """Loads the main phrase translation cache."""
-    if not CACHE_FILE.exists():
-        print("Cache file not found. Starting with an empty cache.")
-        return
-    try:
-        with CACHE_FILE.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            for k_str, v in data.items():
-                parts = k_str.split("||")
-                if len(parts) == 2:
-                    translations_cache[(parts[0], parts[1])] = v
-        print(f"Cache loaded from {CACHE_FILE}")
-    except (IOError, json.JSONDecodeError, ValueError) as e:
-        print(f"Error loading cache file: {e}. Starting with empty cache.")
-
-
-def save_category_cache_to_file():
-    """Saves the category name translation cache."""
-    try:
-        with CATEGORY_CACHE_FILE.open("w", encoding="utf-8") as f:
-            json.dump(
-                {f"{k[0]}||{k[1]}": v for k, v in category_translations_cache.items()},
-                f, ensure_ascii=False, indent=2
-            )
-        print(f"Category cache saved to {CATEGORY_CACHE_FILE}")
-    except IOError as e:
-        print(f"Could not save category cache: {e}")
 
+# =================== Database Helper Functions ===================
+
+# Shared async pool, opened on first use: `async with database.connection() as conn: ...`
+database = DatabasePool(build_conninfo(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD), name="mainfinal")
 
-def load_category_cache_from_file():
-    """Loads the category name translation cache."""
-    if not CATEGORY_CACHE_FILE.exists():
-        print("Category cache file not found. Starting with empty.")
-        return
-    try:
-        with CATEGORY_CACHE_FILE.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            for k_str, v in data.items():
-                parts = k_str.split("||")
-                if len(parts) == 2:
-                    category_translations_cache[(parts[0], parts[1])] = v
-        print(f"Category cache loaded from {CATEGORY_CACHE_FILE}")
-    except (IOError, json.JSONDecodeError, ValueError) as e:
-        print(f"Error loading category cache: {e}. Starting with empty.")
 
+# =================== Helper Functions ===================
 
 def get_speaker_description(language: str) -> str:
     return SPEAKER_PROMPTS.get(language, "A calm voice speaks the text.")
 
 
-async def _get_tts_audio_async(translated_text: str, target_lang: str) -> Optional[str]:
+async def _get_tts_audio_async(translated_text: str, target_lang: str) -> Optional[bytes]:
+    return await tts_flights.do((translated_text, target_lang),
+                                partial(_generate_tts_audio, translated_text, target_lang))
+
+
+async def _generate_tts_audio(translated_text: str, target_lang: str) -> Optional[bytes]:
     try:
         speaker_description = get_speaker_description(target_lang)
-        result_filepath = await asyncio.to_thread(
-            tts_client.predict,
+        result_filepath = await tts_upstream.predict(
             text=translated_text,
             description=speaker_description,
             api_name="/generate_finetuned"
         )
         if result_filepath and Path(result_filepath).exists():
-            with Path(result_filepath).open("rb") as audio_file:
-                audio_content = audio_file.read()
-                return base64.b64encode(audio_content).decode('utf-8')
+            return await asyncio.to_thread(Path(result_filepath).read_bytes)
         return None
     except Exception as e:
         print(f"Failed TTS for '{translated_text}' in {target_lang}: {e}")
         return None
 
 
-async def _get_and_cache_data_sequentially(input_text: str, target_lang: str) -> None:
+async def _get_and_cache_data_sequentially(input_text: str, target_lang: str,
+                                           limits: Optional[Dict[str, asyncio.Semaphore]] = None) -> Optional[str]:
+    """
+    Stage 1: makes sure the translation is cached, then queues its audio in the
+    background TTS stage. Returns the translated text without waiting for audio.
+    """
     cache_key = (input_text, target_lang)
-    cache_entry = translations_cache.get(cache_key)
-    if cache_entry and 'text' in cache_entry and 'audio' in cache_entry:
-        return
-    if not cache_entry:
-        cache_entry = {}
+    if translation_store.get_text(cache_key) is None:
+        await phrase_flights.do(cache_key, partial(_translate_and_cache, input_text, target_lang, limits))
+    if translation_store.get_text(cache_key) is not None and not translation_store.has_audio(cache_key) and tts_upstream.available:
+        tts_queue.enqueue(cache_key)
+    return translation_store.get_text(cache_key)
 
-    # Translate text
-    if 'text' not in cache_entry and translation_client:
-        try:
-            translation_text = await asyncio.to_thread(
-                translation_client.predict,
+
+async def _translate_and_cache(input_text: str, target_lang: str,
+                               limits: Optional[Dict[str, asyncio.Semaphore]] = None) -> None:
+    limits = limits or {}
+    if not translation_upstream.available:
+        return
+    try:
+        async with limits.get("translation") or nullcontext():
+            translation_text = await translation_upstream.predict(
                 input_text=input_text,
                 target_lang=target_lang,
                 api_name="/translate_to_indic"
             )
-            cache_entry['text'] = translation_text
-        except Exception as e:
-            print(f"Failed translation for '{input_text}' in {target_lang}: {e}")
-            return
-
-    # Generate TTS
-    if 'audio' not in cache_entry and 'text' in cache_entry and tts_client:
-        tts_audio_base64 = await _get_tts_audio_async(cache_entry['text'], target_lang)
-        if tts_audio_base64:
-            cache_entry['audio'] = tts_audio_base64
-
-    if 'text' in cache_entry and 'audio' in cache_entry:
-        translations_cache[cache_key] = cache_entry
-        save_cache_to_file()
+    except Exception as e:
+        print(f"Failed translation for '{input_text}' in {target_lang}: {e}")
+        return
+    # The text is kept even if TTS later fails for it.
+    await asyncio.to_thread(translation_store.put, (input_text, target_lang), translation_text)
+
+
+async def _synthesize_and_cache(cache_key: Tuple[str, str]) -> bool:
+    """Stage 2, run by the TTS queue workers: generates and stores audio for a cached translation."""
+    if translation_store.has_audio(cache_key):
+        return True
+    translated_text = translation_store.get_text(cache_key)
+    if translated_text is None:
+        return False
+    tts_audio = await _get_tts_audio_async(translated_text, cache_key[1])
+    if not tts_audio:
+        return False
+    # Stored (and served) as Ogg/Opus; see audio_transcode.TTS_AUDIO_CODEC.
+    tts_audio = await encode_tts_audio(tts_audio)
+    await asyncio.to_thread(translation_store.put, cache_key, audio=tts_audio)
+    return True
+
+
+async def _clip_as_wav(audio_hash: str) -> Optional[bytes]:
+    """A cached clip as WAV, decoded once per hash. None if the clip is gone. Raises TranscodeError."""
+    wav = wav_cache.get(audio_hash)
+    if wav is not None:
+        return wav
+
+    async def decode() -> Optional[bytes]:
+        clip = await asyncio.to_thread(translation_store.get_audio_by_hash, audio_hash)
+        if clip is None:
+            return None
+        if sniff_codec(clip[:12]) == "wav":
+            return clip  # nothing to decode, and the store already holds it
+        decoded = await to_wav(clip)
+        wav_cache.put(audio_hash, decoded)
+        return decoded
+
+    return await wav_flights.do(audio_hash, decode)
+
+
+async def _audio_payload(cache_key: Tuple[str, str], wait_seconds: float, include_base64: bool = False) -> dict:
+    """
+    The audio part of a phrase response: the /audio/{hash} URL if the clip is ready
+    within `wait_seconds`, otherwise a status and a URL the client can poll.
+    Base64 audio is only inlined for clients that ask for it, as WAV like it always was.
+    """
+    if not translation_store.has_audio(cache_key):
+        await tts_queue.wait(cache_key, wait_seconds)
+    audio_hash = translation_store.get_audio_hash(cache_key)
+    payload = {
+        "audio_status": READY if audio_hash else (tts_queue.status(cache_key) or "unavailable"),
+        "audio_url": f"/audio/{audio_hash}" if audio_hash else None,
+        "audio_poll_url": "/translate/audio/?" + urlencode({"phrase": cache_key[0], "target_lang": cache_key[1]}),
+    }
+    if include_base64:
+        audio = None
+        if audio_hash:
+            try:
+                audio = await _clip_as_wav(audio_hash)
+            except (TranscodeError, OSError) as e:
+                print(f"❌ Could not decode clip {audio_hash} to WAV: {e}")
+        payload["indic_audio_base64"] = base64.b64encode(audio).decode("utf-8") if audio else None
+    return payload
 
 
 def _add_to_custom_category(phrase: str):
@@ -201,61 +235,87 @@ def _add_to_custom_category(phrase: str):
         lessons_by_category["Custom"].append(phrase)
 
 
-async def translate_category_name(category_name: str, target_lang: str) -> str:
+async def translate_category_name(category_name: str, target_lang: str,
+                                  limits: Optional[Dict[str, asyncio.Semaphore]] = None) -> str:
     cache_key = (category_name, target_lang)
-    if cache_key in category_translations_cache:
-        return category_translations_cache[cache_key]
-    if not translation_client:
+    if cache_key in translation_store.categories:
+        return translation_store.categories[cache_key]
+    if not translation_upstream.available:
         return category_name
+    return await category_flights.do(cache_key, partial(_translate_category_upstream, category_name, target_lang, limits))
+
+
+async def _translate_category_upstream(category_name: str, target_lang: str,
+                                       limits: Optional[Dict[str, asyncio.Semaphore]] = None) -> str:
+    limits = limits or {}
+    cache_key = (category_name, target_lang)
     try:
-        translated_text = await asyncio.to_thread(
-            translation_client.predict,
-            input_text=category_name,
-            target_lang=target_lang,
-            api_name="/translate_to_indic"
-        )
-        category_translations_cache[cache_key] = translated_text
-        save_category_cache_to_file()
+        async with limits.get("translation") or nullcontext():
+            translated_text = await translation_upstream.predict(
+                input_text=category_name,
+                target_lang=target_lang,
+                api_name="/translate_to_indic"
+            )
+        await asyncio.to_thread(translation_store.put_category, cache_key, translated_text)
         return translated_text
     except Exception as e:
         print(f"Failed to translate category '{category_name}' to {target_lang}: {e}")
         return category_name
 
 
+# =================== Warm-up ===================
+
+async def _load_gradio_clients() -> bool:
+    """Connects the upstream client pools in parallel. Returns True if warm-up can proceed."""
+    await asyncio.gather(*(upstream.connect() for upstream in UPSTREAMS))
+    return translation_upstream.available and tts_upstream.available
+
+
+def _warmup_jobs():
+    """One job per (phrase, language) and per (category, language) for the built-in lessons not yet cached."""
+    limits = warmup_scheduler.limits
+    for target_lang in TARGET_LANGUAGES:
+        for category, phrases in lessons_by_category.items():
+            if category == "Custom":
+                continue
+            for phrase in phrases:
+                if not translation_store.is_complete((phrase, target_lang)):
+                    yield partial(_get_and_cache_data_sequentially, phrase, target_lang, limits)
+            if (category, target_lang) not in translation_store.categories:
+                yield partial(translate_category_name, category, target_lang, limits)
+
+
 # =================== FastAPI Setup ===================
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global translation_client, tts_client, asr_client
-    load_cache_from_file()
-    load_category_cache_from_file()
-    print("Starting Gradio clients and pre-caching...")
-    try:
-        translation_client = Client(TRANSLATION_APP_URL)
-        tts_client = Client(TTS_APP_URL)
-        asr_client = Client(ASR_APP_URL)
-        print("Gradio clients loaded successfully.")
-    except Exception as e:
-        print(f"Error loading Gradio clients: {e}")
-        translation_client = None
-        tts_client = None
-        asr_client = None
-
-    if translation_client and tts_client:
-        for target_lang in TARGET_LANGUAGES:
-            for category, phrases in lessons_by_category.items():
-                if category == "Custom":
-                    continue
-                for phrase in phrases:
-                    await _get_and_cache_data_sequentially(phrase, target_lang)
-            for category in lessons_by_category.keys():
-                if category == "Custom":
-                    continue
-                await translate_category_name(category, target_lang)
+    global translation_store, translation_bundle, tts_queue
+    translation_store = TranslationStore()
+    await asyncio.to_thread(translation_store.migrate_json, LEGACY_CACHE_FILE, LEGACY_CATEGORY_CACHE_FILE)
+    await asyncio.to_thread(translation_store.load_index)
+    translation_bundle = await asyncio.to_thread(TranslationBundle.load)
+    if translation_bundle is not None:
+        translation_store.attach_bundle(translation_bundle)
+    tts_queue = TTSQueue(_synthesize_and_cache)
+    tts_queue.start()
+    jobs = list(_warmup_jobs())
+    if jobs:
+        print(f"Starting Gradio clients and pre-caching {len(jobs)} entries in the background...")
+        warmup_scheduler.start(jobs, prepare=_load_gradio_clients)
+    else:
+        # Nothing to warm up: the Spaces are only contacted for requests the bundle cannot answer.
+        print("✅ Bundle and cache cover the curriculum; Gradio clients connect on first use.")
+        warmup_scheduler.start(jobs)
 
     yield
-    save_cache_to_file()
-    save_category_cache_to_file()
+    await warmup_scheduler.stop()
+    await tts_queue.stop()
+    translation_store.close()
+    if translation_bundle is not None:
+        translation_bundle.close()
+    await database.close()
+    for upstream in UPSTREAMS:
+        upstream.close()
     print("Application shutdown: Clients released.")
 
 
@@ -275,6 +335,40 @@ def read_root():
     return {"message": "Welcome to the BGB client app! Go to /docs to use the translation API."}
 
 
+@app.get("/health/upstreams", summary="Upstream Pool and Circuit Breaker State")
+def upstream_health():
+    return {u.name: u.stats() for u in UPSTREAMS}
+
+
+@app.get("/health/db", summary="Database Pool State")
+async def db_health():
+    return {"ok": await database.check(), **database.stats()}
+
+
+@app.get("/health/ready", summary="Readiness and Warm-up Progress")
+def readiness():
+    clients = {
+        "translation": translation_upstream.available,
+        "tts": tts_upstream.available,
+        "asr": asr_upstream.available,
+    }
+    ready = clients["translation"] and clients["tts"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "clients": clients,
+            "upstreams": {u.name: u.stats() for u in UPSTREAMS},
+            "warmup": warmup_scheduler.progress(),
+            "bundle": translation_bundle.stats() if translation_bundle is not None else None,
+            "tts_queue": tts_queue.stats(),
+            "coalescing": {f.name: f.stats() for f in (phrase_flights, tts_flights, category_flights, wav_flights)},
+            "wav_cache": wav_cache.stats(),
+            "tts_streams": STREAM_TIMINGS.stats(),
+        },
+    )
+
+
 # =================== Lessons Endpoint ===================
 
 @app.get("/lessons/", summary="Get All Lessons")
@@ -302,39 +396,228 @@ async def get_lessons(target_lang: Optional[str] = None):
 
 # =================== Phrase Translation ===================
 
+AUDIO_WAIT_QUERY = Query(TTS_INLINE_WAIT_SECONDS, ge=0, le=60,
+                         description="Seconds to wait for audio before returning it as a pollable handle.")
+BASE64_QUERY = Query(False, description="Also inline the clip as base64 WAV (legacy clients).")
+
+
 @app.get("/translate/lesson/{category_name}/{phrase_number}")
-async def translate_text_by_lesson(category_name: str, phrase_number: int, target_lang: str):
+async def translate_text_by_lesson(category_name: str, phrase_number: int, target_lang: str,
+                                   audio_wait: float = AUDIO_WAIT_QUERY, include_audio_base64: bool = BASE64_QUERY):
     if category_name not in lessons_by_category:
         raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found.")
     phrases = lessons_by_category[category_name]
     if not (0 <= phrase_number < len(phrases)):
         raise HTTPException(status_code=404, detail=f"Phrase number {phrase_number} not found.")
     input_text = phrases[phrase_number]
-    await _get_and_cache_data_sequentially(input_text, target_lang)
-    cache_entry = translations_cache.get((input_text, target_lang), {})
+    indic_text = await _get_and_cache_data_sequentially(input_text, target_lang)
     return {
         "category": category_name,
         "english_sentence": input_text,
-        "indic_sentence": cache_entry.get('text'),
-        "indic_audio_base64": cache_entry.get('audio')
+        "indic_sentence": indic_text,
+        **await _audio_payload((input_text, target_lang), audio_wait, include_audio_base64)
     }
 
 
 @app.get("/translate/custom/")
-async def translate_custom_phrase(phrase: str, target_lang: str):
+async def translate_custom_phrase(phrase: str, target_lang: str, audio_wait: float = AUDIO_WAIT_QUERY,
+                                  include_audio_base64: bool = BASE64_QUERY):
     _add_to_custom_category(phrase)
-    await _get_and_cache_data_sequentially(phrase, target_lang)
-    cache_entry = translations_cache.get((phrase, target_lang), {})
+    indic_text = await _get_and_cache_data_sequentially(phrase, target_lang)
     return {
         "category": "Custom",
         "english_sentence": phrase,
-        "indic_sentence": cache_entry.get('text'),
-        "indic_audio_base64": cache_entry.get('audio')
+        "indic_sentence": indic_text,
+        **await _audio_payload((phrase, target_lang), audio_wait, include_audio_base64)
     }
 
 
+@app.get("/translate/audio/", summary="Poll for Phrase Audio")
+async def get_phrase_audio(phrase: str, target_lang: str,
+                           audio_wait: float = Query(0, ge=0, le=60, description="Seconds to wait for audio."),
+                           include_audio_base64: bool = BASE64_QUERY):
+    cache_key = (phrase, target_lang)
+    if translation_store.get_text(cache_key) is None:
+        raise HTTPException(status_code=404, detail="No translation cached for this phrase yet.")
+    if not translation_store.has_audio(cache_key) and tts_upstream.available:
+        # Re-queues failed jobs once their retry cooldown has passed.
+        tts_queue.enqueue(cache_key)
+    return await _audio_payload(cache_key, audio_wait, include_audio_base64)
+
+
+async def _clip_response(request: Request, audio_hash: str, requested_format: Optional[str] = None) -> Response:
+    """
+    Serves a cached clip in its stored format (Ogg/Opus for new clips), or decoded to
+    WAV for clients that ask for it. The WAV variant has its own ETag (also for clips
+    stored as WAV, so the revalidation check below never needs the stored codec).
+    """
+    want_wav = wants_wav(request.headers.get("accept"), requested_format)
+    etag = f"{audio_hash}.wav" if want_wav else audio_hash
+    vary = {"Vary": "Accept"}
+    # The hash is the ETag, so a matching revalidation never touches the store. Only the
+    # WAV variant's type is known without reading the clip; a 304 may omit Content-Type.
+    if etag_matches(request.headers.get("if-none-match"), f'"{etag}"'):
+        response = audio_response(request, b"", etag, "audio/wav" if want_wav else None)
+        response.headers.update(vary)
+        return response
+    if want_wav:
+        try:
+            data, codec = await _clip_as_wav(audio_hash), "wav"
+        except (TranscodeError, OSError) as e:
+            raise HTTPException(status_code=500, detail=f"Could not convert audio to WAV: {e}")
+    else:
+        data = await asyncio.to_thread(translation_store.get_audio_by_hash, audio_hash)
+        codec = sniff_codec(data[:12]) if data is not None else None
+    if data is None:
+        raise HTTPException(status_code=404, detail="Audio not found.")
+    response = audio_response(request, data, etag, CODEC_MEDIA_TYPES.get(codec, "application/octet-stream"))
+    response.headers.update(vary)
+    return response
+
+
+CLIP_FORMAT_QUERY = Query(None, pattern="^(ogg|wav)$",
+                          description="'wav' for WAV; by default the stored format, unless Accept asks for WAV only.")
+
+
+@app.get("/audio/{audio_hash}", summary="Get Audio by Content Hash")
+async def get_audio(audio_hash: str, request: Request, format: Optional[str] = CLIP_FORMAT_QUERY):
+    if not translation_store.has_audio_hash(audio_hash):
+        raise HTTPException(status_code=404, detail="Audio not found.")
+    return await _clip_response(request, audio_hash, format)
+
+
+@app.get("/tts/stream", summary="Stream Speech Sentence by Sentence")
+async def stream_phrase_audio(request: Request, phrase: str, target_lang: str,
+                              format: Optional[str] = Query(None, description="'wav', or 'pcm' for raw 16-bit PCM.")):
+    """
+    Translates the phrase if needed and streams its speech: each sentence or clause
+    is synthesized separately and sent as soon as it is ready, so playback of a long
+    phrase starts after its first segment. A clip that is already cached is returned
+    whole, in its stored format unless WAV was asked for.
+    """
+    if format is not None and format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'.")
+    cache_key = (phrase, target_lang)
+    if translation_store.get_text(cache_key) is None:
+        await phrase_flights.do(cache_key, partial(_translate_and_cache, phrase, target_lang))
+    indic_text = translation_store.get_text(cache_key)
+    if indic_text is None:
+        raise HTTPException(status_code=503, detail="Translation service unavailable.")
+
+    audio_hash = translation_store.get_audio_hash(cache_key)
+    if audio_hash and format != "pcm":
+        return await _clip_response(request, audio_hash, format)
+    format = format or "wav"
+    if not tts_upstream.available:
+        raise HTTPException(status_code=503, detail="TTS service unavailable.")
+
+    stream = SpeechStream(split_for_tts(indic_text), lambda segment: _get_tts_audio_async(segment, target_lang),
+                          label=f"parler/{target_lang}")
+    try:
+        await stream.open()
+    except ValueError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return StreamingResponse(stream.body(format), media_type=STREAM_MEDIA_TYPES[format],
+                             headers=stream.headers(format))
+
+
+# =================== Batch Translation ===================
+
+class BatchTranslationRequest(BaseModel):
+    phrases: List[str] = Field(default_factory=list, description="English phrases to translate.")
+    categories: List[str] = Field(default_factory=list,
+                                  description="Lesson categories; expands to their phrases and their own name.")
+    target_langs: List[str] = Field(..., min_length=1, description="Indic languages to translate into.")
+
+
+def _batch_phrase_result(phrase: str, target_lang: str, category: Optional[str], audio: dict) -> dict:
+    return {
+        "type": "phrase",
+        "category": category,
+        "english_sentence": phrase,
+        "target_lang": target_lang,
+        "indic_sentence": translation_store.get_text((phrase, target_lang)),
+        **audio,
+    }
+
+
+async def _batch_phrase_job(phrase: str, target_lang: str, category: Optional[str], limit: asyncio.Semaphore) -> dict:
+    async with limit:
+        await _get_and_cache_data_sequentially(phrase, target_lang)
+    return _batch_phrase_result(phrase, target_lang, category, await _audio_payload((phrase, target_lang), 0))
+
+
+async def _batch_category_job(category: str, target_lang: str, limit: asyncio.Semaphore) -> dict:
+    async with limit:
+        translated = await translate_category_name(category, target_lang)
+    return {"type": "category", "english_category": category, "target_lang": target_lang,
+            "translated_category": translated}
+
+
+@app.post("/translate/batch", summary="Translate Many Phrases into Many Languages (NDJSON)")
+async def translate_batch(request: BatchTranslationRequest):
+    """
+    Streams one JSON object per line: cache hits first, in a single pass, then
+    each miss as soon as it completes. Audio is returned as a URL or a poll handle.
+    """
+    unknown = [c for c in request.categories if c not in lessons_by_category]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Categories not found: {unknown}")
+
+    # Deduplicate (phrase, language) pairs, remembering which category each came from.
+    items: Dict[Tuple[str, str], Optional[str]] = {}
+    for category in request.categories:
+        for phrase in lessons_by_category[category]:
+            for target_lang in request.target_langs:
+                items.setdefault((phrase, target_lang), category)
+    for phrase in request.phrases:
+        if not any(phrase in phrases for phrases in lessons_by_category.values()):
+            _add_to_custom_category(phrase)
+        for target_lang in request.target_langs:
+            items.setdefault((phrase, target_lang), None)
+
+    hits, misses = [], []
+    for (phrase, target_lang), category in items.items():
+        (hits if translation_store.get_text((phrase, target_lang)) is not None else misses).append(
+            (phrase, target_lang, category))
+    category_keys = [(c, lang) for c in request.categories for lang in request.target_langs]
+    category_misses = [key for key in category_keys if key not in translation_store.categories]
+
+    async def stream():
+        for category, target_lang in category_keys:
+            if (category, target_lang) in translation_store.categories:
+                yield json.dumps({"type": "category", "english_category": category, "target_lang": target_lang,
+                                  "translated_category": translation_store.categories[(category, target_lang)]},
+                                 ensure_ascii=False) + "\n"
+        for phrase, target_lang, category in hits:
+            result = _batch_phrase_result(phrase, target_lang, category, await _audio_payload((phrase, target_lang), 0))
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+        # Misses are grouped by language so each language's requests reach the upstream together.
+        limit = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+        jobs = [_batch_category_job(c, lang, limit) for c, lang in category_misses]
+        jobs += [_batch_phrase_job(phrase, lang, category, limit)
+                 for phrase, lang, category in sorted(misses, key=lambda m: m[1])]
+        tasks = [asyncio.create_task(job) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 # =================== Pronunciation Evaluation (FINAL FIX FOR ASR CRASH) ===================
 
+def _write_private_temp_wav(wav_bytes: bytes) -> Path:
+    """Writes to a unique file in the system temp dir, so concurrent uploads never collide."""
+    with tempfile.NamedTemporaryFile(prefix="asr_", suffix=".wav", delete=False) as tmp:
+        tmp.write(wav_bytes)
+    return Path(tmp.name)
+
+
 @app.post("/evaluate/lesson/{category_name}/{phrase_number}/pronounce")
 async def evaluate_lesson_phrase_pronunciation(
         category_name: str,
@@ -343,10 +626,8 @@ async def evaluate_lesson_phrase_pronunciation(
         audio_file: UploadFile = File(..., description="User audio recording (MP4/3GPP expected)."),
         selected_model: str = "IndicConformer"
 ):
-    import subprocess  # Import subprocess for FFmpeg
-
-    if asr_client is None:
-        raise HTTPException(status_code=503, detail="ASR client not initialized.")
+    if not asr_upstream.available:
+        raise HTTPException(status_code=503, detail="ASR service is unavailable.")
     if category_name not in lessons_by_category:
         raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found.")
     phrases = lessons_by_category[category_name]
@@ -354,40 +635,23 @@ async def evaluate_lesson_phrase_pronunciation(
         raise HTTPException(status_code=404, detail=f"Phrase number {phrase_number} not found.")
 
     english_reference_text = phrases[phrase_number]
-    await _get_and_cache_data_sequentially(english_reference_text, target_lang)
-    cache_entry = translations_cache.get((english_reference_text, target_lang), {})
-    indic_reference_text = cache_entry.get('text')
+    indic_reference_text = await _get_and_cache_data_sequentially(english_reference_text, target_lang)
 
     if not indic_reference_text:
         raise HTTPException(status_code=500, detail=f"Missing translation for {target_lang}.")
 
-    file_stem = Path(audio_file.filename).stem
-    received_file_path = Path(f"temp_received_{file_stem}_input")
-    wav_file_path = Path(f"temp_converted_{file_stem}.wav")
+    wav_file_path: Optional[Path] = None
 
     try:
-        # 1. Save the incoming audio file
+        # 1. Read the upload and convert it in memory (skipped if it is already 16 kHz mono PCM WAV)
         contents = await audio_file.read()
-        await asyncio.to_thread(received_file_path.write_bytes, contents)
-
-        # 2. CONVERSION STEP: Use FFmpeg to convert the received file to WAV
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-i", str(received_file_path),  # Input file
-                "-acodec", "pcm_s16le",  # Output codec: Uncompressed PCM
-                "-ar", "16000",  # Sample rate: 16kHz (Standard for speech recognition)
-                "-ac", "1",  # Channels: Mono
-                str(wav_file_path)  # Output file: .wav
-            ],
-            check=True,  # Raise CalledProcessError if FFmpeg fails
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        wav_bytes = await to_asr_wav(contents)
+
+        # 2. The Gradio client uploads from a path, so hand it a private, uniquely named temp file
+        wav_file_path = await asyncio.to_thread(_write_private_temp_wav, wav_bytes)
 
         # 3. Send the converted WAV file to the ASR client
-        result = await asyncio.to_thread(
-            asr_client.predict,
+        result = await asr_upstream.predict(
             audio_file=handle_file(str(wav_file_path)),  # Pass the converted WAV file
             selected_language=target_lang,
             selected_models=[selected_model],
@@ -395,7 +659,7 @@ async def evaluate_lesson_phrase_pronunciation(
             api_name="/transcribe_audio"
         )
 
-        # 4. Process ASR Result
+        # Process ASR Result
         if not isinstance(result, tuple) or len(result) < 2 or not isinstance(result[1], dict):
             raise HTTPException(status_code=500, detail="Invalid response format from ASR model.")
 
@@ -450,16 +714,20 @@ async def evaluate_lesson_phrase_pronunciation(
             }
         except (ValueError, TypeError):
             raise HTTPException(status_code=500, detail="Failed to parse WER/CER from ASR model output.")
-    except subprocess.CalledProcessError as e:
+    except TranscodeError as e:
         # Handle conversion error
-        print(f"FFmpeg conversion failed: {e.stderr.decode()}")
+        print(f"FFmpeg conversion failed: {e}")
         raise HTTPException(status_code=500, detail=f"Audio processing failed (FFmpeg conversion error).")
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="ASR service timed out.")
     except Exception as e:
         print(f"Error during pronunciation evaluation: {e}")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
     finally:
-        # 5. Cleanup both temporary files
-        if received_file_path.exists():
-            await asyncio.to_thread(received_file_path.unlink)
-        if wav_file_path.exists():
-            await asyncio.to_thread(wav_file_path.unlink)
+        # 4. Cleanup the temporary file
+        if wav_file_path is not None:
+            await asyncio.to_thread(wav_file_path.unlink, True)
@@ -0,0 +1,68 @@
+# migrate_contribution_audio.py
+#
+# Moves existing dialect_contributions.audio_data BYTEA values into the blob store
+# and records audio_hash / audio_size / audio_duration_seconds / audio_codec
+# instead. Rows are processed one at a time in id order and committed
+# individually, so the script can be stopped and re-run at any point. Run
+# setup_database.py first to add the new columns.
+#
+#   python migrate_contribution_audio.py               # migrate and clear audio_data
+#   python migrate_contribution_audio.py --keep-bytea  # copy only, leave audio_data in place
+
+import argparse
+import io
+
+import psycopg2
+
+from audio_transcode import sniff_codec, wav_duration_seconds
+from blob_store import create_blob_store, write_blob
+from setup_lessons import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+
+
+def migrate(keep_bytea: bool = False, limit: int = 0):
+    store = create_blob_store()
+    conn = psycopg2.connect(host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+    migrated = deduplicated = total_bytes = 0
+    last_id = 0
+    try:
+        cur = conn.cursor()
+        while not limit or migrated < limit:
+            # Only the id is scanned; each row's audio is fetched on its own so memory stays at one recording.
+            cur.execute(
+                "SELECT id FROM dialect_contributions WHERE id > %s AND audio_hash IS NULL AND audio_data IS NOT NULL "
+                "ORDER BY id LIMIT 1;", (last_id,))
+            row = cur.fetchone()
+            if row is None:
+                break
+            last_id = row[0]
+            cur.execute("SELECT audio_data FROM dialect_contributions WHERE id = %s;", (last_id,))
+            data = bytes(cur.fetchone()[0])
+
+            blob = write_blob(store, io.BytesIO(data))
+            cur.execute(
+                "UPDATE dialect_contributions SET audio_hash = %s, audio_size = %s, audio_duration_seconds = %s, "
+                "audio_codec = %s" + ("" if keep_bytea else ", audio_data = NULL") + " WHERE id = %s;",
+                (blob.hash, blob.size, wav_duration_seconds(data), sniff_codec(data[:16]), last_id))
+            conn.commit()
+
+            migrated += 1
+            deduplicated += not blob.created
+            total_bytes += blob.size
+            print(f"  -> Contribution {last_id}: {blob.size} bytes -> {blob.hash[:12]}"
+                  f"{' (already stored)' if not blob.created else ''}")
+        cur.close()
+    finally:
+        conn.close()
+
+    print(f"\n✅ Migrated {migrated} recordings ({total_bytes / 1e6:.1f} MB, {deduplicated} duplicates) "
+          f"to the {store.name} blob store.")
+    if migrated and not keep_bytea:
+        print("Run VACUUM FULL dialect_contributions; to return the freed BYTEA space to the OS.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move contribution audio from BYTEA into the blob store.")
+    parser.add_argument("--keep-bytea", action="store_true", help="Do not clear audio_data after copying.")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many rows (0 = all).")
+    args = parser.parse_args()
+    migrate(keep_bytea=args.keep_bytea, limit=args.limit)
@@ -0,0 +1,108 @@
+# onnx_asr.py
+
+import argparse
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+# Optional ONNX Runtime backend for the local Wav2Vec2 CTC models. On CPU-only
+# instances a dynamically int8-quantized graph is much smaller and usually faster
+# than the PyTorch model. Export once with:
+#
+#   python onnx_asr.py --model ./indicwav2vec-hindi
+#
+# which writes model.onnx and model.int8.onnx next to the Hugging Face files.
+
+ONNX_FILENAME = "model.onnx"
+QUANTIZED_ONNX_FILENAME = "model.int8.onnx"
+ONNX_INTRA_OP_THREADS = int(os.environ.get("ONNX_INTRA_OP_THREADS", "0"))  # 0 = let ONNX Runtime decide
+
+
+def export_onnx(model_dir: str, output_path: Optional[Path] = None, opset: int = 17) -> Path:
+    """Exports a Wav2Vec2ForCTC checkpoint to ONNX with dynamic batch and time axes."""
+    import torch
+    from transformers import Wav2Vec2ForCTC
+
+    output_path = Path(output_path or Path(model_dir) / ONNX_FILENAME)
+    model = Wav2Vec2ForCTC.from_pretrained(model_dir).eval()
+    dummy_values = torch.zeros(1, 16000, dtype=torch.float32)
+    dummy_mask = torch.ones(1, 16000, dtype=torch.int64)
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (dummy_values, dummy_mask),
+            str(output_path),
+            input_names=["input_values", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_values": {0: "batch", 1: "samples"},
+                "attention_mask": {0: "batch", 1: "samples"},
+                "logits": {0: "batch", 1: "frames"},
+            },
+            opset_version=opset,
+        )
+    print(f"✅ Exported ONNX model to {output_path}")
+    return output_path
+
+
+def quantize_onnx(onnx_path: Path, output_path: Optional[Path] = None) -> Path:
+    """Applies dynamic int8 weight quantization (activations stay float)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    onnx_path = Path(onnx_path)
+    output_path = Path(output_path or onnx_path.with_name(QUANTIZED_ONNX_FILENAME))
+    quantize_dynamic(str(onnx_path), str(output_path), weight_type=QuantType.QInt8)
+    print(f"✅ Quantized ONNX model written to {output_path} "
+          f"({onnx_path.stat().st_size / 1e6:.0f} MB -> {output_path.stat().st_size / 1e6:.0f} MB)")
+    return output_path
+
+
+class OnnxWav2Vec2Backend:
+    """Runs an exported Wav2Vec2 CTC graph with ONNX Runtime; a drop-in for TorchWav2Vec2Backend."""
+
+    name = "onnx"
+
+    def __init__(self, processor, onnx_path: Path, intra_op_threads: int = ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.processor = processor
+        self.onnx_path = Path(onnx_path)
+        self.session = ort.InferenceSession(str(self.onnx_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def logits(self, clips: List[np.ndarray]) -> np.ndarray:
+        inputs = self.processor(clips, sampling_rate=16000, return_tensors="np", padding=True)
+        feeds = {"input_values": inputs["input_values"].astype(np.float32)}
+        if "attention_mask" in self._input_names:
+            mask = inputs.get("attention_mask")
+            if mask is None:
+                mask = np.ones(feeds["input_values"].shape, dtype=np.int64)
+            feeds["attention_mask"] = mask.astype(np.int64)
+        return self.session.run(["logits"], feeds)[0]
+
+    def transcribe_batch(self, clips: List[np.ndarray]) -> List[str]:
+        predicted_ids = np.argmax(self.logits(clips), axis=-1)
+        return self.processor.batch_decode(predicted_ids)
+
+    def frame_logits(self, clip: np.ndarray) -> np.ndarray:
+        return self.logits([clip])[0]
+
+
+def onnx_model_path(model_dir: str, quantized: bool = True) -> Path:
+    return Path(model_dir) / (QUANTIZED_ONNX_FILENAME if quantized else ONNX_FILENAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a Wav2Vec2 CTC model to (quantized) ONNX.")
+    parser.add_argument("--model", default="./indicwav2vec-hindi", help="Hugging Face model directory.")
+    parser.add_argument("--skip-quantize", action="store_true")
+    args = parser.parse_args()
+    exported = export_onnx(args.model)
+    if not args.skip_quantize:
+        quantize_onnx(exported)
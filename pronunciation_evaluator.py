@@ -1,9 +1,23 @@
-# pronunciation_evaluator.py (Simplified Version)
+# pronunciation_evaluator.py
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import jellyfish
 
-# This is our new, simple phoneme converter. It has NO external dependencies.
-# It's not perfect, but it's good enough and it will work on your system.
+# Simple grapheme-to-phoneme scoring for the Indic scripts. All of them (the
+# Brahmic blocks U+0900-U+0D7F) share Devanagari's layout: each script has its
+# own 128-codepoint block and a letter sits at the same offset in every block
+# (क U+0915, ক U+0995, க U+0B95, క U+0C15, ಕ U+0C95, ...). So one phoneme map keyed
+# by offset is compiled into a str.translate table per script at import time,
+# and converting a phrase is a single C-level translate plus split. Letters that
+# exist in only one script (Malayalam chillus, Gurmukhi tippi, Bengali khanda ta,
+# ...) come from SCRIPT_PHONEME_MAPS; unassigned_letters() lists any letter of a
+# block that neither produces a sound nor is deliberately silent (run this module
+# to check the tables against the installed Unicode data).
+
 HINDI_PHONEME_MAP = {
     'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ii', 'उ': 'u', 'ऊ': 'uu', 'ऋ': 'ri',
     'ए': 'e', 'ऐ': 'ai', 'ओ': 'o', 'औ': 'au',
@@ -18,17 +32,155 @@ HINDI_PHONEME_MAP = {
     'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au', 'ं': 'n', 'ः': 'h', '्': ''
 }
 
+# Letters Hindi rarely writes but other scripts in the same layout use
+# (short e/o in the Dravidian scripts, Tamil ழ/ற/ன, Marathi ळ, candrabindu, ...).
+EXTRA_PHONEME_MAP = {
+    'ऎ': 'e', 'ऒ': 'o', 'ॆ': 'e', 'ॊ': 'o', 'ऍ': 'e', 'ऑ': 'o', 'ॅ': 'e', 'ॉ': 'o',
+    'ऌ': 'li', 'ॠ': 'rii', 'ॄ': 'rii',
+    'ऩ': 'n', 'ऱ': 'r', 'ळ': 'l', 'ऴ': 'zh', 'ँ': 'n',
+}
+
+# Signs that are deliberately silent in every script: virama, nukta, avagraha.
+# Nukta letters sound like their base consonant, as they do after NFC decomposition.
+SILENT_SIGNS = ('्', '़', 'ऽ')
+SHARED_PHONEME_MAP = {'ॡ': 'lii', 'ॢ': 'li', 'ॣ': 'lii', 'ॐ': 'om'}
+
+# Per-script letters, keyed by the script's own characters. '' = deliberately silent.
+SCRIPT_PHONEME_MAPS = {
+    "Devanagari": {
+        'ऀ': 'n', 'ऄ': 'a', 'ऺ': 'oe', 'ऻ': 'oe', 'ॎ': 'e', 'ॏ': 'au', 'ॕ': 'e', 'ॖ': 'u', 'ॗ': 'uu',
+        # Precomposed nukta letters are written as escapes: editors tend to decompose them.
+        '\u0958': 'k', '\u0959': 'kh', '\u095A': 'g', '\u095B': 'j',
+        '\u095C': 'd', '\u095D': 'dh', '\u095E': 'ph', '\u095F': 'y',
+        'ॲ': 'e', 'ॳ': 'oe', 'ॴ': 'oe', 'ॵ': 'au', 'ॶ': 'u', 'ॷ': 'uu',
+        'ॸ': 'd', 'ॹ': 'zh', 'ॺ': 'y', 'ॻ': 'g', 'ॼ': 'j', 'ॾ': 'd', 'ॿ': 'b',
+        # Vedic accents, the high spacing dot and the glottal stop have no phoneme here.
+        '॑': '', '॒': '', '॓': '', '॔': '', 'ॱ': '', 'ॽ': '',
+    },
+    "Bengali": {
+        'ৎ': 't', 'ৰ': 'r', 'ৱ': 'v', '\u09DC': 'd', '\u09DD': 'dh', '\u09DF': 'y', 'ৗ': 'au', 'ৼ': 'n',
+        'ঀ': '', '৾': '',
+    },
+    "Gurmukhi": {
+        'ੰ': 'n', 'ੵ': 'y', 'ੜ': 'r', '\u0A59': 'kh', '\u0A5A': 'g', '\u0A5B': 'j', '\u0A5E': 'ph',
+        # Addak is expanded before translation (see SCRIPT_REWRITES); iri and ura only carry a vowel sign.
+        'ੱ': '', 'ੲ': '', 'ੳ': '', 'ੑ': '', 'ੴ': '',
+    },
+    "Gujarati": {
+        'ૹ': 'zh',
+        # Marks for transliterating Arabic script.
+        'ૺ': '', 'ૻ': '', 'ૼ': '', '૽': '', '૾': '', '૿': '',
+    },
+    "Odia": {'ୱ': 'v', 'ୟ': 'y', '\u0B5C': 'd', '\u0B5D': 'dh', 'ୖ': 'ai', 'ୗ': 'au', '୕': ''},
+    "Tamil": {'ௗ': 'au'},
+    "Telugu": {'ఀ': 'n', 'ఄ': 'n', 'ౘ': 'ch', 'ౙ': 'j', 'ౚ': 'r', 'ౝ': 'n', 'ౖ': 'ai', 'ౕ': ''},
+    "Kannada": {'ಀ': 'n', 'ೝ': 'n', 'ೞ': 'zh', 'ೖ': 'ai', 'ೱ': 'h', 'ೲ': 'h', 'ೕ': ''},
+    "Malayalam": {
+        # Chillus: a consonant with no vowel, the same sound as consonant + virama.
+        'ൺ': 'n', 'ൻ': 'n', 'ർ': 'r', 'ൽ': 'l', 'ൾ': 'l', 'ൿ': 'k', 'ൔ': 'm', 'ൕ': 'y', 'ൖ': 'zh',
+        'ൎ': 'r', 'ഺ': 't', 'ഀ': 'n', 'ഄ': 'n', 'ൗ': 'au', 'ൟ': 'ii', '഻': '', '഼': '',
+    },
+}
+
+# Gurmukhi addak doubles the next consonant: ਸੱਚ is read like ਸਚ੍ਚ (Hindi सच्च).
+SCRIPT_REWRITES = {
+    "Gurmukhi": [(re.compile("\u0A71([\u0A15-\u0A39])"), "\\1\u0A4D\\1")],
+}
+
+DEVANAGARI_BLOCK = 0x0900
+SCRIPT_BLOCKS = {
+    "Devanagari": 0x0900, "Bengali": 0x0980, "Gurmukhi": 0x0A00, "Gujarati": 0x0A80,
+    "Odia": 0x0B00, "Tamil": 0x0B80, "Telugu": 0x0C00, "Kannada": 0x0C80, "Malayalam": 0x0D00,
+}
+
+# Every language the app speaks (see SPEAKER_PROMPTS in mainfinal.py), by name and code.
+LANGUAGE_SCRIPTS = {
+    "Hindi": "Devanagari", "Marathi": "Devanagari", "Nepali": "Devanagari", "Sanskrit": "Devanagari",
+    "Bodo": "Devanagari", "Dogri": "Devanagari", "Chhattisgarhi": "Devanagari",
+    "Bengali": "Bengali", "Assamese": "Bengali", "Manipuri": "Bengali",
+    "Punjabi": "Gurmukhi", "Gujarati": "Gujarati", "Odia": "Odia",
+    "Tamil": "Tamil", "Telugu": "Telugu", "Kannada": "Kannada", "Malayalam": "Malayalam",
+}
+LANGUAGE_CODES = {
+    "hi": "Hindi", "mr": "Marathi", "ne": "Nepali", "sa": "Sanskrit", "brx": "Bodo", "doi": "Dogri",
+    "hne": "Chhattisgarhi", "bn": "Bengali", "as": "Assamese", "mni": "Manipuri", "pa": "Punjabi",
+    "gu": "Gujarati", "or": "Odia", "ta": "Tamil", "te": "Telugu", "kn": "Kannada", "ml": "Malayalam",
+}
+
+
+# Characters that are dropped rather than passed through: ASCII, the zero-width
+# (non-)joiners and every Indic block. A plain dict keeps the lookup in C.
+_DROPPED_CODEPOINTS = [*range(0x80), 0x200C, 0x200D, *range(DEVANAGARI_BLOCK, 0x0D80)]
+
+
+def _script_sounds(script: str, block: int) -> Dict[int, str]:
+    """Codepoint -> phoneme for one script ('' for deliberately silent signs)."""
+    shared = {**HINDI_PHONEME_MAP, **EXTRA_PHONEME_MAP, **SHARED_PHONEME_MAP, **dict.fromkeys(SILENT_SIGNS, '')}
+    sounds = {block + ord(char) - DEVANAGARI_BLOCK: sound for char, sound in shared.items()}
+    sounds.update((ord(char), sound) for char, sound in SCRIPT_PHONEME_MAPS.get(script, {}).items())
+    return sounds
+
+
+def _compile_script_table(script: str, block: int) -> dict:
+    table = dict.fromkeys(_DROPPED_CODEPOINTS)
+    for codepoint, sound in _script_sounds(script, block).items():
+        # A trailing space per phoneme lets str.split() turn the translated text into the list.
+        table[codepoint] = f"{sound} " if sound else None
+    return table
+
+
+SCRIPT_TABLES = {script: _compile_script_table(script, block) for script, block in SCRIPT_BLOCKS.items()}
+
+
+def unassigned_letters() -> Dict[str, List[str]]:
+    """Letters and signs of each script block that neither produce a sound nor are listed as silent."""
+    missing = {}
+    for script, block in SCRIPT_BLOCKS.items():
+        sounds = _script_sounds(script, block)
+        letters = [chr(cp) for cp in range(block, block + 0x80)
+                   if unicodedata.category(chr(cp))[0] in "LM" and cp not in sounds]
+        if letters:
+            missing[script] = letters
+    return missing
+
+
+def script_for_language(lang: str) -> Optional[str]:
+    """Resolves a language code ('hi') or name ('Hindi') to its script, or None if unsupported."""
+    return LANGUAGE_SCRIPTS.get(LANGUAGE_CODES.get(lang, lang))
+
+
+@lru_cache(maxsize=4096)
+def _phonemes(text: str, script: str) -> Tuple[str, ...]:
+    # Lesson targets, and the common ways of getting them wrong, come up again and again.
+    # NFC so two-part vowels and nukta letters read the same however they were typed.
+    text = unicodedata.normalize("NFC", text)
+    for pattern, replacement in SCRIPT_REWRITES.get(script, ()):
+        text = pattern.sub(replacement, text)
+    return tuple(text.translate(SCRIPT_TABLES[script]).split())
+
+
+def text_to_phonemes(text: str, lang: str = "hi") -> list:
+    """Converts text in any supported script to a list of phonemes."""
+    script = script_for_language(lang)
+    if script is None:
+        return []
+    return list(_phonemes(text, script))
+
+
 def simple_text_to_phonemes(text: str) -> list:
     """
     Converts Hindi text to a list of phonemes using our simple dictionary.
     """
-    phonemes = []
-    for char in text.replace(" ", ""):
-        if char in HINDI_PHONEME_MAP:
-            sound = HINDI_PHONEME_MAP[char]
-            if sound:
-                phonemes.append(sound)
-    return phonemes
+    return text_to_phonemes(text, "hi")
+
+
+_PUNCTUATION = re.compile(r"[\u0964\u0965!-/:-@\[-`{-~\u2018-\u201f]+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC, punctuation (including danda) removed, whitespace collapsed: the form ASR output comes in."""
+    return " ".join(_PUNCTUATION.sub(" ", unicodedata.normalize("NFC", text)).split())
+
 
 def calculate_accuracy_score(transcribed_text: str, target_text: str) -> float:
     if not transcribed_text or not target_text:
@@ -38,28 +190,118 @@ def calculate_accuracy_score(transcribed_text: str, target_text: str) -> float:
     similarity = (max_len - distance) / max_len
     return max(0, similarity * 100)
 
-def find_phoneme_errors(transcribed_phonemes: list, target_phonemes: list) -> list:
+
+def _edit_table(target: Sequence[str], transcribed: Sequence[str], band: int) -> List[List[int]]:
+    """Levenshtein DP table; only cells within `band` of the diagonal are computed, the rest stay out of reach."""
+    rows, cols = len(target) + 1, len(transcribed) + 1
+    out_of_band = rows + cols
+    dist = [[out_of_band] * cols for _ in range(rows)]
+    for j in range(min(cols, band + 1)):
+        dist[0][j] = j
+    for i in range(1, rows):
+        prev_row, row, target_ph = dist[i - 1], dist[i], target[i - 1]
+        if i <= band:
+            row[0] = i
+        start = max(1, i - band)
+        left = row[start - 1]
+        # min() and a cost variable per cell cost more than the comparisons themselves.
+        for j in range(start, min(cols, i + band + 1)):
+            best = prev_row[j - 1] if target_ph == transcribed[j - 1] else prev_row[j - 1] + 1
+            if prev_row[j] + 1 < best:
+                best = prev_row[j] + 1
+            if left + 1 < best:
+                best = left + 1
+            row[j] = left = best
+    return dist
+
+
+def align_phonemes(transcribed: Sequence[str], target: Sequence[str]) -> Tuple[int, List[Tuple[str, str, str]]]:
+    """
+    Levenshtein alignment of two phoneme sequences. Returns the edit distance and the
+    edit operations as (op, target_phoneme, transcribed_phoneme) tuples in target order,
+    where op is "sub", "del" (target sound missing) or "ins" (extra sound). Matches are omitted.
+    """
+    if target == transcribed:
+        return 0, []
+    # Attempts usually differ from the target in a spot or two, so the shared prefix
+    # and suffix are skipped and only the differing middle goes through the DP.
+    start, limit = 0, min(len(target), len(transcribed))
+    while start < limit and target[start] == transcribed[start]:
+        start += 1
+    end = 0
+    while end < limit - start and target[-1 - end] == transcribed[-1 - end]:
+        end += 1
+    target = target[start:len(target) - end]
+    transcribed = transcribed[start:len(transcribed) - end]
+    # Most differences are a single sound added, dropped or changed: no DP needed.
+    if not target or not transcribed:
+        return (len(target) + len(transcribed),
+                [("del", ph, "") for ph in target] + [("ins", "", ph) for ph in transcribed])
+    if len(target) == 1 and len(transcribed) == 1:
+        return 1, [("sub", target[0], transcribed[0])]
+
+    # The DP is restricted to a diagonal band (Ukkonen): a result within the band width is
+    # exact, so the band only doubles for attempts that are far off.
+    band = max(2, abs(len(target) - len(transcribed)))
+    while True:
+        dist = _edit_table(target, transcribed, band)
+        if dist[-1][-1] <= band or band >= max(len(target), len(transcribed)):
+            break
+        band *= 2
+
+    rows, cols = len(target) + 1, len(transcribed) + 1
+    ops = []
+    i, j = rows - 1, cols - 1
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and dist[i][j] == dist[i - 1][j - 1] + (target[i - 1] != transcribed[j - 1]):
+            if target[i - 1] != transcribed[j - 1]:
+                ops.append(("sub", target[i - 1], transcribed[j - 1]))
+            i, j = i - 1, j - 1
+        elif i > 0 and dist[i][j] == dist[i - 1][j] + 1:
+            ops.append(("del", target[i - 1], ""))
+            i -= 1
+        else:
+            ops.append(("ins", "", transcribed[j - 1]))
+            j -= 1
+    ops.reverse()
+    return dist[-1][-1], ops
+
+
+def find_phoneme_errors(transcribed_phonemes: list, target_phonemes: list, limit: int = 2,
+                        alignment: Optional[List[Tuple[str, str, str]]] = None) -> list:
+    if alignment is None:
+        _, alignment = align_phonemes(transcribed_phonemes, target_phonemes)
     errors = []
-    for i, (target_ph, transcribed_ph) in enumerate(zip(target_phonemes, transcribed_phonemes)):
-        if target_ph != transcribed_ph:
-            error_message = f"Check your '{target_ph}' sound, you pronounced it more like '{transcribed_ph}'."
-            errors.append(error_message)
-            if len(errors) >= 2:
-                break
+    for op, target_ph, transcribed_ph in alignment[:limit]:
+        if op == "sub":
+            errors.append(f"Check your '{target_ph}' sound, you pronounced it more like '{transcribed_ph}'.")
+        elif op == "del":
+            errors.append(f"You missed the '{target_ph}' sound.")
+        else:
+            errors.append(f"There was an extra '{transcribed_ph}' sound.")
     return errors
 
-def evaluate_pronunciation(transcribed_text: str, target_text: str, lang: str):
-    word_accuracy = calculate_accuracy_score(transcribed_text, target_text)
 
-    # We only support Hindi for phonemes with this simple method
-    if lang == 'hi':
-        transcribed_phonemes = simple_text_to_phonemes(transcribed_text)
-        target_phonemes = simple_text_to_phonemes(target_text)
-        phoneme_accuracy = calculate_accuracy_score(" ".join(transcribed_phonemes), " ".join(target_phonemes))
+def evaluate_pronunciation(transcribed_text: str, target_text: str, lang: str,
+                           target_phonemes: Optional[Sequence[str]] = None, target_normalized: Optional[str] = None):
+    """
+    Scores one attempt. `target_phonemes` and `target_normalized` may be passed in when
+    the caller already has them (e.g. from the reference index) to skip target-side work.
+    """
+    word_accuracy = calculate_accuracy_score(transcribed_text, target_normalized or target_text)
+
+    alignment = []
+    script = script_for_language(lang)
+    if script is not None:
+        transcribed_phonemes = list(_phonemes(transcribed_text, script))
+        target_phonemes = list(target_phonemes if target_phonemes is not None else _phonemes(target_text, script))
+        distance, alignment = align_phonemes(transcribed_phonemes, target_phonemes)
+        max_len = max(len(transcribed_phonemes), len(target_phonemes))
+        phoneme_accuracy = (max_len - distance) / max_len * 100 if max_len and transcribed_phonemes else 0.0
     else:
         transcribed_phonemes = []
         target_phonemes = []
-        phoneme_accuracy = word_accuracy # Fallback if not Hindi
+        phoneme_accuracy = word_accuracy # Fallback for scripts without a phoneme table
 
     final_score = (word_accuracy * 0.3) + (phoneme_accuracy * 0.7)
     final_score = round(final_score, 2)
@@ -70,7 +312,7 @@ def evaluate_pronunciation(transcribed_text: str, target_text: str, lang: str):
     elif final_score >= 80:
         feedback_messages.append("Great job! Almost perfect.")
     else:
-        phoneme_errors = find_phoneme_errors(transcribed_phonemes, target_phonemes)
+        phoneme_errors = find_phoneme_errors(transcribed_phonemes, target_phonemes, alignment=alignment)
         if phoneme_errors:
             feedback_messages.extend(phoneme_errors)
         else:
@@ -84,7 +326,27 @@ def evaluate_pronunciation(transcribed_text: str, target_text: str, lang: str):
         "details": {
             "transcribed_phonemes": transcribed_phonemes,
             "target_phonemes": target_phonemes,
+            "errors": [{"type": op, "target": t, "transcribed": x} for op, t, x in alignment],
         }
     }
 
 
+def evaluate_pronunciation_batch(attempts: Iterable[Tuple[str, str]], lang: str) -> List[Dict]:
+    """Scores many (transcribed_text, target_text) attempts; each distinct target is converted once."""
+    target_cache: Dict[str, list] = {}
+    results = []
+    for transcribed_text, target_text in attempts:
+        if target_text not in target_cache:
+            target_cache[target_text] = text_to_phonemes(target_text, lang)
+        results.append(evaluate_pronunciation(transcribed_text, target_text, lang, target_cache[target_text]))
+    return results
+
+
+if __name__ == "__main__":
+    # python pronunciation_evaluator.py: checks the tables against this Python's Unicode data.
+    # Newer Unicode versions add letters; they are dropped until given a sound above.
+    missing = unassigned_letters()
+    for script, letters in missing.items():
+        print(f"❌ No phoneme for {script} letters: {' '.join(f'U+{ord(c):04X}' for c in letters)}")
+    if not missing:
+        print(f"✅ Every letter of {len(SCRIPT_BLOCKS)} script blocks has a phoneme or is silent.")
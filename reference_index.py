@@ -0,0 +1,117 @@
+# reference_index.py
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from pronunciation_evaluator import normalize_text, text_to_phonemes
+
+# Precomputed scoring features for every lesson phrase, keyed by phrase_id_text.
+# Built from the phrases table (at startup if the file is missing, after
+# setup_lessons.py, or via the admin rebuild endpoint) and saved as one compact
+# JSON file, so the evaluate endpoint needs neither a DB round-trip nor
+# target-side G2P work.
+#
+#   python reference_index.py   # rebuild from the database
+
+REFERENCE_INDEX_FILE = Path(os.environ.get("REFERENCE_INDEX_FILE", "reference_index.json"))
+INDEX_VERSION = 1
+REFERENCE_LANG = "hi"  # the phrases table stores Hindi targets
+PHRASES_QUERY = "SELECT phrase_id_text, hindi_phrase FROM phrases;"
+
+
+class ReferenceEntry(NamedTuple):
+    text: str
+    normalized: str
+    phonemes: Tuple[str, ...]
+
+
+def make_entry(text: str, lang: str = REFERENCE_LANG) -> ReferenceEntry:
+    normalized = normalize_text(text)
+    # Phoneme strings are interned so all entries share one copy of each sound.
+    return ReferenceEntry(text, normalized, tuple(map(sys.intern, text_to_phonemes(normalized, lang))))
+
+
+class ReferenceIndex:
+    """In-memory phrase_id_text -> ReferenceEntry map with a file snapshot."""
+
+    def __init__(self, entries: Optional[Dict[str, ReferenceEntry]] = None, built_at: float = 0.0):
+        self.entries = entries or {}
+        self.built_at = built_at
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, phrase_id: str) -> Optional[ReferenceEntry]:
+        return self.entries.get(phrase_id)
+
+    def add(self, phrase_id: str, text: str) -> ReferenceEntry:
+        entry = self.entries[phrase_id] = make_entry(text)
+        return entry
+
+    @classmethod
+    def from_rows(cls, rows) -> "ReferenceIndex":
+        """Builds the index from (phrase_id_text, hindi_phrase) rows, i.e. the result of PHRASES_QUERY."""
+        return cls({phrase_id: make_entry(text) for phrase_id, text in rows}, built_at=time.time())
+
+    @classmethod
+    def build_from_db(cls, conn) -> "ReferenceIndex":
+        """Reads every phrase through a blocking DB-API connection (setup scripts)."""
+        cur = conn.cursor()
+        cur.execute(PHRASES_QUERY)
+        rows = cur.fetchall()
+        cur.close()
+        return cls.from_rows(rows)
+
+    def save(self, path: Path = REFERENCE_INDEX_FILE):
+        # Phonemes are stored space-joined; the normalized text is only written when it differs.
+        payload = {
+            "version": INDEX_VERSION,
+            "built_at": self.built_at,
+            "entries": {phrase_id: [e.text, " ".join(e.phonemes)] + ([e.normalized] if e.normalized != e.text else [])
+                        for phrase_id, e in self.entries.items()},
+        }
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path = REFERENCE_INDEX_FILE) -> Optional["ReferenceIndex"]:
+        """Loads a saved index, or returns None if the file is missing or from another version."""
+        try:
+            payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        if payload.get("version") != INDEX_VERSION:
+            return None
+        entries = {}
+        for phrase_id, (text, phonemes, *normalized) in payload["entries"].items():
+            entries[phrase_id] = ReferenceEntry(text, normalized[0] if normalized else text,
+                                                tuple(map(sys.intern, phonemes.split())))
+        return cls(entries, built_at=payload.get("built_at", 0.0))
+
+    def stats(self) -> dict:
+        return {"phrases": len(self.entries), "built_at": self.built_at}
+
+
+def rebuild_index_file(conn, path: Path = REFERENCE_INDEX_FILE) -> ReferenceIndex:
+    index = ReferenceIndex.build_from_db(conn)
+    index.save(path)
+    print(f"✅ Reference index rebuilt: {len(index)} phrases -> {path}")
+    return index
+
+
+if __name__ == "__main__":
+    import psycopg2
+
+    from setup_lessons import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+
+    connection = psycopg2.connect(host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+    try:
+        rebuild_index_file(connection)
+    finally:
+        connection.close()
@@ -48,6 +48,55 @@ CREATE TABLE IF NOT EXISTS dialect_contributions (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Contribution audio is kept in the blob store (blob_store.py), keyed by sha256.
+-- audio_data is only read by migrate_contribution_audio.py for rows created before that.
+ALTER TABLE dialect_contributions ADD COLUMN IF NOT EXISTS audio_hash CHAR(64);
+ALTER TABLE dialect_contributions ADD COLUMN IF NOT EXISTS audio_size BIGINT;
+ALTER TABLE dialect_contributions ADD COLUMN IF NOT EXISTS audio_duration_seconds REAL;
+ALTER TABLE dialect_contributions ADD COLUMN IF NOT EXISTS audio_codec TEXT;
+CREATE INDEX IF NOT EXISTS dialect_contributions_audio_hash_idx ON dialect_contributions (audio_hash);
+
+-- Work queue for contribution transcription (contribution_queue.py). Workers
+-- claim rows with FOR UPDATE SKIP LOCKED.
+CREATE TABLE IF NOT EXISTS contribution_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    contribution_id INTEGER NOT NULL REFERENCES dialect_contributions(id) ON DELETE CASCADE,
+    lang TEXT NOT NULL,
+    denoise BOOLEAN NOT NULL DEFAULT TRUE,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS contribution_jobs_pending_idx ON contribution_jobs (id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS contribution_jobs_contribution_idx ON contribution_jobs (contribution_id);
+
+-- Curriculum change notifications: any write to the curriculum tables sends a
+-- NOTIFY on 'curriculum_changed', which the API listens on to reload its cache.
+-- Tables that do not exist yet are skipped; re-run after setup_lessons.py creates them.
+CREATE OR REPLACE FUNCTION notify_curriculum_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('curriculum_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['categories', 'lessons', 'phrases'] LOOP
+        IF to_regclass(tbl) IS NOT NULL THEN
+            EXECUTE format('DROP TRIGGER IF EXISTS %I_curriculum_changed ON %I;', tbl, tbl);
+            EXECUTE format('CREATE TRIGGER %I_curriculum_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                           'FOR EACH STATEMENT EXECUTE FUNCTION notify_curriculum_changed();', tbl, tbl);
+        END IF;
+    END LOOP;
+END$$;
+
 -- Insert initial data for the Learning Mode phrases
 INSERT INTO phrases (id, phrase, language_code) VALUES
 ('HIN_001', 'नमस्ते आप कैसे हैं', 'hi'),
@@ -1,6 +1,8 @@
 import psycopg2
 import os
 
+from reference_index import rebuild_index_file
+
 # --- IMPORTANT: PASTE YOUR DATABASE CREDENTIALS HERE ---
 DB_HOST = os.environ.get("DB_HOST", "db.biutmpyotmmsjcnbllff.supabase.co")
 DB_PORT = os.environ.get("DB_PORT", "5432")
@@ -63,7 +65,10 @@ CURRICULUM = {
 
 
 def setup_lessons():
-    """Connects to the database and populates it with the curriculum."""
+    """Connects to the database and populates it with the curriculum.
+
+    Row-at-a-time and insert-only; sync_curriculum.py loads large curricula in bulk and applies edits.
+    """
     conn = None
     try:
         conn = psycopg2.connect(host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
@@ -89,7 +94,8 @@ def setup_lessons():
                     (category_id, lesson_title, lesson_data['description']))
                 result = cur.fetchone()
                 if result is None:
-                    cur.execute("SELECT id FROM lessons WHERE title = %s;", (lesson_title,))
+                    cur.execute("SELECT id FROM lessons WHERE category_id = %s AND title = %s;",
+                                (category_id, lesson_title))
                     result = cur.fetchone()
                 lesson_id = result[0]
                 print(f"  -> Processing Lesson: {lesson_title} (ID: {lesson_id})")
@@ -103,6 +109,8 @@ def setup_lessons():
         conn.commit()
         cur.close()
         print("\n✅✅✅ Database curriculum setup complete!")
+        # Keep the precomputed scoring targets in step with the curriculum.
+        rebuild_index_file(conn)
 
     except Exception as e:
         print(f"❌ An error occurred: {e}")
@@ -0,0 +1,89 @@
+# streaming_asr.py
+
+import os
+from typing import List
+
+import numpy as np
+
+# Incremental CTC decoding over a sliding window. Audio arrives in small chunks;
+# every STREAM_STEP_MS of new audio the model runs over the new samples plus a
+# short tail of already-decoded audio (left context). Frame predictions for the
+# new region are committed, except for a small lookahead at the right edge that
+# is re-decoded on the next step once more audio has arrived. Only the context
+# tail, the uncommitted samples and the committed token ids are ever kept.
+
+SAMPLE_RATE = 16000
+STREAM_STEP_MS = int(os.environ.get("STREAM_STEP_MS", "500"))
+STREAM_LEFT_CONTEXT_MS = int(os.environ.get("STREAM_LEFT_CONTEXT_MS", "1000"))
+STREAM_LOOKAHEAD_MS = int(os.environ.get("STREAM_LOOKAHEAD_MS", "200"))
+# Wav2Vec2's convolutional front end emits one frame per 20 ms of audio.
+SAMPLES_PER_FRAME = 320
+
+
+class StreamingCTCDecoder:
+    """Feeds 16 kHz mono float32 chunks to a CTC backend and keeps a running transcript."""
+
+    def __init__(self, backend, step_ms: int = STREAM_STEP_MS, left_context_ms: int = STREAM_LEFT_CONTEXT_MS,
+                 lookahead_ms: int = STREAM_LOOKAHEAD_MS):
+        self.backend = backend
+        self.step = SAMPLE_RATE * step_ms // 1000
+        self.left_context = SAMPLE_RATE * left_context_ms // 1000
+        self.lookahead = SAMPLE_RATE * lookahead_ms // 1000
+        self._context = np.zeros(0, dtype=np.float32)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._committed_ids: List[int] = []
+        self._tail_ids: List[int] = []
+        self.samples_seen = 0
+
+    @staticmethod
+    def pcm16_to_float32(chunk: bytes) -> np.ndarray:
+        usable = len(chunk) - (len(chunk) % 2)
+        return np.frombuffer(chunk[:usable], dtype="<i2").astype(np.float32) * (1.0 / 32768.0)
+
+    def ready(self) -> bool:
+        """True once enough new audio has arrived to justify another forward pass."""
+        return len(self._pending) >= self.step + self.lookahead
+
+    def push(self, samples: np.ndarray):
+        self._pending = np.concatenate([self._pending, samples])
+        self.samples_seen += len(samples)
+
+    def _decode_window(self, final: bool):
+        """Runs the model over context + pending and commits the stable frames. Blocking."""
+        if len(self._pending) == 0:
+            return
+        window = np.concatenate([self._context, self._pending])
+        frame_ids = np.argmax(self.backend.frame_logits(window), axis=-1)
+        frames_per_sample = len(frame_ids) / len(window)
+
+        first_new = int(round(len(self._context) * frames_per_sample))
+        if final:
+            commit_samples = len(self._pending)
+        else:
+            commit_samples = max(0, len(self._pending) - self.lookahead)
+            commit_samples -= commit_samples % SAMPLES_PER_FRAME
+        commit_end = first_new + int(round(commit_samples * frames_per_sample))
+
+        self._committed_ids.extend(int(i) for i in frame_ids[first_new:commit_end])
+        self._tail_ids = [int(i) for i in frame_ids[commit_end:]]
+
+        committed_audio = self._pending[:commit_samples]
+        self._pending = self._pending[commit_samples:]
+        context = np.concatenate([self._context, committed_audio])
+        # [-0:] would keep everything, so a zero left context needs its own case.
+        self._context = context[-self.left_context:] if self.left_context else context[:0]
+
+    def step_decode(self) -> str:
+        """Decodes one window and returns the partial transcript (committed + provisional tail)."""
+        self._decode_window(final=False)
+        return self.transcript(include_tail=True)
+
+    def finalize(self) -> str:
+        self._decode_window(final=True)
+        self._tail_ids = []
+        return self.transcript(include_tail=False)
+
+    def transcript(self, include_tail: bool = True) -> str:
+        ids = self._committed_ids + (self._tail_ids if include_tail else [])
+        # processor.decode collapses repeated CTC tokens and drops blanks.
+        return self.backend.processor.decode(ids) if ids else ""
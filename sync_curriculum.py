@@ -0,0 +1,240 @@
+# sync_curriculum.py
+#
+# Bulk, idempotent curriculum loader. Reads a curriculum file and brings the
+# categories / lessons / phrases tables in line with it in ONE transaction:
+# rows are COPYed into temporary staging tables, then a handful of set-based
+# UPDATE ... FROM / INSERT ... SELECT statements apply only the differences.
+# Each live row stores the md5 of its content columns in content_hash, written
+# whenever the sync inserts or updates it; a row counts as changed when that
+# stored hash differs from the staged one, so re-running with the same file
+# writes nothing. Rows written before the column existed have no hash and are
+# rewritten once.
+#
+# Identities: categories by name, lessons by (category, title), phrases by
+# phrase_id_text. Rows missing from the file are left alone.
+#
+# Input formats:
+#   JSON  - the setup_lessons.CURRICULUM shape:
+#           {category: {"description", "lessons": {title: {"description", "phrases": [[id, text, english], ...]}}}}
+#   CSV   - one phrase per row with a header:
+#           category,category_description,lesson,lesson_description,phrase_id,phrase,translation
+#
+#   python sync_curriculum.py                      # the built-in setup_lessons.CURRICULUM
+#   python sync_curriculum.py curriculum.csv
+#   python sync_curriculum.py curriculum.json --dry-run
+
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import psycopg
+
+from db_pool import build_conninfo
+from reference_index import rebuild_index_file
+from setup_lessons import CURRICULUM, DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+
+
+class CurriculumRows(NamedTuple):
+    categories: List[Tuple[str, str]]  # (name, description)
+    lessons: List[Tuple[str, str, str]]  # (category, title, description)
+    phrases: List[Tuple[str, str, str, str, str]]  # (phrase_id_text, category, lesson, hindi_phrase, english)
+
+
+def rows_from_tree(tree: dict) -> CurriculumRows:
+    """Flattens the nested CURRICULUM structure into staging rows."""
+    categories, lessons, phrases = [], [], []
+    for category, category_data in tree.items():
+        categories.append((category, category_data.get("description")))
+        for title, lesson_data in category_data.get("lessons", {}).items():
+            lessons.append((category, title, lesson_data.get("description")))
+            for phrase_id, text, english in lesson_data.get("phrases", []):
+                phrases.append((phrase_id, category, title, text, english))
+    return check_rows(CurriculumRows(categories, lessons, phrases))
+
+
+def rows_from_csv(path: Path) -> CurriculumRows:
+    """Reads one-phrase-per-row CSV; the first description seen for a category or lesson wins."""
+    categories: Dict[str, str] = {}
+    lessons: Dict[Tuple[str, str], str] = {}
+    phrases = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            category, lesson = row["category"].strip(), row["lesson"].strip()
+            categories.setdefault(category, row.get("category_description") or None)
+            lessons.setdefault((category, lesson), row.get("lesson_description") or None)
+            phrases.append((row["phrase_id"].strip(), category, lesson, row["phrase"], row.get("translation") or None))
+    return check_rows(CurriculumRows(
+        list(categories.items()),
+        [(category, title, description) for (category, title), description in lessons.items()],
+        phrases))
+
+
+def check_rows(rows: CurriculumRows) -> CurriculumRows:
+    seen = set()
+    for phrase_id, *_ in rows.phrases:
+        if not phrase_id:
+            raise ValueError("Every phrase needs a phrase_id.")
+        if phrase_id in seen:
+            raise ValueError(f"Phrase ID '{phrase_id}' appears more than once.")
+        seen.add(phrase_id)
+    return rows
+
+
+def load_rows(path: Optional[Path] = None) -> CurriculumRows:
+    if path is None:
+        return rows_from_tree(CURRICULUM)
+    if path.suffix.lower() == ".csv":
+        return rows_from_csv(path)
+    with open(path, encoding="utf-8") as f:
+        return rows_from_tree(json.load(f))
+
+
+def content_hash(*columns: str) -> str:
+    """
+    SQL expression hashing the given columns; a separator keeps columns apart. Values are
+    prefixed with 'v' and NULL becomes 'n', so clearing a description to '' counts as a change.
+    """
+    return "md5(" + " || E'\\x1f' || ".join(f"coalesce('v' || {column}::text, 'n')" for column in columns) + ")"
+
+
+HASH_COLUMNS = """
+ALTER TABLE categories ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE lessons ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE phrases ADD COLUMN IF NOT EXISTS content_hash TEXT;
+"""
+
+STAGING_TABLES = """
+CREATE TEMP TABLE sync_categories (name TEXT NOT NULL, description TEXT) ON COMMIT DROP;
+CREATE TEMP TABLE sync_lessons (category TEXT NOT NULL, title TEXT NOT NULL, description TEXT) ON COMMIT DROP;
+CREATE TEMP TABLE sync_phrases (phrase_id_text TEXT NOT NULL, category TEXT NOT NULL, lesson TEXT NOT NULL,
+                                hindi_phrase TEXT NOT NULL, english_translation TEXT) ON COMMIT DROP;
+"""
+
+# Staged phrases with their lesson resolved to an id (categories and lessons exist by the time this is used).
+# DISTINCT ON picks the oldest lesson if earlier title-only loads left duplicates behind.
+RESOLVED_PHRASES = f"""
+SELECT DISTINCT ON (s.phrase_id_text) s.phrase_id_text, l.id AS lesson_id, s.hindi_phrase, s.english_translation,
+       {content_hash('l.id', 's.hindi_phrase', 's.english_translation')} AS content_hash
+FROM sync_phrases s
+JOIN categories c ON c.name = s.category
+JOIN lessons l ON l.category_id = c.id AND l.title = s.lesson
+ORDER BY s.phrase_id_text, l.id
+"""
+
+# Staged phrases whose category or lesson is not in the live tables; these are not written.
+UNRESOLVED_PHRASES = f"""
+SELECT count(*) FROM sync_phrases u
+WHERE NOT EXISTS (SELECT 1 FROM ({RESOLVED_PHRASES}) r WHERE r.phrase_id_text = u.phrase_id_text)
+"""
+
+# (table, unchanged COUNT, UPDATE, INSERT), applied in dependency order. Unchanged rows are counted
+# before the UPDATE, which would otherwise make every matched row look unchanged.
+SYNC_STEPS = [
+    ("categories", f"""
+        SELECT count(*) FROM categories c JOIN sync_categories s ON c.name = s.name
+        WHERE c.content_hash = {content_hash('s.description')};
+    """, f"""
+        UPDATE categories c SET description = s.description, content_hash = {content_hash('s.description')}
+        FROM sync_categories s
+        WHERE c.name = s.name AND c.content_hash IS DISTINCT FROM {content_hash('s.description')};
+    """, f"""
+        INSERT INTO categories (name, description, content_hash)
+        SELECT s.name, s.description, {content_hash('s.description')} FROM sync_categories s
+        WHERE NOT EXISTS (SELECT 1 FROM categories c WHERE c.name = s.name);
+    """),
+    ("lessons", f"""
+        SELECT count(*) FROM lessons l JOIN categories c ON l.category_id = c.id
+        JOIN sync_lessons s ON c.name = s.category AND l.title = s.title
+        WHERE l.content_hash = {content_hash('s.description')};
+    """, f"""
+        UPDATE lessons l SET description = s.description, content_hash = {content_hash('s.description')}
+        FROM sync_lessons s JOIN categories c ON c.name = s.category
+        WHERE l.category_id = c.id AND l.title = s.title
+          AND l.content_hash IS DISTINCT FROM {content_hash('s.description')};
+    """, f"""
+        INSERT INTO lessons (category_id, title, description, content_hash)
+        SELECT c.id, s.title, s.description, {content_hash('s.description')}
+        FROM sync_lessons s JOIN categories c ON c.name = s.category
+        WHERE NOT EXISTS (SELECT 1 FROM lessons l WHERE l.category_id = c.id AND l.title = s.title);
+    """),
+    ("phrases", f"""
+        SELECT count(*) FROM phrases p JOIN ({RESOLVED_PHRASES}) r ON p.phrase_id_text = r.phrase_id_text
+        WHERE p.content_hash = r.content_hash;
+    """, f"""
+        UPDATE phrases p
+        SET lesson_id = r.lesson_id, hindi_phrase = r.hindi_phrase, english_translation = r.english_translation,
+            content_hash = r.content_hash
+        FROM ({RESOLVED_PHRASES}) r
+        WHERE p.phrase_id_text = r.phrase_id_text AND p.content_hash IS DISTINCT FROM r.content_hash;
+    """, f"""
+        INSERT INTO phrases (lesson_id, phrase_id_text, hindi_phrase, english_translation, content_hash)
+        SELECT r.lesson_id, r.phrase_id_text, r.hindi_phrase, r.english_translation, r.content_hash
+        FROM ({RESOLVED_PHRASES}) r
+        WHERE NOT EXISTS (SELECT 1 FROM phrases p WHERE p.phrase_id_text = r.phrase_id_text);
+    """),
+]
+
+
+def copy_rows(cur, table: str, columns: str, rows: list):
+    with cur.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+
+
+def sync(conn, rows: CurriculumRows, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Applies the curriculum in one transaction; returns inserted/updated/unchanged counts per table,
+    plus the phrases skipped because their category or lesson did not resolve.
+    """
+    report = {}
+    with conn.transaction() as tx:
+        cur = conn.cursor()
+        cur.execute(HASH_COLUMNS)
+        cur.execute(STAGING_TABLES)
+        copy_rows(cur, "sync_categories", "name, description", rows.categories)
+        copy_rows(cur, "sync_lessons", "category, title, description", rows.lessons)
+        copy_rows(cur, "sync_phrases", "phrase_id_text, category, lesson, hindi_phrase, english_translation",
+                  rows.phrases)
+        for table, unchanged_query, update_query, insert_query in SYNC_STEPS:
+            cur.execute(unchanged_query)
+            unchanged = cur.fetchone()[0]
+            cur.execute(update_query)
+            updated = cur.rowcount
+            cur.execute(insert_query)
+            inserted = cur.rowcount
+            report[table] = {"inserted": inserted, "updated": updated, "unchanged": unchanged}
+        cur.execute(UNRESOLVED_PHRASES)
+        report["phrases"]["skipped"] = cur.fetchone()[0]
+        if dry_run:
+            raise psycopg.Rollback(tx)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load a curriculum file into the lesson tables.")
+    parser.add_argument("path", nargs="?", type=Path, help="Curriculum .json or .csv (default: setup_lessons.CURRICULUM)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change, then roll back.")
+    args = parser.parse_args()
+
+    curriculum = load_rows(args.path)
+    print(f"Loaded {len(curriculum.categories)} categories, {len(curriculum.lessons)} lessons and "
+          f"{len(curriculum.phrases)} phrases from {args.path or 'setup_lessons.CURRICULUM'}")
+
+    started = time.perf_counter()
+    with psycopg.connect(build_conninfo(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD)) as connection:
+        counts = sync(connection, curriculum, dry_run=args.dry_run)
+        for name, numbers in counts.items():
+            print(f"  {name:<11} inserted {numbers['inserted']:>6}  updated {numbers['updated']:>6}  "
+                  f"unchanged {numbers['unchanged']:>6}"
+                  + (f"  skipped {numbers['skipped']:>6}" if numbers.get("skipped") else ""))
+        changed = any(numbers["inserted"] or numbers["updated"] for numbers in counts.values())
+        if args.dry_run:
+            print(f"\nDry run: nothing was written ({time.perf_counter() - started:.2f} s).")
+        else:
+            print(f"\n✅ Curriculum synced in {time.perf_counter() - started:.2f} s.")
+            # Keep the precomputed scoring targets in step with the curriculum.
+            if changed:
+                rebuild_index_file(connection)
@@ -0,0 +1,205 @@
+# translation_bundle.py
+
+import hashlib
+import json
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+# Read-only, prebuilt translations + TTS clips for the lesson phrases, produced
+# offline by build_translation_bundle.py so a server can start without calling
+# the translation or TTS Spaces. A bundle is a directory holding:
+#
+#   index.json     - version, generation, and for every (phrase, language) the
+#                    translated text, the sha256 of its clip and the
+#                    fingerprint it was built from; category names; and the
+#                    (offset, length) of every clip in the audio file.
+#   audio-<N>.bin  - the clips (Ogg/Opus; WAV from older builds) packed back to back, each stored once.
+#
+# The server memory-maps the audio file, so clips are served straight from the
+# page cache and only the index is parsed at startup. A rebuild writes a new
+# audio-<N+1>.bin and then swaps index.json atomically; a running server keeps
+# reading the old mapping until it restarts.
+
+BUNDLE_DIR = Path(os.environ.get("TRANSLATION_BUNDLE_DIR", "translation_bundle"))
+BUNDLE_FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+
+CacheKey = Tuple[str, str]
+
+
+def tts_fingerprint(text: str, speaker_description: str) -> str:
+    """Identifies what a clip was synthesized from; a clip is rebuilt when this changes."""
+    return hashlib.sha256(f"{text}\x1f{speaker_description}".encode("utf-8")).hexdigest()[:16]
+
+
+class BundleEntry:
+    __slots__ = ("text", "audio_hash", "fingerprint")
+
+    def __init__(self, text: str, audio_hash: Optional[str] = None, fingerprint: Optional[str] = None):
+        self.text = text
+        self.audio_hash = audio_hash
+        self.fingerprint = fingerprint
+
+
+class TranslationBundle:
+    """A loaded bundle: in-memory index plus a read-only mapping of the audio file."""
+
+    def __init__(self, root: Path, generation: int, built_at: float, entries: Dict[CacheKey, BundleEntry],
+                 categories: Dict[CacheKey, str], clips: Dict[str, Tuple[int, int]], audio_file: Optional[Path]):
+        self.root = root
+        self.generation = generation
+        self.built_at = built_at
+        self.entries = entries
+        self.categories = categories
+        self.clips = clips
+        self.audio_file = audio_file
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        # A missing or truncated audio file raises here (OSError/ValueError) rather than failing on a later read.
+        needed = max((offset + length for offset, length in clips.values()), default=0)
+        size = audio_file.stat().st_size if audio_file is not None else 0
+        if size < needed:
+            raise ValueError(f"audio file {audio_file} holds {size} bytes, the index needs {needed}")
+        if size:
+            self._file = open(audio_file, "rb")
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except BaseException:
+                self._file.close()
+                raise
+
+    @classmethod
+    def load(cls, root: Path = BUNDLE_DIR) -> Optional["TranslationBundle"]:
+        """
+        Maps the bundle in `root`. Returns None if there is none, it is from another format version,
+        or it is damaged (the server then runs from its SQLite store alone).
+        """
+        root = Path(root)
+        try:
+            with open(root / INDEX_FILE, encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read translation bundle {root}: {e}")
+            return None
+        if payload.get("version") != BUNDLE_FORMAT_VERSION:
+            print(f"Translation bundle {root} has format version {payload.get('version')}, ignoring it.")
+            return None
+        try:
+            entries = {
+                (phrase, lang): BundleEntry(*values)
+                for lang, phrases in payload["phrases"].items()
+                for phrase, values in phrases.items()
+            }
+            categories = {(category, lang): text
+                          for lang, names in payload["categories"].items() for category, text in names.items()}
+            clips = {audio_hash: (offset, length) for audio_hash, (offset, length) in payload["clips"].items()}
+            audio_file = root / payload["audio_file"] if payload.get("audio_file") else None
+            return cls(root, payload["generation"], payload["built_at"], entries, categories, clips, audio_file)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"❌ Ignoring damaged translation bundle {root}: {e}")
+            return None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: CacheKey) -> Optional[BundleEntry]:
+        return self.entries.get(key)
+
+    def has_audio_hash(self, audio_hash: str) -> bool:
+        return audio_hash in self.clips
+
+    def audio_bytes(self, audio_hash: str) -> Optional[bytes]:
+        span = self.clips.get(audio_hash)
+        if span is None or self._map is None:
+            return None
+        offset, length = span
+        return self._map[offset:offset + length]
+
+    def iter_clips(self) -> Iterator[Tuple[str, bytes]]:
+        for audio_hash in self.clips:
+            yield audio_hash, self.audio_bytes(audio_hash)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "generation": self.generation,
+            "built_at": self.built_at,
+            "phrases": len(self.entries),
+            "with_audio": sum(1 for e in self.entries.values() if e.audio_hash),
+            "categories": len(self.categories),
+            "clips": len(self.clips),
+            "audio_bytes": self._map.size() if self._map is not None else 0,
+        }
+
+
+class BundleWriter:
+    """Packs clips into the next generation's audio file, then publishes the index with an atomic rename."""
+
+    def __init__(self, root: Path, generation: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.generation = generation
+        self.audio_name = f"audio-{generation}.bin"
+        self._partial = self.root / f"{self.audio_name}.part"
+        self._file = open(self._partial, "wb")
+        self.clips: Dict[str, Tuple[int, int]] = {}
+        self.entries: Dict[CacheKey, BundleEntry] = {}
+        self.categories: Dict[CacheKey, str] = {}
+
+    def add_clip(self, audio: bytes) -> str:
+        """Appends a clip unless an identical one is already packed; returns its sha256."""
+        audio_hash = hashlib.sha256(audio).hexdigest()
+        if audio_hash not in self.clips:
+            self.clips[audio_hash] = (self._file.tell(), len(audio))
+            self._file.write(audio)
+        return audio_hash
+
+    def add(self, key: CacheKey, text: str, audio: Optional[bytes] = None, fingerprint: Optional[str] = None):
+        audio_hash = self.add_clip(audio) if audio else None
+        self.entries[key] = BundleEntry(text, audio_hash, fingerprint if audio_hash else None)
+
+    def discard(self):
+        self._file.close()
+        self._partial.unlink(missing_ok=True)
+
+    def publish(self) -> Path:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._partial, self.root / self.audio_name)
+
+        phrases: Dict[str, Dict[str, list]] = {}
+        for (phrase, lang), entry in sorted(self.entries.items()):
+            phrases.setdefault(lang, {})[phrase] = [entry.text, entry.audio_hash, entry.fingerprint]
+        categories: Dict[str, Dict[str, str]] = {}
+        for (category, lang), text in sorted(self.categories.items()):
+            categories.setdefault(lang, {})[category] = text
+        payload = {
+            "version": BUNDLE_FORMAT_VERSION,
+            "generation": self.generation,
+            "built_at": time.time(),
+            "audio_file": self.audio_name,
+            "phrases": phrases,
+            "categories": categories,
+            "clips": {audio_hash: list(span) for audio_hash, span in self.clips.items()},
+        }
+        tmp = self.root / f"{INDEX_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.root / INDEX_FILE)
+
+        # Earlier generations are no longer referenced; a server that still maps one keeps its open inode.
+        for old in self.root.glob("audio-*.bin"):
+            if old.name != self.audio_name:
+                old.unlink(missing_ok=True)
+        return self.root / INDEX_FILE
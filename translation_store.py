@@ -0,0 +1,325 @@
+# translation_store.py
+
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# Persistent cache for phrase translations, TTS audio and category names.
+# Each entry is one SQLite row (WAL mode), so a cache miss writes a single row
+# instead of re-serializing the whole cache. Only the index (keys, text and
+# the SHA-256 of the audio) is held in memory; audio bytes are read on demand.
+# The audio hash doubles as a content address for the /audio/{hash} endpoint.
+# A prebuilt translation bundle (translation_bundle.py) can be attached on top:
+# its entries take precedence and its clips are read from the memory map.
+
+CACHE_DB_FILE = Path(os.environ.get("TRANSLATION_CACHE_DB", "translations_cache.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    phrase TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    text TEXT,
+    audio BLOB,
+    audio_hash TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (phrase, lang)
+);
+
+CREATE TABLE IF NOT EXISTS category_translations (
+    category TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (category, lang)
+);
+
+-- Remembers which legacy JSON files have already been imported.
+CREATE TABLE IF NOT EXISTS migrations (
+    source TEXT PRIMARY KEY,
+    signature TEXT NOT NULL
+);
+"""
+
+CacheKey = Tuple[str, str]
+
+
+def audio_digest(audio: bytes) -> str:
+    return hashlib.sha256(audio).hexdigest()
+
+
+class TranslationStore:
+    """
+    An indexed, append-friendly translation cache backed by SQLite in WAL mode.
+    All methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, db_path: Path = CACHE_DB_FILE):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.executescript(SCHEMA)
+        self._upgrade_schema()
+
+        self._texts: Dict[CacheKey, str] = {}
+        self._audio_hashes: Dict[CacheKey, str] = {}
+        self._hashes: Set[str] = set()
+        self.categories: Dict[CacheKey, str] = {}
+        self.bundle = None
+
+    def _upgrade_schema(self):
+        """Adds and backfills the audio_hash column on stores created before it existed."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(translations);")]
+        if "audio_hash" not in columns:
+            self._conn.execute("ALTER TABLE translations ADD COLUMN audio_hash TEXT;")
+        missing = self._conn.execute(
+            "SELECT phrase, lang, audio FROM translations WHERE audio IS NOT NULL AND audio_hash IS NULL;"
+        ).fetchall()
+        if missing:
+            self._conn.execute("BEGIN;")
+            self._conn.executemany(
+                "UPDATE translations SET audio_hash = ? WHERE phrase = ? AND lang = ?;",
+                [(audio_digest(bytes(audio)), phrase, lang) for phrase, lang, audio in missing],
+            )
+            self._conn.execute("COMMIT;")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_audio_hash ON translations (audio_hash);")
+
+    # --- Index ---
+
+    def load_index(self):
+        """Loads keys, translated text and audio hashes. Audio itself stays on disk."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phrase, lang, text, audio_hash FROM translations;"
+            ).fetchall()
+            category_rows = self._conn.execute(
+                "SELECT category, lang, text FROM category_translations;"
+            ).fetchall()
+        for phrase, lang, text, audio_hash in rows:
+            if text is not None:
+                self._texts[(phrase, lang)] = text
+            if audio_hash is not None:
+                self._audio_hashes[(phrase, lang)] = audio_hash
+                self._hashes.add(audio_hash)
+        for category, lang, text in category_rows:
+            self.categories[(category, lang)] = text
+        print(f"Translation index loaded from {self.db_path}: {len(rows)} phrases, {len(category_rows)} categories.")
+
+    def attach_bundle(self, bundle):
+        """Layers a TranslationBundle over the store. Call after load_index; bundle entries win."""
+        self.bundle = bundle
+        for key, entry in bundle.entries.items():
+            self._texts[key] = entry.text
+            if entry.audio_hash:
+                self._audio_hashes[key] = entry.audio_hash
+                self._hashes.add(entry.audio_hash)
+        self.categories.update(bundle.categories)
+        print(f"Translation bundle generation {bundle.generation} attached: "
+              f"{len(bundle.entries)} phrases, {len(bundle.clips)} clips.")
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._texts
+
+    def get_text(self, key: CacheKey) -> Optional[str]:
+        return self._texts.get(key)
+
+    def has_audio(self, key: CacheKey) -> bool:
+        return key in self._audio_hashes
+
+    def get_audio_hash(self, key: CacheKey) -> Optional[str]:
+        return self._audio_hashes.get(key)
+
+    def has_audio_hash(self, audio_hash: str) -> bool:
+        return audio_hash in self._hashes
+
+    def is_complete(self, key: CacheKey) -> bool:
+        return key in self._texts and key in self._audio_hashes
+
+    # --- Reads ---
+
+    def get_audio_bytes(self, key: CacheKey) -> Optional[bytes]:
+        """Reads the stored clip (Ogg/Opus or WAV) for one entry from the bundle or from disk."""
+        if key not in self._audio_hashes:
+            return None
+        if self.bundle is not None and self.bundle.has_audio_hash(self._audio_hashes[key]):
+            return self.bundle.audio_bytes(self._audio_hashes[key])
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT audio FROM translations WHERE phrase = ? AND lang = ?;", key
+            ).fetchone()
+        return bytes(row[0]) if row and row[0] is not None else None
+
+    def get_audio_base64(self, key: CacheKey) -> Optional[str]:
+        audio = self.get_audio_bytes(key)
+        return base64.b64encode(audio).decode("utf-8") if audio is not None else None
+
+    def get_audio_by_hash(self, audio_hash: str) -> Optional[bytes]:
+        """Reads audio by its content address. Identical clips share one hash."""
+        if audio_hash not in self._hashes:
+            return None
+        if self.bundle is not None and self.bundle.has_audio_hash(audio_hash):
+            return self.bundle.audio_bytes(audio_hash)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT audio FROM translations WHERE audio_hash = ? LIMIT 1;", (audio_hash,)
+            ).fetchone()
+        return bytes(row[0]) if row and row[0] is not None else None
+
+    # --- Writes ---
+
+    def put(self, key: CacheKey, text: Optional[str] = None, audio: Optional[bytes] = None):
+        """Upserts a single entry. Fields passed as None keep their stored value."""
+        audio_hash = audio_digest(audio) if audio is not None else None
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO translations (phrase, lang, text, audio, audio_hash) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (phrase, lang) DO UPDATE SET
+                    text = COALESCE(excluded.text, translations.text),
+                    audio = COALESCE(excluded.audio, translations.audio),
+                    audio_hash = COALESCE(excluded.audio_hash, translations.audio_hash),
+                    updated_at = CURRENT_TIMESTAMP;
+                """,
+                (key[0], key[1], text, audio, audio_hash),
+            )
+        if text is not None:
+            self._texts[key] = text
+        if audio_hash is not None:
+            self._audio_hashes[key] = audio_hash
+            self._hashes.add(audio_hash)
+
+    def audio_sizes(self) -> List[Tuple[CacheKey, bytes, int]]:
+        """(key, first 12 bytes, size) of every stored clip, enough to tell WAV from Ogg without reading it."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phrase, lang, substr(audio, 1, 12), length(audio) FROM translations WHERE audio IS NOT NULL;"
+            ).fetchall()
+        return [((phrase, lang), bytes(head), size) for phrase, lang, head, size in rows]
+
+    def vacuum(self):
+        """Rewrites the database file so space freed by smaller clips is returned to the OS."""
+        with self._lock:
+            self._conn.execute("VACUUM;")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")  # VACUUM goes through the WAL too
+
+    def put_category(self, key: CacheKey, text: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO category_translations (category, lang, text) VALUES (?, ?, ?);",
+                (key[0], key[1], text),
+            )
+        self.categories[key] = text
+
+    # --- Legacy JSON migration ---
+
+    def _already_migrated(self, source: Path, signature: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT signature FROM migrations WHERE source = ?;", (str(source.resolve()),)
+            ).fetchone()
+        return row is not None and row[0] == signature
+
+    def _read_legacy_json(self, source: Path) -> Optional[Tuple[Dict[CacheKey, object], str]]:
+        """The entries of a legacy file and its signature, or None if it is missing, unreadable or already imported."""
+        if not source.exists():
+            return None
+        stat = source.stat()
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        if self._already_migrated(source, signature):
+            return None
+        try:
+            with source.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (IOError, json.JSONDecodeError, ValueError) as e:
+            print(f"Could not read legacy cache {source}: {e}")
+            return None
+        entries = {}
+        for k_str, v in data.items():
+            parts = k_str.split("||")
+            if len(parts) == 2:
+                entries[(parts[0], parts[1])] = v
+        return entries, signature
+
+    def _import_legacy(self, source: Path, signature: str, sql: str, rows: list):
+        """Writes the rows and records the file as imported in one transaction, so a crash re-imports it."""
+        with self._lock:
+            self._conn.execute("BEGIN;")
+            try:
+                self._conn.executemany(sql, rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO migrations (source, signature) VALUES (?, ?);",
+                    (str(source.resolve()), signature),
+                )
+                self._conn.execute("COMMIT;")
+            except BaseException:
+                self._conn.execute("ROLLBACK;")
+                raise
+
+    def migrate_json(self, cache_file: Optional[Path] = None, category_file: Optional[Path] = None) -> Dict[str, int]:
+        """
+        Imports legacy `translations_cache.json` / `categories.json` files.
+        Values already in the store win; legacy values only fill fields the store lacks
+        (such as the audio of an entry cached as text only). A file is only re-imported if it changed.
+        """
+        counts = {"phrases": 0, "categories": 0}
+
+        if cache_file is not None:
+            legacy = self._read_legacy_json(Path(cache_file))
+            if legacy is not None:
+                entries, signature = legacy
+                rows = []
+                for (phrase, lang), value in entries.items():
+                    if not isinstance(value, dict) or "text" not in value:
+                        continue
+                    audio = base64.b64decode(value["audio"]) if value.get("audio") else None
+                    rows.append((phrase, lang, value["text"], audio, audio_digest(audio) if audio else None))
+                self._import_legacy(
+                    Path(cache_file), signature,
+                    """
+                    INSERT INTO translations (phrase, lang, text, audio, audio_hash) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (phrase, lang) DO UPDATE SET
+                        text = COALESCE(translations.text, excluded.text),
+                        audio = COALESCE(translations.audio, excluded.audio),
+                        audio_hash = COALESCE(translations.audio_hash, excluded.audio_hash);
+                    """,
+                    rows,
+                )
+                counts["phrases"] = len(rows)
+
+        if category_file is not None:
+            legacy = self._read_legacy_json(Path(category_file))
+            if legacy is not None:
+                entries, signature = legacy
+                rows = [(c, lang, text) for (c, lang), text in entries.items() if isinstance(text, str)]
+                self._import_legacy(
+                    Path(category_file), signature,
+                    "INSERT OR IGNORE INTO category_translations (category, lang, text) VALUES (?, ?, ?);",
+                    rows,
+                )
+                counts["categories"] = len(rows)
+
+        if counts["phrases"] or counts["categories"]:
+            print(f"Migrated legacy JSON cache into {self.db_path}: {counts}")
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    # One-off migration: python translation_store.py
+    store = TranslationStore()
+    result = store.migrate_json(Path("translations_cache.json"), Path("categories.json"))
+    store.load_index()
+    store.close()
+    print(f"Done: {result}")
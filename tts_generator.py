@@ -1,82 +1,119 @@
 # tts_generator.py
 
+import asyncio
+import io
 import os
-import requests
 import wave
-from pathlib import Path
-from piper import PiperVoice
-from fastapi.responses import FileResponse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+from fastapi.responses import Response, StreamingResponse
 
-# --- Configuration ---
-# Directory to store the downloaded Piper voice models
-MODEL_DIR = Path("./piper_models")
-MODEL_DIR.mkdir(exist_ok=True)
+from audio_cache import AudioLRUCache
+from singleflight import SingleFlight
+from tts_streaming import STREAM_MEDIA_TYPES, STREAM_TIMINGS, SpeechStream, split_for_tts
+from voice_registry import PIPER_MODEL_DIR, VoiceRegistry, VoiceSpec, voices_from_env
 
+# --- Configuration ---
 # Define the voice models we want to use for each language.
 # This has been updated to the "arya" voice model, which is currently available.
+# More languages: PIPER_VOICES="ml=ml_IN-meera-medium,ne=ne_NP-google-medium" (optionally name@sha256).
 VOICE_MODELS = {
-    "hi": {
-        "model_url": "https://huggingface.co/rhasspy/piper-voices/resolve/main/hi/hi_IN/arya/hi_IN-arya-medium.onnx",
-        "config_url": "https://huggingface.co/rhasspy/piper-voices/resolve/main/hi/hi_IN/arya/hi_IN-arya-medium.onnx.json",
-        "model_path": MODEL_DIR / "hi_IN-arya-medium.onnx",
-        "config_path": MODEL_DIR / "hi_IN-arya-medium.onnx.json",
-    }
+    "hi": VoiceSpec(
+        "hi", "hi_IN-arya-medium",
+        model_url="https://huggingface.co/rhasspy/piper-voices/resolve/main/hi/hi_IN/arya/hi_IN-arya-medium.onnx",
+        config_url="https://huggingface.co/rhasspy/piper-voices/resolve/main/hi/hi_IN/arya/hi_IN-arya-medium.onnx.json",
+    ),
+    **voices_from_env(os.environ.get("PIPER_VOICES", "")),
 }
+# Voices loaded when the server starts; the others load on first use.
+TTS_PRELOAD = [lang for lang in os.environ.get("TTS_PRELOAD", "hi").split(",") if lang]
 
-TTS_PIPER_VOICES = {}
+# Synthesis runs on its own small thread pool (ONNX Runtime releases the GIL), writing
+# WAVs into memory. Finished clips are kept in an LRU cache bounded by total bytes, so
+# repeated lesson phrases never reach the model again.
+TTS_SYNTH_WORKERS = int(os.environ.get("TTS_SYNTH_WORKERS", "2"))
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024
+# ONNX Runtime intra-op threads per voice; by default the cores are split between the synthesis workers.
+TTS_INTRA_OP_THREADS = int(os.environ.get("PIPER_INTRA_OP_THREADS", "0")) or \
+    max(1, (os.cpu_count() or 1) // max(1, TTS_SYNTH_WORKERS))
 
-def download_file(url: str, local_path: Path):
-    """Downloads a file from a URL to a local path if it doesn't exist."""
-    if local_path.exists():
-        print(f"✅ Model file already exists: {local_path.name}")
-        return
-    print(f"Downloading model file: {local_path.name}...")
-    try:
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            with open(local_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        print(f"✅ Download complete: {local_path.name}")
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Failed to download {url}: {e}")
+TTS_CACHE = AudioLRUCache(TTS_CACHE_MAX_BYTES)
+_synth_executor = ThreadPoolExecutor(max_workers=max(1, TTS_SYNTH_WORKERS), thread_name_prefix="piper")
+# Concurrent requests for the same clip share one synthesis.
+_synth_flights = SingleFlight("piper")
+VOICES = VoiceRegistry(VOICE_MODELS, PIPER_MODEL_DIR, intra_op_threads=TTS_INTRA_OP_THREADS)
 
 def load_tts_models():
-    """Downloads all required TTS models and loads them into memory."""
+    """Fetches every configured voice in parallel and loads the TTS_PRELOAD ones; the rest load on first use."""
     print("Loading TTS models...")
-    for lang, model_info in VOICE_MODELS.items():
-        download_file(model_info["model_url"], model_info["model_path"])
-        download_file(model_info["config_url"], model_info["config_path"])
-
-        if model_info["model_path"].exists() and model_info["config_path"].exists():
+    available = VOICES.download_all()
+    print(f"✅ TTS voices available: {sorted(lang for lang, ok in available.items() if ok)}")
+    for lang in TTS_PRELOAD:
+        if available.get(lang):
             try:
-                voice = PiperVoice.from_onnx(str(model_info["model_path"]), str(model_info["config_path"]))
-                TTS_PIPER_VOICES[lang] = voice
-                print(f"✅ Successfully loaded TTS model for language: {lang}")
+                with VOICES.use(lang):
+                    pass
             except Exception as e:
                 print(f"❌ Error loading TTS model for {lang}: {e}")
-        else:
-            print(f"❌ Cannot load TTS model for {lang}: Model files not found.")
 
-def generate_speech_audio(text: str, language: str) -> FileResponse:
-    """
-    Generates speech from text using the loaded Piper TTS model
-    and returns it as a temporary WAV file response.
-    """
-    if language not in TTS_PIPER_VOICES:
-        raise ValueError(f"No TTS model loaded for language: {language}")
+def voice_name(language: str) -> str:
+    return VOICE_MODELS[language].name
+
+
+def synthesize_wav(text: str, language: str) -> bytes:
+    """Blocking: synthesizes `text` into an in-memory WAV, loading the voice first if needed."""
+    buffer = io.BytesIO()
+    with VOICES.use(language) as voice, wave.open(buffer, "wb") as wav_file:
+        voice.synthesize(text, wav_file)
+    return buffer.getvalue()
 
-    voice = TTS_PIPER_VOICES[language]
-    output_path = Path("temp_tts_output.wav")
+
+async def generate_speech_bytes(text: str, language: str) -> bytes:
+    """WAV bytes for `text`, from the cache or synthesized on the worker pool."""
+    if language not in VOICES:
+        raise ValueError(f"No TTS model configured for language: {language}")
+    key = (text, language, voice_name(language))
+    audio = TTS_CACHE.get(key)
+    if audio is not None:
+        return audio
+
+    async def synthesize() -> bytes:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_synth_executor, partial(synthesize_wav, text, language))
+        TTS_CACHE.put(key, result)
+        return result
 
     try:
-        with wave.open(str(output_path), "wb") as wav_file:
-            voice.synthesize(text, wav_file)
-        return FileResponse(path=output_path, media_type="audio/wav", filename="pronunciation.wav")
+        return await _synth_flights.do(key, synthesize)
     except Exception as e:
         print(f"❌ Error during speech synthesis: {e}")
         raise ValueError("Failed to generate speech audio.")
 
 
+async def generate_speech_audio(text: str, language: str) -> Response:
+    """
+    Generates speech from text using the loaded Piper TTS model
+    and returns it as an in-memory WAV response.
+    """
+    audio = await generate_speech_bytes(text, language)
+    return Response(content=audio, media_type="audio/wav",
+                    headers={"Content-Disposition": 'attachment; filename="pronunciation.wav"'})
+
+
+async def stream_speech_audio(text: str, language: str, fmt: str = "wav") -> StreamingResponse:
+    """
+    Streams speech sentence by sentence: the response starts once the first segment
+    is synthesized, and later segments are sent as they finish.
+    """
+    if language not in VOICES:
+        raise ValueError(f"No TTS model configured for language: {language}")
+    stream = SpeechStream(split_for_tts(text), lambda segment: generate_speech_bytes(segment, language),
+                          label=f"piper/{language}")
+    await stream.open()
+    return StreamingResponse(stream.body(fmt), media_type=STREAM_MEDIA_TYPES[fmt], headers=stream.headers(fmt))
 
 
+def tts_stats() -> dict:
+    return {"voices": VOICES.stats(), "workers": TTS_SYNTH_WORKERS, "intra_op_threads": TTS_INTRA_OP_THREADS,
+            "cache": TTS_CACHE.stats(), "coalescing": _synth_flights.stats(), "streams": STREAM_TIMINGS.stats()}
@@ -0,0 +1,99 @@
+# tts_queue.py
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+# Background TTS stage. Translations are returned as soon as they exist, and
+# their audio is produced here by a small pool of workers. Callers can poll the
+# status of a key or wait for it with a deadline.
+
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "2"))
+TTS_RETRY_AFTER_SECONDS = float(os.environ.get("TTS_RETRY_AFTER_SECONDS", "300"))
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+
+
+class TTSQueue:
+    """
+    A deduplicating job queue for audio generation.
+    `synthesize(key)` must generate and persist the audio, returning True on success.
+    """
+
+    def __init__(self, synthesize: Callable[[Hashable], Awaitable[bool]], workers: int = TTS_WORKERS,
+                 retry_after: float = TTS_RETRY_AFTER_SECONDS):
+        self._synthesize = synthesize
+        self.workers = max(1, workers)
+        self.retry_after = retry_after
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._status: Dict[Hashable, str] = {}
+        self._failed_at: Dict[Hashable, float] = {}
+        self._done: Dict[Hashable, asyncio.Event] = {}
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self, key: Hashable) -> Optional[str]:
+        """Pending, running or failed; None once a job succeeded (the cache is then the source of truth)."""
+        return self._status.get(key)
+
+    def enqueue(self, key: Hashable) -> str:
+        """
+        Queues audio generation for a key unless it is already queued, running,
+        done, or failed recently. Returns the key's current status.
+        """
+        status = self._status.get(key)
+        if status in (PENDING, RUNNING):
+            return status
+        if status == FAILED and time.monotonic() - self._failed_at.get(key, 0.0) < self.retry_after:
+            return status
+        self._status[key] = PENDING
+        self._done[key] = asyncio.Event()
+        self._queue.put_nowait(key)
+        return PENDING
+
+    async def wait(self, key: Hashable, timeout: Optional[float]):
+        """Waits up to `timeout` seconds (None = forever) for a queued key to finish."""
+        event = self._done.get(key)
+        if event is not None and timeout != 0:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            self._status[key] = RUNNING
+            try:
+                ok = await self._synthesize(key)
+            except Exception as e:
+                print(f"TTS job failed for {key}: {e}")
+                ok = False
+            if ok:
+                self._status.pop(key, None)
+                self._failed_at.pop(key, None)
+            else:
+                self._status[key] = FAILED
+                self._failed_at[key] = time.monotonic()
+            event = self._done.pop(key, None)
+            if event:
+                event.set()
+            self._queue.task_done()
+
+    def stats(self) -> dict:
+        counts: Dict[str, int] = {}
+        for status in self._status.values():
+            counts[status] = counts.get(status, 0) + 1
+        return {"workers": self.workers, "queue_depth": self._queue.qsize(), **counts}
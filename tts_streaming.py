@@ -0,0 +1,242 @@
+# tts_streaming.py
+
+import asyncio
+import io
+import os
+import re
+import struct
+import time
+import wave
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+# Sentence-chunked streaming TTS. Long input is split on sentence boundaries
+# (., !, ?, danda and double danda) and, where a sentence is still too long, on
+# clause boundaries. Segments are synthesized in order, with the next few
+# already in flight, and each one's PCM is sent as soon as it is ready, so
+# playback can start after the first segment instead of after the whole clip.
+# Works with any backend that turns one segment into a WAV (Piper, Parler).
+# Time to first audio goes out in Server-Timing; the total synthesis time is
+# only known after the body is sent, so every finished stream is recorded in
+# STREAM_TIMINGS, which the health endpoints report.
+
+TTS_SEGMENT_MAX_CHARS = int(os.environ.get("TTS_SEGMENT_MAX_CHARS", "120"))
+# Segments synthesized ahead of the one being streamed.
+TTS_STREAM_PREFETCH = int(os.environ.get("TTS_STREAM_PREFETCH", "1"))
+# Finished streams whose timings are kept for the stats endpoints.
+TTS_STREAM_TIMINGS_KEPT = int(os.environ.get("TTS_STREAM_TIMINGS_KEPT", "200"))
+
+# Latin terminators need following whitespace (so "3.5" stays whole); a danda ends a sentence by itself.
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[।॥])\s*")
+_CLAUSE_END = re.compile(r"(?<=[,;:–—])\s+")
+
+
+class AudioParams(NamedTuple):
+    channels: int
+    sample_width: int  # bytes per sample
+    sample_rate: int
+
+
+def _pack(pieces: List[str], max_chars: int) -> List[str]:
+    """Greedily joins pieces (with spaces) into chunks of at most max_chars where possible."""
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_for_tts(text: str, max_chars: int = TTS_SEGMENT_MAX_CHARS) -> List[str]:
+    """Splits text into speakable segments: sentences, then clauses, then words for overlong ones."""
+    segments = []
+    for sentence in (s.strip() for s in _SENTENCE_END.split(text)):
+        if not any(char.isalnum() for char in sentence):
+            continue  # nothing to say, e.g. a stray "।" or "..."
+        if len(sentence) <= max_chars:
+            segments.append(sentence)
+            continue
+        for clause in _pack([c.strip() for c in _CLAUSE_END.split(sentence) if c.strip()], max_chars):
+            segments.extend([clause] if len(clause) <= max_chars else _pack(clause.split(), max_chars))
+    return segments
+
+
+def read_wav(data: bytes) -> Tuple[AudioParams, bytes]:
+    """PCM parameters and frames of a WAV clip."""
+    with wave.open(io.BytesIO(data), "rb") as wav_file:
+        params = AudioParams(wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate())
+        return params, wav_file.readframes(wav_file.getnframes())
+
+
+def streaming_wav_header(params: AudioParams) -> bytes:
+    """A WAV header for a stream of unknown length (sizes set to the maximum, as live streams do)."""
+    block_align = params.channels * params.sample_width
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, params.channels, params.sample_rate,
+                                    params.sample_rate * block_align, block_align, params.sample_width * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+def _percentiles(values: List[float]) -> Optional[dict]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {name: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("max", 1.0))}
+
+
+class StreamTimings:
+    """Per-request timings of the most recent finished streams."""
+
+    def __init__(self, keep: int = TTS_STREAM_TIMINGS_KEPT):
+        self.recent: deque = deque(maxlen=max(1, keep))
+        self.streams = 0
+        self.completed = 0
+
+    def record(self, stream: "SpeechStream", completed: bool):
+        self.streams += 1
+        self.completed += completed
+        self.recent.append({
+            "label": stream.label,
+            "first_audio_ms": round(stream.first_audio_ms or 0, 1),
+            "total_ms": round(stream.elapsed_ms(), 1),
+            "segments": len(stream.segments),
+            "sent_segments": stream.sent_segments,
+            "skipped_segments": stream.skipped_segments,
+            "bytes": stream.sent_bytes,
+            "completed": completed,
+        })
+
+    def stats(self, last: int = 10) -> dict:
+        finished = [timing for timing in self.recent if timing["completed"]]
+        return {
+            "streams": self.streams,
+            "completed": self.completed,
+            "first_audio_ms": _percentiles([timing["first_audio_ms"] for timing in self.recent]),
+            "total_ms": _percentiles([timing["total_ms"] for timing in finished]),
+            "recent": list(self.recent)[-last:],
+        }
+
+
+STREAM_TIMINGS = StreamTimings()
+
+
+class SpeechStream:
+    """
+    Synthesizes segments in order with `prefetch` of them running ahead.
+    `open()` waits for the first playable segment, so its parameters are known before
+    any response header is sent; iterate the object for the PCM chunks.
+    """
+
+    def __init__(self, segments: List[str], synthesize: Callable[[str], Awaitable[Optional[bytes]]],
+                 prefetch: int = TTS_STREAM_PREFETCH, label: str = "tts", timings: StreamTimings = STREAM_TIMINGS):
+        self.segments = segments
+        self.synthesize = synthesize
+        self.prefetch = max(0, prefetch)
+        self.label = label
+        self.timings = timings
+        self.params: Optional[AudioParams] = None
+        self.started = time.perf_counter()
+        self.first_audio_ms: Optional[float] = None
+        self.sent_segments = 0
+        self.skipped_segments = 0
+        self.sent_bytes = 0
+        self._next = 0
+        self._pending: deque = deque()
+        self._first: Optional[bytes] = None
+        self._finished = False
+
+    def _schedule(self):
+        while self._next < len(self.segments) and len(self._pending) <= self.prefetch:
+            segment = self.segments[self._next]
+            self._pending.append((segment, asyncio.create_task(self.synthesize(segment))))
+            self._next += 1
+
+    async def _next_frames(self) -> Optional[bytes]:
+        """PCM of the next segment that synthesizes cleanly, or None when all are done."""
+        while True:
+            self._schedule()
+            if not self._pending:
+                return None
+            segment, task = self._pending.popleft()
+            try:
+                audio = await task
+                params, frames = read_wav(audio) if audio else (None, b"")
+            except Exception as e:
+                print(f"❌ {self.label}: segment '{segment[:40]}' failed: {e}")
+                params, frames = None, b""
+            if not frames or (self.params is not None and params != self.params):
+                self.skipped_segments += 1
+                continue
+            self.params = params
+            return frames
+
+    async def open(self) -> AudioParams:
+        self._first = await self._next_frames()
+        if self._first is None:
+            self.close()
+            raise ValueError("No segment could be synthesized.")
+        self.first_audio_ms = (time.perf_counter() - self.started) * 1000
+        return self.params
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        frames = self._first
+        try:
+            while frames is not None:
+                self.sent_segments += 1
+                self.sent_bytes += len(frames)
+                yield frames
+                frames = await self._next_frames()
+        finally:
+            self._finish(completed=frames is None)
+
+    def _finish(self, completed: bool):
+        """Cancels what is still in flight and records the stream's timings, once."""
+        self.close()
+        if self._finished:
+            return
+        self._finished = True
+        self.timings.record(self, completed)
+        print(f"🔊 {self.label}: {self.sent_segments}/{len(self.segments)} segments, {self.sent_bytes} bytes, "
+              f"first audio {self.first_audio_ms or 0:.0f} ms, total {self.elapsed_ms():.0f} ms"
+              + (f", {self.skipped_segments} skipped" if self.skipped_segments else ""))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def close(self):
+        for _, task in self._pending:
+            task.cancel()
+        self._pending.clear()
+
+    def headers(self, fmt: str) -> dict:
+        headers = {
+            "Server-Timing": f"first-audio;dur={self.first_audio_ms:.1f}",
+            "X-TTS-Segments": str(len(self.segments)),
+            "Cache-Control": "no-store",
+        }
+        if fmt == "pcm":
+            headers.update({"X-Audio-Sample-Rate": str(self.params.sample_rate),
+                            "X-Audio-Channels": str(self.params.channels),
+                            "X-Audio-Sample-Width": str(self.params.sample_width)})
+        return headers
+
+    async def body(self, fmt: str) -> AsyncIterator[bytes]:
+        """The response body: a streaming WAV header first unless raw PCM was asked for."""
+        chunks = self.__aiter__()
+        try:
+            if fmt == "wav":
+                yield streaming_wav_header(self.params)
+            async for frames in chunks:
+                yield frames
+        finally:
+            await chunks.aclose()
+            self._finish(completed=False)  # no-op if the frames ran out; else the client hung up
+
+
+# Raw PCM is little-endian like the WAV data; the X-Audio-* headers describe it.
+STREAM_MEDIA_TYPES = {"wav": "audio/wav", "pcm": "application/octet-stream"}
@@ -0,0 +1,251 @@
+# upstream.py
+
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Optional
+
+from gradio_client import Client
+
+# Managed access to the remote Gradio Spaces. Every service gets its own pool of
+# clients, its own worker threads, a concurrency cap, per-call deadlines, retries
+# with jittered backoff and a circuit breaker, so one slow Space cannot stall the
+# endpoints that depend on the others.
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the service's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one probe through after `reset_timeout`."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def would_allow(self) -> bool:
+        """Like allow(), without claiming the half-open probe: may a call be attempted right now?"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not self._probe_in_flight
+
+    def release_probe(self):
+        """A probe ended without an outcome (e.g. it was cancelled); let the next call probe instead."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_seconds": round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            if self.state == self.OPEN else 0.0,
+        }
+
+
+class UpstreamService:
+    """A pooled, rate-limited and circuit-broken Gradio client for one Space."""
+
+    def __init__(self, name: str, src: str, pool_size: int = 2, max_concurrency: int = 4,
+                 timeout: float = 60.0, retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 client_factory: Callable[[str], Any] = Client):
+        self.name = name
+        self.src = src
+        self.pool_size = max(1, pool_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._client_factory = client_factory
+
+        # Dedicated threads: a hung Space only ever ties up its own workers,
+        # never the default executor the rest of the app relies on.
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f"upstream-{name}")
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._clients: List[Any] = []
+        self._next_client = 0
+        self._connected = False
+        self._connect_failed_at = float("-inf")
+        self._connect_lock = asyncio.Lock()
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name: str, src: str, **defaults) -> "UpstreamService":
+        """Builds a service whose settings can be overridden with UPSTREAM_<NAME>_* variables."""
+        prefix = f"UPSTREAM_{name.upper()}_"
+        settings = dict(defaults)
+        for key, cast in (("pool_size", int), ("max_concurrency", int), ("timeout", float), ("retries", int),
+                          ("failure_threshold", int), ("reset_timeout", float)):
+            value = os.environ.get(prefix + key.upper())
+            if value is not None:
+                settings[key] = cast(value)
+        return cls(name, src, **settings)
+
+    @property
+    def available(self) -> bool:
+        """
+        True if a call may be attempted now: the breaker is closed, or open long enough for
+        a half-open probe, and the pool is connected or due for a lazy reconnect attempt.
+        """
+        if not self._connected and time.monotonic() - self._connect_failed_at < self.breaker.reset_timeout:
+            return False
+        return self.breaker.would_allow()
+
+    async def connect(self) -> bool:
+        """Creates the client pool. Safe to call repeatedly; returns whether the pool is ready."""
+        async with self._connect_lock:
+            if self._connected:
+                return True
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._executor, self._client_factory, self.src) for _ in range(self.pool_size)),
+                return_exceptions=True,
+            )
+            clients: List[Any] = [r for r in results if not isinstance(r, BaseException)]
+            if not clients:
+                self._connect_failed_at = time.monotonic()
+                print(f"Error connecting to {self.name} upstream ({self.src}): {results[0]}")
+                return False
+            self._clients = clients
+            self.pool_size = len(clients)
+            self._connected = True
+            print(f"Upstream '{self.name}' connected with {len(clients)} clients.")
+            return True
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": a random delay up to the exponential cap.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def predict(self, *args, **kwargs) -> Any:
+        """Calls `Client.predict` with a deadline, retries and circuit breaking."""
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise CircuitOpenError(f"Upstream '{self.name}' is unavailable (circuit open).") from last_error
+            try:
+                # Reconnects lazily if the pool never came up (or startup failed).
+                if not self._connected and not await self.connect():
+                    self.failures += 1
+                    self.breaker.record_failure()
+                    last_error = ConnectionError(f"Could not connect to upstream '{self.name}'.")
+                else:
+                    try:
+                        result = await self._call_once(*args, **kwargs)
+                        self.breaker.record_success()
+                        return result
+                    except asyncio.TimeoutError as e:
+                        self.timeouts += 1
+                        last_error = e
+                    except Exception as e:
+                        last_error = e
+                    self.failures += 1
+                    self.breaker.record_failure()
+            except BaseException:
+                # Cancelled mid-call: no outcome, but a half-open probe must not stay claimed forever.
+                self.breaker.release_probe()
+                raise
+            if attempt < self.retries:
+                await asyncio.sleep(self._backoff(attempt))
+        raise last_error
+
+    async def _call_once(self, *args, **kwargs) -> Any:
+        """
+        One call under the deadline, which also covers waiting for a slot. A call that times out
+        keeps its slot until its thread actually returns, so a hung Space cannot pile up threads.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.calls += 1
+        # Clients are handed out round-robin; the semaphore, not the pool size, caps concurrency.
+        client = self._clients[self._next_client % len(self._clients)]
+        self._next_client += 1
+        try:
+            future = self._executor.submit(partial(client.predict, *args, **kwargs))
+        except BaseException:
+            self._release_slot()
+            raise
+        future.add_done_callback(lambda _f: self._call_soon(loop, self._release_slot))
+        return await asyncio.wait_for(asyncio.wrap_future(future), max(0.0, deadline - loop.time()))
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, callback):
+        """Runs `callback` on the event loop from an executor thread; a closed loop has no slots left to free."""
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "src": self.src,
+            "connected": self._connected,
+            "pool_size": self.pool_size,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "saturation": round(self.in_flight / self.max_concurrency, 2),
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "breaker": self.breaker.stats(),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,295 @@
+# voice_registry.py
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Piper voices by language, fetched and loaded only when needed.
+#
+# Downloads run in parallel and go to "<file>.part" first. An interrupted
+# download resumes with an HTTP Range request. The finished file is checked
+# against a pinned sha256 or, failing that, the sha256 Hugging Face reports for
+# LFS files (X-Linked-Etag); it is only renamed into place once it matches.
+# A voice is loaded on first use. Loaded voices are kept in LRU order under a
+# memory budget, estimated from the model size. Idle voices are evicted to
+# make room; voices still in use are never evicted. Every voice gets its own
+# ONNX Runtime session with explicit thread settings, so several voices do not
+# each claim every core.
+#
+# Model files that already sit in the model directory are used as they are,
+# so the registry works offline with local models (PIPER_OFFLINE=1 forbids
+# downloads entirely).
+
+PIPER_MODEL_DIR = Path(os.environ.get("PIPER_MODEL_DIR", "piper_models"))
+PIPER_VOICE_BASE_URL = os.environ.get("PIPER_VOICE_BASE_URL",
+                                      "https://huggingface.co/rhasspy/piper-voices/resolve/main")
+PIPER_VOICE_MEMORY_BYTES = int(os.environ.get("PIPER_VOICE_MEMORY_MB", "512")) * 1024 * 1024
+# Resident memory of a loaded voice relative to its .onnx file (weights plus session buffers).
+PIPER_VOICE_MEMORY_FACTOR = float(os.environ.get("PIPER_VOICE_MEMORY_FACTOR", "1.5"))
+PIPER_DOWNLOAD_WORKERS = int(os.environ.get("PIPER_DOWNLOAD_WORKERS", "4"))
+PIPER_OFFLINE = os.environ.get("PIPER_OFFLINE", "0") == "1"
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class VoiceSpec(NamedTuple):
+    language: str
+    name: str  # file stem, e.g. "hi_IN-arya-medium"
+    model_url: Optional[str] = None  # None: the model must already be in the model directory
+    config_url: Optional[str] = None
+    model_sha256: Optional[str] = None
+    config_sha256: Optional[str] = None
+    threads: int = 0  # intra-op threads for this voice; 0 uses the registry default
+
+
+def piper_voice(language: str, name: str, model_sha256: Optional[str] = None, threads: int = 0) -> VoiceSpec:
+    """A voice from the rhasspy/piper-voices layout: <family>/<locale>/<speaker>/<quality>/<name>.onnx."""
+    locale, speaker, quality = name.split("-", 2)
+    url = f"{PIPER_VOICE_BASE_URL}/{locale.split('_')[0]}/{locale}/{speaker}/{quality}/{name}.onnx"
+    return VoiceSpec(language, name, url, f"{url}.json", model_sha256, threads=threads)
+
+
+def voices_from_env(value: str) -> Dict[str, VoiceSpec]:
+    """Parses "ml=ml_IN-meera-medium,ne=ne_NP-google-medium@<sha256>" into voice specs."""
+    specs = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        language, _, name = item.partition("=")
+        name, _, sha256 = name.partition("@")
+        specs[language.strip()] = piper_voice(language.strip(), name.strip(), sha256.strip() or None)
+    return specs
+
+
+class VerificationError(Exception):
+    pass
+
+
+def _linked_sha256(response) -> Optional[str]:
+    """The sha256 Hugging Face sends for LFS files, on the redirect or on the final response."""
+    for r in (*response.history, response):
+        etag = r.headers.get("X-Linked-Etag", "").removeprefix("W/").strip('"')
+        if _SHA256.fullmatch(etag):
+            return etag
+    return None
+
+
+def _check_json(path: Path):
+    with open(path, encoding="utf-8") as f:
+        json.load(f)
+
+
+def download_verified(url: str, path: Path, sha256: Optional[str] = None,
+                      check: Optional[Callable[[Path], None]] = None) -> Path:
+    """
+    Downloads `url` to `path` through `path.part`, resuming a previous partial download.
+    The file is only moved into place after its sha256 (pinned, or reported by the server)
+    matches and `check` accepts it.
+    """
+    import requests
+
+    part = path.with_name(path.name + ".part")
+    offset = part.stat().st_size if part.exists() else 0
+    digest = hashlib.sha256()
+    with requests.get(url, stream=True, timeout=(10, 60),
+                      headers={"Range": f"bytes={offset}-"} if offset else {}) as r:
+        expected = sha256 or _linked_sha256(r)
+        if r.status_code != 416:  # 416: the partial file is already complete
+            r.raise_for_status()
+            if offset and r.status_code != 206:
+                offset = 0  # the server ignored the range; start over
+            if offset:
+                print(f"Resuming {path.name} at {offset / 1e6:.1f} MB...")
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+    with open(part, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK_BYTES), b""):
+            digest.update(block)
+    try:
+        if expected and digest.hexdigest() != expected:
+            raise VerificationError(f"{path.name}: sha256 {digest.hexdigest()} does not match {expected}")
+        if check:
+            check(part)
+    except Exception:
+        part.unlink(missing_ok=True)  # a corrupt partial file must not be resumed
+        raise
+    os.replace(part, path)
+    return path
+
+
+def session_options(threads: int):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    return options
+
+
+def load_piper_voice(model_path: Path, config_path: Path, threads: int):
+    """Builds a PiperVoice on our own ONNX Runtime session so its threading can be set."""
+    import onnxruntime as ort
+    from piper import PiperVoice
+    from piper.config import PiperConfig
+
+    with open(config_path, encoding="utf-8") as f:
+        config = PiperConfig.from_dict(json.load(f))
+    session = ort.InferenceSession(str(model_path), session_options(threads), providers=["CPUExecutionProvider"])
+    return PiperVoice(session=session, config=config)
+
+
+class _LoadedVoice(NamedTuple):
+    voice: object
+    memory: int
+
+
+class VoiceRegistry:
+    """Lazily downloaded and loaded voices, kept under a memory budget. Thread-safe."""
+
+    def __init__(self, specs: Dict[str, VoiceSpec], model_dir: Path = PIPER_MODEL_DIR,
+                 memory_budget: int = PIPER_VOICE_MEMORY_BYTES, intra_op_threads: int = 0,
+                 download_workers: int = PIPER_DOWNLOAD_WORKERS, offline: bool = PIPER_OFFLINE,
+                 loader: Callable[[Path, Path, int], object] = load_piper_voice):
+        self.specs = dict(specs)
+        self.model_dir = Path(model_dir)
+        self.memory_budget = memory_budget
+        self.intra_op_threads = intra_op_threads
+        self.download_workers = max(1, download_workers)
+        self.offline = offline
+        self.loader = loader
+        self._loaded: "OrderedDict[str, _LoadedVoice]" = OrderedDict()
+        self._in_use = Counter()
+        self._lock = threading.Lock()
+        self._voice_locks = {language: threading.Lock() for language in self.specs}
+        self.memory = 0
+        self.loads = 0
+        self.evictions = 0
+        self.download_errors: Dict[str, str] = {}
+
+    def __contains__(self, language: str) -> bool:
+        return language in self.specs
+
+    def languages(self) -> List[str]:
+        return sorted(self.specs)
+
+    def paths(self, language: str) -> Tuple[Path, Path]:
+        name = self.specs[language].name
+        return self.model_dir / f"{name}.onnx", self.model_dir / f"{name}.onnx.json"
+
+    def _ensure_files(self, language: str) -> Tuple[Path, Path]:
+        """Blocking; call with the voice's lock held."""
+        spec = self.specs[language]
+        model_path, config_path = self.paths(language)
+        for path, url, sha256, check in ((model_path, spec.model_url, spec.model_sha256, None),
+                                         (config_path, spec.config_url, spec.config_sha256, _check_json)):
+            if path.exists():
+                continue
+            if url is None or self.offline:
+                raise FileNotFoundError(f"Voice file {path} is missing and cannot be downloaded.")
+            self.model_dir.mkdir(parents=True, exist_ok=True)
+            print(f"Downloading voice file: {path.name}...")
+            started = time.perf_counter()
+            download_verified(url, path, sha256, check)
+            print(f"✅ Downloaded {path.name} ({path.stat().st_size / 1e6:.1f} MB, "
+                  f"{time.perf_counter() - started:.1f} s)")
+        return model_path, config_path
+
+    def download(self, language: str) -> bool:
+        with self._voice_locks[language]:
+            try:
+                self._ensure_files(language)
+                self.download_errors.pop(language, None)
+                return True
+            except Exception as e:
+                self.download_errors[language] = str(e)
+                print(f"❌ Failed to download voice for {language}: {e}")
+                return False
+
+    def download_all(self, languages: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """Fetches the files of several voices in parallel; returns which ones are now available."""
+        languages = [language for language in (languages or self.specs) if language in self.specs]
+        if not languages:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.download_workers, len(languages)),
+                                thread_name_prefix="voice-download") as pool:
+            return dict(zip(languages, pool.map(self.download, languages)))
+
+    def _evict_for(self, needed: int):
+        """Drops idle voices, least recently used first, until `needed` more bytes fit. Lock held."""
+        for language in list(self._loaded):
+            if self.memory + needed <= self.memory_budget:
+                return
+            if self._in_use[language]:
+                continue
+            self.memory -= self._loaded.pop(language).memory
+            self.evictions += 1
+            print(f"Evicted TTS voice for {language} ({self.memory / 1e6:.0f} MB still loaded)")
+
+    def _acquire(self, language: str):
+        with self._lock:
+            loaded = self._loaded.get(language)
+            if loaded is not None:
+                self._loaded.move_to_end(language)
+                self._in_use[language] += 1
+                return loaded.voice
+        with self._voice_locks[language]:
+            with self._lock:  # another thread may have loaded it while we waited
+                loaded = self._loaded.get(language)
+                if loaded is not None:
+                    self._loaded.move_to_end(language)
+                    self._in_use[language] += 1
+                    return loaded.voice
+            model_path, config_path = self._ensure_files(language)
+            memory = int(model_path.stat().st_size * PIPER_VOICE_MEMORY_FACTOR)
+            with self._lock:
+                self._evict_for(memory)
+            started = time.perf_counter()
+            voice = self.loader(model_path, config_path, self.specs[language].threads or self.intra_op_threads)
+            with self._lock:
+                self._evict_for(memory)  # voices may have been loaded meanwhile
+                if self.memory + memory > self.memory_budget:
+                    print("❌ TTS voices exceed the memory budget: every other voice is in use.")
+                self._loaded[language] = _LoadedVoice(voice, memory)
+                self.memory += memory
+                self.loads += 1
+                self._in_use[language] += 1
+            print(f"✅ Loaded TTS voice for {language} in {time.perf_counter() - started:.1f} s "
+                  f"(~{memory / 1e6:.0f} MB, {self.memory / 1e6:.0f}/{self.memory_budget / 1e6:.0f} MB in use)")
+            return voice
+
+    @contextmanager
+    def use(self, language: str):
+        """Blocking: the voice for `language`, loaded if needed and pinned in memory while in use."""
+        if language not in self.specs:
+            raise ValueError(f"No TTS model configured for language: {language}")
+        voice = self._acquire(language)
+        try:
+            yield voice
+        finally:
+            with self._lock:
+                self._in_use[language] -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "configured": self.languages(),
+                "loaded": list(self._loaded),
+                "memory_bytes": self.memory,
+                "memory_budget_bytes": self.memory_budget,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "download_errors": dict(self.download_errors),
+            }
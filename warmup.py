@@ -0,0 +1,102 @@
+# warmup.py
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+# Background cache warm-up. Jobs are drained by a fixed number of workers, and
+# each upstream service is additionally capped by its own semaphore,
+# so warm-up never floods a Gradio Space and never delays the server start.
+
+WARMUP_WORKERS = int(os.environ.get("WARMUP_WORKERS", "8"))
+
+# TTS is not listed here: audio is produced by the background TTS queue,
+# whose concurrency is set with TTS_WORKERS (see tts_queue.py).
+UPSTREAM_CONCURRENCY = {
+    "translation": int(os.environ.get("WARMUP_TRANSLATION_CONCURRENCY", "4")),
+}
+
+Job = Callable[[], Awaitable[object]]
+
+
+class WarmupScheduler:
+    """Runs warm-up jobs in the background with bounded parallelism and tracks progress."""
+
+    def __init__(self, workers: int = WARMUP_WORKERS, upstream_concurrency: Optional[Dict[str, int]] = None):
+        self.workers = max(1, workers)
+        self.concurrency = {name: max(1, n) for name, n in (upstream_concurrency or UPSTREAM_CONCURRENCY).items()}
+        self.limits: Dict[str, asyncio.Semaphore] = {name: asyncio.Semaphore(n) for name, n in self.concurrency.items()}
+        self.state = "idle"
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, jobs: Iterable[Job], prepare: Optional[Callable[[], Awaitable[bool]]] = None) -> asyncio.Task:
+        """
+        Schedules the warm-up as a background task and returns immediately.
+        `prepare` runs first (e.g. connecting clients); if it returns False, no jobs run.
+        """
+        self._task = asyncio.create_task(self._run(list(jobs), prepare))
+        return self._task
+
+    async def _run(self, jobs, prepare):
+        self.started_at = time.monotonic()
+        self.state = "preparing"
+        if prepare is not None and not await prepare():
+            self.state = "skipped"
+            self.finished_at = time.monotonic()
+            return
+
+        self.state = "running"
+        self.total = len(jobs)
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await job()
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Warm-up job failed: {e}")
+                finally:
+                    self.completed += 1
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, max(1, self.total)))))
+        self.state = "done"
+        self.finished_at = time.monotonic()
+        print(f"Warm-up finished: {self.completed} jobs ({self.failed} failed) in {self.elapsed():.1f}s")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self.state = "cancelled"
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def progress(self) -> dict:
+        return {
+            "state": self.state,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "percent": round(100.0 * self.completed / self.total, 1) if self.total else 0.0,
+            "elapsed_seconds": round(self.elapsed(), 2),
+            "concurrency": {"workers": self.workers, **self.concurrency},
+        }